@@ -1,5 +1,9 @@
+import pytest
+from django.core.cache import cache
 from pytest_factoryboy import register
 
+from school_menu.autocomplete import autocomplete_index
+from school_menu.search import create_search_index
 from tests.school_menu.factories import (
     DetailedMealFactory,
     SchoolFactory,
@@ -11,3 +15,30 @@ register(UserFactory)
 register(SchoolFactory)
 register(SimpleMealFactory)
 register(DetailedMealFactory)
+
+
+@pytest.fixture(scope="session")
+def django_db_setup(django_db_setup, django_db_blocker):
+    # tests run without migrations, the search index is created by a migration
+    with django_db_blocker.unblock():
+        create_search_index()
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def clear_autocomplete_index():
+    autocomplete_index.clear()
+    yield
+    autocomplete_index.clear()
+
+
+@pytest.fixture(autouse=True)
+def prerender_root(settings, tmp_path):
+    settings.PRERENDER_ROOT = tmp_path / "prerendered"
+    yield settings.PRERENDER_ROOT
@@ -123,6 +123,63 @@ MEDIA_URL = "/media/"
 
 AUTH_USER_MODEL = "users.User"
 
+# SCHOOL MENU CALENDAR
+# number of weeks of the menu rotation, Meal.Weeks must have a choice for each week
+MENU_CYCLE_WEEKS = 4
+# (month, day) when the winter and the spring menus start with automatic season
+MENU_WINTER_START = (9, 23)
+MENU_SPRING_START = (3, 21)
+# largest menu file a school can upload, in bytes
+MENU_UPLOAD_MAX_SIZE = 5 * 1024 * 1024
+
+# PRE-RENDERED MENU PAGES
+# today's public menu pages are rendered here, in a directory for each day
+PRERENDER_ROOT = BASE_DIR / "prerendered"
+# host of the links in the rendered pages, the first of ALLOWED_HOSTS when empty
+PRERENDER_HOST = env("PRERENDER_HOST", default="")
+
+# SCHOOL DIRECTORY
+# schools shown for each page of the school list and of the search results
+SCHOOL_PAGE_SIZE = env.int("SCHOOL_PAGE_SIZE", default=50)
+
+# CACHE
+# shared by the gunicorn workers and the django-q cluster, so that cache
+# invalidations reach every process: a database table (python manage.py
+# createcachetable) unless CACHE_URL is set. Every cache hit on the database cache
+# is a query, set CACHE_URL to redis, e.g. redis://host:6379/1, in production.
+CACHES = {"default": env.cache("CACHE_URL", default="dbcache://school_menu_cache")}
+# room for the weekly menus of every school along with the search results and the
+# stale copies of the pages, so that culling does not evict the menus
+CACHES["default"].setdefault("OPTIONS", {})["MAX_ENTRIES"] = env.int(
+    "CACHE_MAX_ENTRIES", default=100_000
+)
+
+# RATE LIMITS
+# (requests, seconds) allowed to each client ip for each rate limited endpoint, a
+# token bucket holding the requests and refilling them over the seconds
+RATE_LIMITS = {
+    "search_schools": (30, 60),
+    "get_menu": (60, 60),
+}
+# number of proxies in front of the app, the client ip is read from X-Forwarded-For
+RATE_LIMIT_PROXY_COUNT = env.int("RATE_LIMIT_PROXY_COUNT", default=0)
+
+# REQUEST DEADLINES
+# milliseconds the queries of each public endpoint may take before being aborted,
+# the endpoint then answers with a stale response or a 503
+REQUEST_DEADLINES = {
+    "school_menu": 300,
+    "school_menu_calendar": 300,
+    "school_menu_ics": 500,
+    "get_menu": 300,
+    "json_menu": 300,
+    "json_menu_bulk": 500,
+    "dish_search": 500,
+    "city_schools": 500,
+    "district_menu": 500,
+    "search_schools": 300,
+}
+
 # DJANGO-ALLAUTH
 AUTHENTICATION_BACKENDS = (
     # Needed to login by username in Django admin, regardless of `allauth`
@@ -1,4 +1,5 @@
 import logging
+import tempfile
 
 from .common import *  # noqa
 
@@ -12,6 +13,13 @@ DATABASES = {
     }
 }
 
+CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+PRERENDER_HOST = "testserver"
+
+# uploaded files are stored out of the project
+MEDIA_ROOT = tempfile.mkdtemp()
+
 PASSWORD_HASHERS = ("django.contrib.auth.hashers.MD5PasswordHasher",)
 
 
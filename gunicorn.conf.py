@@ -0,0 +1,5 @@
+def post_worker_init(worker):
+    """Load the school autocomplete index before the worker serves requests"""
+    from school_menu.autocomplete import load_autocomplete_index
+
+    load_autocomplete_index()
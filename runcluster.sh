@@ -0,0 +1,9 @@
+#!/bin/sh
+
+# the django-q cluster runs the menu imports, the pre-rendering and the schedules,
+# it is started again whenever it stops so that they never stop silently
+while true; do
+    python manage.py qcluster
+    echo "qcluster exited with status $?, restarting in 5 seconds" >&2
+    sleep 5
+done
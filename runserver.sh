@@ -2,4 +2,6 @@
 
 python manage.py collectstatic --noinput
 python manage.py migrate
-gunicorn core.wsgi:application --bind=0.0.0.0:80
+python manage.py createcachetable
+sh ./runcluster.sh &
+exec gunicorn core.wsgi:application --bind=0.0.0.0:80
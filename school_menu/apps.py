@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class SchoolMenuConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "school_menu"
+
+    def ready(self):
+        from school_menu import signals  # noqa: F401
@@ -0,0 +1,220 @@
+import time
+from bisect import bisect_left, insort
+from functools import lru_cache
+from threading import Lock, Thread
+
+from django.db import connection
+from django.urls import reverse
+
+from school_menu.models import School
+from school_menu.search import get_search_terms
+
+AUTOCOMPLETE_LIMIT = 10
+# other workers only see a change once their index is loaded again, in the background
+AUTOCOMPLETE_MAX_AGE = 60 * 10
+
+
+def normalize_key(text):
+    """
+    Normalize a text for prefix lookups: lowercase words without accents
+    and punctuation, separated by a single space
+    """
+    return " ".join(get_search_terms(text))
+
+
+def get_word_suffixes(key):
+    """
+    Get the key starting from each of its words ("a b c" gives "a b c", "b c", "c")
+    """
+    words = key.split()
+    return [" ".join(words[index:]) for index in range(len(words))]
+
+
+@lru_cache
+def get_menu_url_template():
+    """
+    Get the url of the school menu page with a {slug} placeholder, so that urls
+    are built without reversing them for every school
+    """
+    placeholder = "slug-placeholder"
+    url = reverse("school_menu:school_menu", kwargs={"slug": placeholder})
+    return url.replace(placeholder, "{slug}")
+
+
+class PrefixIndex:
+    """Sorted (key, school_id) pairs looked up by prefix with bisect"""
+
+    def __init__(self, entries=()):
+        self.entries = sorted(entries)
+
+    def add(self, key, school_id):
+        insort(self.entries, (key, school_id))
+
+    def remove(self, key, school_id):
+        index = bisect_left(self.entries, (key, school_id))
+        if index < len(self.entries) and self.entries[index] == (key, school_id):
+            del self.entries[index]
+
+    def search(self, prefix):
+        """Yield the ids of the entries whose key starts with prefix, by key"""
+        index = bisect_left(self.entries, (prefix,))
+        while index < len(self.entries) and self.entries[index][0].startswith(prefix):
+            yield self.entries[index][1]
+            index += 1
+
+
+class SchoolAutocomplete:
+    """
+    In-memory prefix index over the schools' name and city, name matches first
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self.clear()
+
+    def clear(self):
+        self.schools = {}
+        self.keys = {}
+        self.tiers = [PrefixIndex(), PrefixIndex(), PrefixIndex()]
+        self.loaded_at = None
+        self.reloading = False
+
+    def get_keys(self, school):
+        """Get the (tier, key) pairs of a school"""
+        name = normalize_key(school.name)
+        name_words = get_word_suffixes(name)[1:]
+        cities = get_word_suffixes(normalize_key(school.city))
+        return (
+            [(0, name)]
+            + [(1, key) for key in name_words]
+            + [(2, key) for key in cities]
+        )
+
+    def get_entry(self, school):
+        return school.name, school.city, school.slug
+
+    def load(self, schools):
+        """Index the given schools, replacing the current content"""
+        entries = [[], [], []]
+        keys = {}
+        entry_map = {}
+        for school in schools:
+            keys[school.pk] = self.get_keys(school)
+            entry_map[school.pk] = self.get_entry(school)
+            for tier, key in keys[school.pk]:
+                entries[tier].append((key, school.pk))
+        with self.lock:
+            self.schools = entry_map
+            self.keys = keys
+            self.tiers = [PrefixIndex(tier_entries) for tier_entries in entries]
+            self.loaded_at = time.monotonic()
+
+    def update(self, school):
+        """Add a school or update its entries"""
+        with self.lock:
+            self._remove(school.pk)
+            self.keys[school.pk] = self.get_keys(school)
+            self.schools[school.pk] = self.get_entry(school)
+            for tier, key in self.keys[school.pk]:
+                self.tiers[tier].add(key, school.pk)
+
+    def remove(self, school_id):
+        with self.lock:
+            self._remove(school_id)
+
+    def _remove(self, school_id):
+        for tier, key in self.keys.pop(school_id, []):
+            self.tiers[tier].remove(key, school_id)
+        self.schools.pop(school_id, None)
+
+    def search(self, query, limit=AUTOCOMPLETE_LIMIT):
+        """Get the first schools matching the query as a prefix, without queries"""
+        prefix = normalize_key(query)
+        if not prefix:
+            return []
+        with self.lock:
+            found = [self.schools[school_id] for school_id in self.find(prefix, limit)]
+        return [
+            {
+                "name": name,
+                "city": city,
+                "url": get_menu_url_template().format(slug=slug),
+            }
+            for name, city, slug in found
+        ]
+
+    def find(self, prefix, limit):
+        """Get the ids of the first schools matching the prefix, tier by tier"""
+        found = {}
+        for tier in self.tiers:
+            for school_id in tier.search(prefix):
+                found[school_id] = None
+                if len(found) == limit:
+                    return list(found)
+        return list(found)
+
+    def start_reload(self):
+        """Tell whether the caller should load the index again, one at a time"""
+        with self.lock:
+            if self.reloading:
+                return False
+            self.reloading = True
+            return True
+
+    @property
+    def is_stale(self):
+        return (
+            self.loaded_at is None
+            or time.monotonic() - self.loaded_at > AUTOCOMPLETE_MAX_AGE
+        )
+
+
+autocomplete_index = SchoolAutocomplete()
+
+
+def load_autocomplete_index():
+    """
+    Load every school in the autocomplete index of this process
+    """
+    schools = School.objects.only("id", "name", "city", "slug")
+    autocomplete_index.load(schools.iterator(chunk_size=2000))
+    return autocomplete_index
+
+
+def reload_autocomplete_index():
+    """
+    Load the autocomplete index again, in a thread with its own connection
+    """
+    try:
+        load_autocomplete_index()
+    finally:
+        autocomplete_index.reloading = False
+        connection.close()
+
+
+def get_autocomplete_index():
+    """
+    Get the autocomplete index of this process, loaded on first use. When it is
+    too old it is loaded again in the background and served meanwhile.
+    """
+    if autocomplete_index.loaded_at is None:
+        return load_autocomplete_index()
+    if autocomplete_index.is_stale and autocomplete_index.start_reload():
+        Thread(target=reload_autocomplete_index, daemon=True).start()
+    return autocomplete_index
+
+
+def update_autocomplete_index(school):
+    """
+    Index again a saved school, when the index of this process is loaded
+    """
+    if autocomplete_index.loaded_at is not None:
+        autocomplete_index.update(school)
+
+
+def remove_from_autocomplete_index(school_id):
+    """
+    Remove a deleted school, when the index of this process is loaded
+    """
+    if autocomplete_index.loaded_at is not None:
+        autocomplete_index.remove(school_id)
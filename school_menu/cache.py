@@ -0,0 +1,149 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.core.cache import cache
+from django.db.models import Count
+from django.dispatch import Signal
+from django.utils import timezone
+from django.utils.text import slugify
+
+from school_menu.models import DetailedMeal, Meal, School, SimpleMeal
+
+MENU_CACHE_TIMEOUT = 60 * 60 * 24
+ICS_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+CITY_DIRECTORY_CACHE_KEY = "school_menu:cities"
+
+# sent with the school_id whenever the menu of a school changes
+menu_changed = Signal()
+# set while the meals of a menu are written in bulk, see bulk_menu_write
+_bulk_menu_write = ContextVar("bulk_menu_write", default=False)
+
+
+def menu_cache_key(school_id, season, week, meal_type):
+    """
+    Get the cache key for the weekly menu of a school
+    """
+    return f"school_menu:menu:{school_id}:{season}:{week}:{meal_type}"
+
+
+def ics_cache_key(school, start, end):
+    """
+    Get the cache key for the iCalendar feed of a school for the given date range.
+    The menu version is part of the key, so any menu change makes a new feed.
+    """
+    version = school.updated_at.timestamp()
+    return f"school_menu:ics:{school.pk}:{version}:{start}:{end}"
+
+
+def cache_lines(key, lines, timeout):
+    """
+    Yield the given lines and cache their concatenation once all of them are sent
+    """
+    sent = []
+    for line in lines:
+        sent.append(line)
+        yield line
+    cache.set(key, "".join(sent), timeout)
+
+
+def get_city_directory():
+    """
+    Get the cities with the number of their schools and their slug, by city
+    """
+    cities = cache.get(CITY_DIRECTORY_CACHE_KEY)
+    if cities is None:
+        cities = [
+            {**city, "slug": slugify(city["city"])}
+            for city in School.objects.values("city")
+            .annotate(count=Count("id"))
+            .order_by("city")
+        ]
+        cache.set(CITY_DIRECTORY_CACHE_KEY, cities, None)
+    return cities
+
+
+def get_city_names(slug):
+    """
+    Get the names of the cities of the given slug from the city directory,
+    more than one when they only differ by case or punctuation
+    """
+    return [city["city"] for city in get_city_directory() if city["slug"] == slug]
+
+
+def invalidate_city_directory():
+    cache.delete(CITY_DIRECTORY_CACHE_KEY)
+
+
+def get_meal_model(school):
+    """
+    Get the meal model used by the school's menu type
+    """
+    if school.menu_type == School.Types.SIMPLE:
+        return SimpleMeal
+    return DetailedMeal
+
+
+def get_weekly_meals(school, season, week, meal_type, meal_ids=None):
+    """
+    Load from the database the weekly meals for the given school, season, week and
+    type ordered by day, by primary key when their ids are already known
+    """
+    if meal_ids is not None:
+        meals = get_meal_model(school).objects.filter(pk__in=meal_ids)
+    else:
+        meals = get_meal_model(school).objects.filter(
+            school=school, season=season, week=week, type=meal_type
+        )
+    return list(meals.order_by("day"))
+
+
+def get_cached_weekly_meals(school, season, week, meal_type, meal_ids=None):
+    """
+    Get the weekly meals for the given school, season, week and type ordered by day,
+    cached for the school's menu version (updated_at)
+    """
+    key = menu_cache_key(school.pk, season, week, meal_type)
+    cached = cache.get(key)
+    if cached is not None and cached[0] == school.updated_at:
+        return cached[1]
+    weekly_meals = get_weekly_meals(school, season, week, meal_type, meal_ids)
+    cache.set(key, (school.updated_at, weekly_meals), MENU_CACHE_TIMEOUT)
+    return weekly_meals
+
+
+def invalidate_menu_cache(school_id):
+    """
+    Remove every cached weekly menu of the given school
+    """
+    keys = [
+        menu_cache_key(school_id, season, week, meal_type)
+        for season in Meal.Seasons.values
+        for week in Meal.Weeks.values
+        for meal_type in Meal.Types.values
+    ]
+    cache.delete_many(keys)
+
+
+def mark_menu_changed(school_id):
+    """
+    Drop the cached menus of the school and bump its menu version (updated_at)
+    """
+    invalidate_menu_cache(school_id)
+    School.objects.filter(pk=school_id).update(updated_at=timezone.now())
+    menu_changed.send(sender=School, school_id=school_id)
+
+
+@contextmanager
+def bulk_menu_write():
+    """
+    Skip the per-meal signal receivers, the writer marks the menu changed once
+    """
+    token = _bulk_menu_write.set(True)
+    try:
+        yield
+    finally:
+        _bulk_menu_write.reset(token)
+
+
+def is_bulk_menu_write():
+    return _bulk_menu_write.get()
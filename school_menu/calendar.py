@@ -0,0 +1,149 @@
+import calendar
+from datetime import timedelta
+from functools import lru_cache
+from typing import NamedTuple
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from school_menu.models import School
+
+MAX_RANGE_DAYS = 366
+
+
+class MenuDate(NamedTuple):
+    """A date translated to the menu calendar of a school"""
+
+    week: int
+    day: int
+    season: int
+
+
+def get_today():
+    """
+    Get today's date in the project time zone (Europe/Rome)
+    """
+    return timezone.localdate()
+
+
+def get_school_day(date):
+    """
+    Get the school day for the given date, weekends are moved to next monday
+    """
+    if date.weekday() > 4:
+        return date + timedelta(days=7 - date.weekday())
+    return date
+
+
+def get_cycle_week(date, week_bias, cycle_weeks):
+    """
+    Get the week of the menu cycle (1..cycle_weeks) for the given date shifted by bias
+    """
+    iso_week = date.isocalendar().week
+    return (iso_week - 1 + week_bias) % cycle_weeks + 1
+
+
+def get_date_season(date, season_choice, winter_start, spring_start):
+    """
+    Get the season for the given date based on the school's season choice
+    """
+    if season_choice != School.Seasons.AUTOMATICA:
+        return season_choice
+    month_day = (date.month, date.day)
+    if month_day >= winter_start or month_day < spring_start:
+        return School.Seasons.INVERNALE
+    return School.Seasons.PRIMAVERILE
+
+
+@lru_cache(maxsize=4096)
+def _resolve_date(
+    date, week_bias, season_choice, cycle_weeks, winter_start, spring_start
+):
+    school_day = get_school_day(date)
+    return MenuDate(
+        week=get_cycle_week(school_day, week_bias, cycle_weeks),
+        day=school_day.isoweekday(),
+        season=get_date_season(school_day, season_choice, winter_start, spring_start),
+    )
+
+
+def resolve_date(date, week_bias, season_choice):
+    """
+    Translate a date to the (week, day, season) of the menu calendar.
+    Results are memoized per (date, week_bias, season_choice).
+    """
+    return _resolve_date(
+        date,
+        week_bias,
+        season_choice,
+        settings.MENU_CYCLE_WEEKS,
+        settings.MENU_WINTER_START,
+        settings.MENU_SPRING_START,
+    )
+
+
+def resolve_school_date(school, date=None):
+    """
+    Translate a date (today by default) to the menu calendar of the given school
+    """
+    if date is None:
+        date = get_today()
+    return resolve_date(date, school.week_bias, school.season_choice)
+
+
+def resolve_date_range(start, end, week_bias, season_choice):
+    """
+    Translate every school day between start and end (included) to the menu calendar
+    """
+    dates = (start + timedelta(days=n) for n in range((end - start).days + 1))
+    return {
+        date: resolve_date(date, week_bias, season_choice)
+        for date in dates
+        if date.weekday() < 5
+    }
+
+
+def get_season_end(date):
+    """
+    Get the last day of the automatic season the given date belongs to
+    """
+    boundaries = [
+        date.replace(year=date.year + years, month=month, day=day)
+        for years in (0, 1)
+        for month, day in (settings.MENU_WINTER_START, settings.MENU_SPRING_START)
+    ]
+    next_season_start = min(boundary for boundary in boundaries if boundary > date)
+    return next_season_start - timedelta(days=1)
+
+
+def get_feed_range(date):
+    """
+    Get the date range of the calendar feed: from the monday of the school week of
+    the given date to the end of its season
+    """
+    school_day = get_school_day(date)
+    return school_day - timedelta(days=school_day.weekday()), get_season_end(school_day)
+
+
+def get_month_range(date):
+    """
+    Get the first and the last day of the month of the given date
+    """
+    last_day = calendar.monthrange(date.year, date.month)[1]
+    return date.replace(day=1), date.replace(day=last_day)
+
+
+def parse_date_range(start, end):
+    """
+    Parse an ISO date range, defaulting to the current month.
+    Ranges are capped to MAX_RANGE_DAYS, a whole school year.
+    """
+    try:
+        start = parse_date(start or "")
+        end = parse_date(end or "")
+    except ValueError:
+        start = end = None
+    if start is None or end is None or end < start:
+        return get_month_range(get_today())
+    return start, min(end, start + timedelta(days=MAX_RANGE_DAYS - 1))
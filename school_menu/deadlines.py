@@ -0,0 +1,145 @@
+import hashlib
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import OperationalError, connection, transaction
+from django.http import HttpResponse
+from django.utils.http import urlencode
+
+# the sqlite progress handler is called every this many virtual machine instructions
+SQLITE_PROGRESS_STEPS = 1000
+STALE_RESPONSE_TIMEOUT = 60 * 60 * 24
+DEADLINE_RETRY_AFTER = 5
+
+
+class Deadline:
+    """A point in time some milliseconds from now"""
+
+    def __init__(self, milliseconds):
+        self.milliseconds = milliseconds
+        self.expires_at = time.monotonic() + milliseconds / 1000
+
+    @property
+    def expired(self):
+        return time.monotonic() >= self.expires_at
+
+
+@contextmanager
+def statement_deadline(deadline, using=None):
+    """
+    Abort with an OperationalError the queries still running past the deadline
+    """
+    using = using or connection
+    using.ensure_connection()
+    if using.vendor == "postgresql":
+        # reset by the end of the transaction, no query needed to restore it
+        with transaction.atomic(using=using.alias, savepoint=False):
+            with using.cursor() as cursor:
+                cursor.execute(
+                    "SELECT set_config('statement_timeout', %s, true)",
+                    [str(deadline.milliseconds)],
+                )
+            yield
+    elif using.vendor == "sqlite":
+        using.connection.set_progress_handler(
+            lambda: deadline.expired, SQLITE_PROGRESS_STEPS
+        )
+        try:
+            yield
+        finally:
+            using.connection.set_progress_handler(None, 0)
+    else:
+        yield
+
+
+def stale_response_key(request, query_params):
+    """
+    Get the cache key of the stale copy of a page, from its path and the given
+    query parameters only: other parameters do not make a new copy
+    """
+    query = urlencode(
+        [(param, request.GET[param]) for param in query_params if param in request.GET]
+    )
+    path_hash = hashlib.md5(f"{request.path}?{query}".encode()).hexdigest()
+    return f"school_menu:stale:{path_hash}"
+
+
+def get_response_digest(response):
+    """
+    Get what identifies the content of a response: its ETag or a hash of its body
+    """
+    return response.get("ETag") or hashlib.md5(response.content).hexdigest()
+
+
+def keep_stale_response(request, response, query_params):
+    """
+    Keep the response as the last good one of the page, when it has changed
+    """
+    key = stale_response_key(request, query_params)
+    digest = get_response_digest(response)
+    if cache.get(key) != digest:
+        cache.set_many(
+            {key: digest, f"{key}:{digest}": response}, STALE_RESPONSE_TIMEOUT
+        )
+
+
+def can_serve_stale(request):
+    return request.method == "GET" and not request.user.is_authenticated
+
+
+def get_deadline_response(request, stale, query_params):
+    """
+    Get the last good response of the page when it may be served stale,
+    otherwise a 503 asking to retry shortly
+    """
+    if stale and can_serve_stale(request):
+        key = stale_response_key(request, query_params)
+        digest = cache.get(key)
+        response = cache.get(f"{key}:{digest}") if digest else None
+        if response is not None:
+            response.headers["Warning"] = '110 - "Response is Stale"'
+            return response
+    return HttpResponse(
+        "Il servizio è momentaneamente sovraccarico, riprova tra poco.",
+        status=503,
+        headers={"Retry-After": str(DEADLINE_RETRY_AFTER)},
+    )
+
+
+def with_deadline(scope, stale=False, query_params=()):
+    """
+    Bound the queries of the view to REQUEST_DEADLINES[scope] milliseconds, then
+    answer with the last good response (when stale is True) or a 503
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            milliseconds = settings.REQUEST_DEADLINES.get(scope)
+            if not milliseconds:
+                return view(request, *args, **kwargs)
+            deadline = Deadline(milliseconds)
+            try:
+                with statement_deadline(deadline):
+                    response = view(request, *args, **kwargs)
+                    if hasattr(response, "render"):
+                        response.render()
+            except OperationalError:
+                if not deadline.expired:
+                    raise
+                return get_deadline_response(request, stale, query_params)
+            if (
+                stale
+                and response.status_code == 200
+                and not response.streaming
+                and can_serve_stale(request)
+            ):
+                keep_stale_response(request, response, query_params)
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,137 @@
+from collections import defaultdict
+
+from school_menu.calendar import resolve_school_date
+from school_menu.models import DetailedMeal, DishToken, School, SimpleMeal
+from school_menu.search import get_search_terms
+
+DISH_FIELDS = {
+    SimpleMeal: ["menu", "snack"],
+    DetailedMeal: ["first_course", "second_course", "side_dish", "fruit", "snack"],
+}
+MENU_TYPES = {SimpleMeal: School.Types.SIMPLE, DetailedMeal: School.Types.DETAILED}
+MIN_TOKEN_LENGTH = 3
+# schools returned by a dish search
+MAX_DISH_RESULTS = 50
+STOPWORDS = {
+    "con", "del", "dei", "della", "delle", "dello", "degli", "all", "alla", "alle",
+    "allo", "agli", "dal", "dalla", "nel", "nella", "per", "senza", "uno", "una",
+}  # fmt: skip
+
+
+def get_dish_tokens(meal):
+    """
+    Get the normalized words of the dishes of a meal, short words and stopwords
+    are left out
+    """
+    text = " ".join(getattr(meal, field) for field in DISH_FIELDS[type(meal)])
+    return {
+        term[:100]
+        for term in get_search_terms(text)
+        if len(term) >= MIN_TOKEN_LENGTH and term not in STOPWORDS
+    }
+
+
+def get_meal_tokens(meal):
+    """
+    Get the dish tokens of a meal, looked up by its id: its school, season, week,
+    day and type may have changed since it was indexed
+    """
+    return DishToken.objects.filter(menu_type=MENU_TYPES[type(meal)], meal_id=meal.pk)
+
+
+def build_dish_tokens(meal):
+    return [
+        DishToken(
+            token=token,
+            school_id=meal.school_id,
+            menu_type=MENU_TYPES[type(meal)],
+            season=meal.season,
+            week=meal.week,
+            day=meal.day,
+            type=meal.type,
+            meal_id=meal.pk,
+        )
+        for token in sorted(get_dish_tokens(meal))
+    ]
+
+
+def index_meal_dishes(meal):
+    """
+    Replace the dish tokens of a saved meal
+    """
+    get_meal_tokens(meal).delete()
+    DishToken.objects.bulk_create(build_dish_tokens(meal))
+
+
+def unindex_meal_dishes(meal):
+    """
+    Remove the dish tokens of a deleted meal
+    """
+    get_meal_tokens(meal).delete()
+
+
+def index_school_dishes(school_ids=None, batch_size=1000):
+    """
+    Replace the dish tokens of the meals of the given schools (all by default),
+    returning the number of tokens
+    """
+    tokens = DishToken.objects.all()
+    if school_ids is not None:
+        tokens = tokens.filter(school_id__in=school_ids)
+    tokens.delete()
+    count = 0
+    for model in DISH_FIELDS:
+        meals = model.objects.filter(school__isnull=False)
+        if school_ids is not None:
+            meals = meals.filter(school_id__in=school_ids)
+        batch = []
+        for meal in meals.iterator(chunk_size=batch_size):
+            batch.extend(build_dish_tokens(meal))
+            if len(batch) >= batch_size:
+                count += len(DishToken.objects.bulk_create(batch))
+                batch = []
+        count += len(DishToken.objects.bulk_create(batch))
+    return count
+
+
+def find_dish(query, current_week=False):
+    """
+    Find the schools serving every word of the query, as (school, meals) pairs
+    ordered by school name, only the current week's meals with current_week
+    """
+    terms = [
+        term
+        for term in get_search_terms(query)
+        if len(term) >= MIN_TOKEN_LENGTH and term not in STOPWORDS
+    ]
+    if not terms:
+        return []
+    keys = None
+    for term in terms:
+        matches = set(
+            DishToken.objects.filter(token__startswith=term).values_list(
+                "school_id", "menu_type", "season", "week", "day", "type"
+            )
+        )
+        keys = matches if keys is None else keys & matches
+        if not keys:
+            return []
+    meals = defaultdict(list)
+    for school_id, menu_type, season, week, day, meal_type in keys:
+        meals[school_id, menu_type].append((season, week, day, meal_type))
+    schools = School.objects.filter(pk__in={school_id for school_id, _ in meals})
+    results = []
+    for school in schools.order_by("name").iterator():
+        if len(results) == MAX_DISH_RESULTS:
+            break
+        school_meals = meals.get((school.pk, school.menu_type), [])
+        if current_week:
+            today = resolve_school_date(school)
+            school_meals = [
+                meal
+                for meal in school_meals
+                if (meal[0], meal[1]) == (today.season, today.week)
+            ]
+        if school_meals:
+            results.append((school, sorted(school_meals)))
+    return results
@@ -1,8 +1,10 @@
 from crispy_forms.helper import FormHelper
 from crispy_forms.layout import Div, Field, Layout, Submit
 from django import forms
+from django.conf import settings
 
 from school_menu.models import DetailedMeal, Meal, School, SimpleMeal
+from school_menu.readers import detect_format
 
 
 class SchoolForm(forms.ModelForm):
@@ -70,9 +72,17 @@ class UploadMenuForm(forms.Form):
 
     def clean_file(self):
         file = self.cleaned_data.get("file")
+        if file.size > settings.MENU_UPLOAD_MAX_SIZE:
+            raise forms.ValidationError(
+                "Il file è troppo grande, la dimensione massima è di "
+                f"{settings.MENU_UPLOAD_MAX_SIZE // 1024 // 1024} MB"
+            )
         ext = file.name.split(".")[-1].lower()
-        if ext not in ["xls", "xlsx"]:
-            raise forms.ValidationError("Il file deve essere in formato xls o xlsx")
+        # the content decides how the file is read, whatever its extension
+        if ext not in ["xlsx", "ods", "csv"] or detect_format(file) is None:
+            raise forms.ValidationError(
+                "Il file deve essere in formato xlsx, ods o csv"
+            )
         return file
 
     def __init__(self, *args, **kwargs):
@@ -84,7 +94,7 @@ class UploadMenuForm(forms.Form):
             Field(
                 "file",
                 css_class="file-upload-input mb-2",
-                accept=".xls, .xlsx",
+                accept=".xlsx, .ods, .csv",
             ),
         )
 
@@ -0,0 +1,81 @@
+from datetime import UTC, timedelta
+
+from school_menu.models import DetailedMeal
+
+ICS_DATE_FORMAT = "%Y%m%d"
+ICS_DATETIME_FORMAT = "%Y%m%dT%H%M%SZ"
+ICS_LINE_LENGTH = 75
+
+
+def escape_text(value):
+    """
+    Escape a text value as required by RFC 5545
+    """
+    return (
+        value.replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def fold_line(line):
+    """
+    Fold a content line longer than 75 octets and terminate it with CRLF
+    """
+    encoded = line.encode()
+    chunks = []
+    while len(encoded) > ICS_LINE_LENGTH:
+        cut = ICS_LINE_LENGTH if not chunks else ICS_LINE_LENGTH - 1
+        # never split a multibyte character
+        while encoded[cut] & 0xC0 == 0x80:
+            cut -= 1
+        chunks.append(encoded[:cut].decode())
+        encoded = encoded[cut:]
+    chunks.append(encoded.decode())
+    return "\r\n ".join(chunks) + "\r\n"
+
+
+def get_meal_description(meal):
+    """
+    Get the text of the meal to show in the calendar event
+    """
+    if isinstance(meal, DetailedMeal):
+        lines = [
+            f"Primo: {meal.first_course}",
+            f"Secondo: {meal.second_course}",
+            f"Contorno: {meal.side_dish}",
+            f"Frutta: {meal.fruit}",
+        ]
+    else:
+        lines = [meal.menu]
+    lines.append(f"Spuntino: {meal.snack}")
+    return "\n".join(lines)
+
+
+def iter_ics_lines(school, calendar_days, host):
+    """
+    Yield the lines of the iCalendar feed of a school, one event per school day with a meal
+    """
+    stamp = school.updated_at.astimezone(UTC).strftime(ICS_DATETIME_FORMAT)
+    yield fold_line("BEGIN:VCALENDAR")
+    yield fold_line("VERSION:2.0")
+    yield fold_line(f"PRODID:-//{host}//Menu Scolastico//IT")
+    yield fold_line("CALSCALE:GREGORIAN")
+    yield fold_line(f"X-WR-CALNAME:{escape_text(f'Menu {school.name}')}")
+    for calendar_day in calendar_days:
+        if calendar_day.meal is None:
+            continue
+        day = calendar_day.date
+        next_day = day + timedelta(days=1)
+        yield fold_line("BEGIN:VEVENT")
+        yield fold_line(f"UID:{school.slug}-{day.strftime(ICS_DATE_FORMAT)}@{host}")
+        yield fold_line(f"DTSTAMP:{stamp}")
+        yield fold_line(f"DTSTART;VALUE=DATE:{day.strftime(ICS_DATE_FORMAT)}")
+        yield fold_line(f"DTEND;VALUE=DATE:{next_day.strftime(ICS_DATE_FORMAT)}")
+        yield fold_line(f"SUMMARY:{escape_text(f'Menu {school.name}')}")
+        description = escape_text(get_meal_description(calendar_day.meal))
+        yield fold_line(f"DESCRIPTION:{description}")
+        yield fold_line("END:VEVENT")
+    yield fold_line("END:VCALENDAR")
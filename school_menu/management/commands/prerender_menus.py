@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from school_menu.tasks import prerender_menus
+
+
+class Command(BaseCommand):
+    help = "Renders today's public menu page of every school to static files."
+
+    def handle(self, *args, **kwargs):
+        self.stdout.write("Rendering menu pages...")
+        count = prerender_menus(sync=True)
+        self.stdout.write(f"Rendered {count} menu pages.")
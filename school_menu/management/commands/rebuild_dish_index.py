@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from school_menu.dishes import index_school_dishes
+
+
+class Command(BaseCommand):
+    help = "Indexes again the dishes of every meal for the dish search."
+
+    def handle(self, *args, **kwargs):
+        self.stdout.write("Indexing dishes...")
+        count = index_school_dishes()
+        self.stdout.write(f"Indexed {count} dish words.")
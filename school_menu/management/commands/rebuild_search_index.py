@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from school_menu.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = "Indexes again the name and city of every school for the school search."
+
+    def handle(self, *args, **kwargs):
+        self.stdout.write("Indexing schools...")
+        count = rebuild_search_index()
+        self.stdout.write(f"Indexed {count} schools.")
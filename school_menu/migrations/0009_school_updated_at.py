@@ -0,0 +1,21 @@
+# Generated by Django 5.0.7 on 2024-07-28 10:12
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("school_menu", "0008_alter_school_season_choice"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="school",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.0.7 on 2024-07-29 18:40
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+NATURAL_KEY = ["school", "season", "week", "type", "day"]
+
+
+def remove_duplicated_meals(apps, schema_editor):
+    """keep only the most recent meal for every natural key before adding the constraint"""
+    for model_name in ["DetailedMeal", "SimpleMeal"]:
+        model = apps.get_model("school_menu", model_name)
+        duplicates = (
+            model.objects.values(*NATURAL_KEY)
+            .annotate(last_id=Max("id"), count=Count("id"))
+            .filter(count__gt=1, school__isnull=False)
+        )
+        for duplicate in duplicates:
+            last_id = duplicate.pop("last_id")
+            duplicate.pop("count")
+            model.objects.filter(**duplicate).exclude(id=last_id).delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("school_menu", "0009_school_updated_at"),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicated_meals, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="detailedmeal",
+            constraint=models.UniqueConstraint(
+                fields=("school", "season", "week", "type", "day"),
+                name="school_menu_detailedmeal_unique_meal",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="simplemeal",
+            constraint=models.UniqueConstraint(
+                fields=("school", "season", "week", "type", "day"),
+                name="school_menu_simplemeal_unique_meal",
+            ),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.0.7 on 2024-08-02 21:15
+
+from datetime import datetime, time, timedelta
+from zoneinfo import ZoneInfo
+
+from django.db import migrations
+
+
+def create_schedule(apps, schema_editor):
+    """render every school's menu page right after midnight in Europe/Rome"""
+    Schedule = apps.get_model("django_q", "Schedule")
+    tomorrow = datetime.now(ZoneInfo("Europe/Rome")).date() + timedelta(days=1)
+    Schedule.objects.update_or_create(
+        name="prerender_menus",
+        defaults={
+            "func": "school_menu.tasks.prerender_menus",
+            "schedule_type": "D",
+            "repeats": -1,
+            "next_run": datetime.combine(tomorrow, time(0, 1), ZoneInfo("Europe/Rome")),
+        },
+    )
+
+
+def delete_schedule(apps, schema_editor):
+    Schedule = apps.get_model("django_q", "Schedule")
+    Schedule.objects.filter(name="prerender_menus").delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("school_menu", "0010_meal_unique_constraints"),
+        ("django_q", "0017_task_cluster_alter"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_schedule, delete_schedule),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 5.0.7 on 2024-08-03 10:12
+
+from datetime import datetime, time, timedelta
+from zoneinfo import ZoneInfo
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_schedule(apps, schema_editor):
+    """resolve every school's menu of the day at midnight in Europe/Rome"""
+    Schedule = apps.get_model("django_q", "Schedule")
+    tomorrow = datetime.now(ZoneInfo("Europe/Rome")).date() + timedelta(days=1)
+    Schedule.objects.update_or_create(
+        name="rebuild_daily_menus",
+        defaults={
+            "func": "school_menu.tasks.rebuild_daily_menus",
+            "schedule_type": "D",
+            "repeats": -1,
+            "next_run": datetime.combine(tomorrow, time(0, 0), ZoneInfo("Europe/Rome")),
+        },
+    )
+
+
+def delete_schedule(apps, schema_editor):
+    Schedule = apps.get_model("django_q", "Schedule")
+    Schedule.objects.filter(name="rebuild_daily_menus").delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("school_menu", "0011_prerender_menus_schedule"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailyMenu",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                (
+                    "season",
+                    models.SmallIntegerField(choices=[(1, "Estivo"), (2, "Invernale")]),
+                ),
+                ("week", models.SmallIntegerField()),
+                (
+                    "day",
+                    models.SmallIntegerField(
+                        choices=[
+                            (1, "Lunedì"),
+                            (2, "Martedì"),
+                            (3, "Mercoledì"),
+                            (4, "Giovedì"),
+                            (5, "Venerdì"),
+                        ]
+                    ),
+                ),
+                ("meal_id", models.PositiveBigIntegerField(null=True)),
+                ("weekly_meal_ids", models.JSONField(default=list)),
+                (
+                    "school",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_menu",
+                        to="school_menu.school",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "menu del giorno",
+                "verbose_name_plural": "menu del giorno",
+            },
+        ),
+        migrations.RunPython(create_schedule, delete_schedule),
+    ]
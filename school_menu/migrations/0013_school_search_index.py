@@ -0,0 +1,54 @@
+# Generated by Django 5.0.7 on 2024-08-04 18:40
+
+from django.db import migrations
+
+# the index as of this migration, school_menu.search may change after it
+CREATE_SQL = {
+    "sqlite": [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS school_menu_school_fts "
+        'USING fts5(name, city, tokenize="unicode61 remove_diacritics 2")',
+        "DELETE FROM school_menu_school_fts",
+        "INSERT INTO school_menu_school_fts (rowid, name, city) "
+        "SELECT id, name, city FROM school_menu_school",
+    ],
+    "postgresql": [
+        "CREATE EXTENSION IF NOT EXISTS unaccent",
+        "CREATE TABLE IF NOT EXISTS school_menu_school_search ("
+        "school_id bigint PRIMARY KEY REFERENCES school_menu_school (id) "
+        "ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+        "document tsvector NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS school_menu_school_search_document "
+        "ON school_menu_school_search USING GIN (document)",
+        "INSERT INTO school_menu_school_search (school_id, document) "
+        "SELECT id, "
+        "setweight(to_tsvector('simple', unaccent(name)), 'A') || "
+        "setweight(to_tsvector('simple', unaccent(city)), 'B') "
+        "FROM school_menu_school "
+        "ON CONFLICT (school_id) DO UPDATE SET document = EXCLUDED.document",
+    ],
+}
+DROP_SQL = {
+    "sqlite": ["DROP TABLE IF EXISTS school_menu_school_fts"],
+    "postgresql": ["DROP TABLE IF EXISTS school_menu_school_search"],
+}
+
+
+def create_search_index(apps, schema_editor):
+    """FTS5 table on SQLite, unaccented tsvector with a GIN index on PostgreSQL"""
+    for sql in CREATE_SQL[schema_editor.connection.vendor]:
+        schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    for sql in DROP_SQL[schema_editor.connection.vendor]:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("school_menu", "0012_dailymenu"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
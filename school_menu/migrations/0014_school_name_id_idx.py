@@ -0,0 +1,18 @@
+# Generated by Django 5.0.7 on 2024-08-05 09:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("school_menu", "0013_school_search_index"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="school",
+            index=models.Index(fields=["name", "id"], name="school_name_id_idx"),
+        ),
+    ]
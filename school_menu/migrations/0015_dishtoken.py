@@ -0,0 +1,90 @@
+# Generated by Django 5.0.7 on 2024-08-07 17:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("school_menu", "0014_school_name_id_idx"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DishToken",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("token", models.CharField(db_index=True, max_length=100)),
+                (
+                    "menu_type",
+                    models.CharField(
+                        choices=[("S", "Semplice"), ("D", "Dettagliato")], max_length=1
+                    ),
+                ),
+                (
+                    "season",
+                    models.SmallIntegerField(choices=[(1, "Estivo"), (2, "Invernale")]),
+                ),
+                (
+                    "week",
+                    models.SmallIntegerField(
+                        choices=[
+                            (1, "Settimana 1"),
+                            (2, "Settimana 2"),
+                            (3, "Settimana 3"),
+                            (4, "Settimana 4"),
+                        ]
+                    ),
+                ),
+                (
+                    "day",
+                    models.SmallIntegerField(
+                        choices=[
+                            (1, "Lunedì"),
+                            (2, "Martedì"),
+                            (3, "Mercoledì"),
+                            (4, "Giovedì"),
+                            (5, "Venerdì"),
+                        ]
+                    ),
+                ),
+                (
+                    "type",
+                    models.SmallIntegerField(
+                        choices=[
+                            (1, "Standard"),
+                            (2, "Gluten Free"),
+                            (3, "Lactose Free"),
+                            (4, "Vegan"),
+                        ]
+                    ),
+                ),
+                (
+                    "school",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="dish_tokens",
+                        to="school_menu.school",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "parola del menu",
+                "verbose_name_plural": "parole del menu",
+                "indexes": [
+                    models.Index(
+                        fields=["school", "menu_type", "season", "week", "day", "type"],
+                        name="dish_token_meal_idx",
+                    )
+                ],
+            },
+        ),
+    ]
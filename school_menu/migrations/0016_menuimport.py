@@ -0,0 +1,63 @@
+# Generated by Django 5.0.7 on 2024-08-09 10:12
+
+import uuid
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("school_menu", "0015_dishtoken"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MenuImport",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                (
+                    "season",
+                    models.SmallIntegerField(choices=[(1, "Estivo"), (2, "Invernale")]),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("P", "In attesa"),
+                            ("R", "In corso"),
+                            ("D", "Completato"),
+                            ("F", "Non riuscito"),
+                        ],
+                        default="P",
+                        max_length=1,
+                    ),
+                ),
+                ("rows_parsed", models.PositiveIntegerField(default=0)),
+                ("rows_written", models.PositiveIntegerField(default=0)),
+                ("message", models.CharField(blank=True, max_length=300)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "school",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="menu_imports",
+                        to="school_menu.school",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "caricamento del menu",
+                "verbose_name_plural": "caricamenti del menu",
+            },
+        ),
+    ]
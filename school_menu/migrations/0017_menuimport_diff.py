@@ -0,0 +1,27 @@
+# Generated by Django 5.0.7 on 2024-08-12 09:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("school_menu", "0016_menuimport"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="menuimport",
+            name="rows_created",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="menuimport",
+            name="rows_deleted",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="menuimport",
+            name="rows_updated",
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
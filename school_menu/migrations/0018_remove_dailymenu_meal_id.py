@@ -0,0 +1,16 @@
+# Generated by Django 5.0.7 on 2024-08-13 08:52
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("school_menu", "0017_menuimport_diff"),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name="dailymenu",
+            name="meal_id",
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.0.7 on 2024-08-14 18:20
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def delete_dish_tokens(apps, schema_editor):
+    """tokens without a meal id cannot be replaced, they are indexed again"""
+    DishToken = apps.get_model("school_menu", "DishToken")
+    DishToken.objects.all().delete()
+
+
+def schedule_dish_index(apps, schema_editor):
+    """index the dishes of every meal once, in the cluster"""
+    Schedule = apps.get_model("django_q", "Schedule")
+    Schedule.objects.update_or_create(
+        name="rebuild_dish_index",
+        defaults={
+            "func": "school_menu.dishes.index_school_dishes",
+            "schedule_type": "O",
+            "repeats": 1,
+            "next_run": timezone.now(),
+        },
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("school_menu", "0018_remove_dailymenu_meal_id"),
+        ("django_q", "0017_task_cluster_alter"),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_dish_tokens, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name="dishtoken",
+            name="dish_token_meal_idx",
+        ),
+        migrations.AddField(
+            model_name="dishtoken",
+            name="meal_id",
+            field=models.PositiveBigIntegerField(default=0),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name="dishtoken",
+            index=models.Index(
+                fields=["menu_type", "meal_id"], name="dish_token_meal_idx"
+            ),
+        ),
+        migrations.RunPython(schedule_dish_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.7 on 2024-08-19 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("school_menu", "0019_dishtoken_meal_id"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="menuimport",
+            name="file",
+            field=models.FileField(blank=True, upload_to="menu_imports/"),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.0.7 on 2024-08-20 09:40
+
+from datetime import datetime, time, timedelta
+from zoneinfo import ZoneInfo
+
+from django.db import migrations, models
+
+
+def create_schedule(apps, schema_editor):
+    """delete the idle rate limit buckets every night in Europe/Rome"""
+    Schedule = apps.get_model("django_q", "Schedule")
+    tomorrow = datetime.now(ZoneInfo("Europe/Rome")).date() + timedelta(days=1)
+    Schedule.objects.update_or_create(
+        name="purge_rate_limit_buckets",
+        defaults={
+            "func": "school_menu.tasks.purge_rate_limit_buckets",
+            "schedule_type": "D",
+            "repeats": -1,
+            "next_run": datetime.combine(tomorrow, time(3, 0), ZoneInfo("Europe/Rome")),
+        },
+    )
+
+
+def delete_schedule(apps, schema_editor):
+    Schedule = apps.get_model("django_q", "Schedule")
+    Schedule.objects.filter(name="purge_rate_limit_buckets").delete()
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("school_menu", "0020_menuimport_file"),
+        ("django_q", "0017_task_cluster_alter"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RateLimitBucket",
+            fields=[
+                (
+                    "key",
+                    models.CharField(max_length=200, primary_key=True, serialize=False),
+                ),
+                ("tokens", models.FloatField()),
+                ("updated_at", models.FloatField()),
+                ("allowed", models.BooleanField()),
+            ],
+            options={
+                "verbose_name": "limite di richieste",
+                "verbose_name_plural": "limiti di richieste",
+            },
+        ),
+        migrations.RunPython(create_schedule, delete_schedule),
+    ]
@@ -1,3 +1,5 @@
+import uuid
+
 from django.conf import settings
 from django.core.validators import MaxValueValidator
 from django.db import models
@@ -40,6 +42,13 @@ class Meal(models.Model):
 
     class Meta:
         abstract = True
+        # the unique index also serves the lookups by school, season, week, type and day
+        constraints = [
+            models.UniqueConstraint(
+                fields=["school", "season", "week", "type", "day"],
+                name="%(app_label)s_%(class)s_unique_meal",
+            ),
+        ]
 
 
 class DetailedMeal(Meal):
@@ -84,10 +93,13 @@ class School(models.Model):
     menu_type = models.CharField(
         max_length=1, choices=Types.choices, default=Types.DETAILED
     )
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name = "scuola"
         verbose_name_plural = "scuole"
+        # serves the keyset pagination of the school list
+        indexes = [models.Index(fields=["name", "id"], name="school_name_id_idx")]
 
     def __str__(self):
         return f"{self.name} - {self.city} ({str(self.user)})"
@@ -98,3 +110,112 @@ class School(models.Model):
 
     def get_absolute_url(self):
         return reverse("school_menu:school_menu", kwargs={"slug": self.slug})
+
+
+class DailyMenu(models.Model):
+    """Today's resolved menu of a school, rebuilt every night and on every change"""
+
+    school = models.OneToOneField(
+        School, on_delete=models.CASCADE, related_name="daily_menu"
+    )
+    date = models.DateField()
+    season = models.SmallIntegerField(choices=Meal.Seasons.choices)
+    week = models.SmallIntegerField()
+    day = models.SmallIntegerField(choices=Meal.Days.choices)
+    weekly_meal_ids = models.JSONField(default=list)
+
+    class Meta:
+        verbose_name = "menu del giorno"
+        verbose_name_plural = "menu del giorno"
+
+    def __str__(self):
+        return f"{self.school.name} - {self.date}"
+
+
+class DishToken(models.Model):
+    """A normalized word of the dishes of a meal, to find the schools serving a dish"""
+
+    token = models.CharField(max_length=100, db_index=True)
+    school = models.ForeignKey(
+        School, on_delete=models.CASCADE, related_name="dish_tokens"
+    )
+    menu_type = models.CharField(max_length=1, choices=School.Types.choices)
+    season = models.SmallIntegerField(choices=Meal.Seasons.choices)
+    week = models.SmallIntegerField(choices=Meal.Weeks.choices)
+    day = models.SmallIntegerField(choices=Meal.Days.choices)
+    type = models.SmallIntegerField(choices=Meal.Types.choices)
+    # id of the meal in the table of its menu type, kept when the meal is moved
+    meal_id = models.PositiveBigIntegerField()
+
+    class Meta:
+        verbose_name = "parola del menu"
+        verbose_name_plural = "parole del menu"
+        # serves the replacement of the tokens of a single meal
+        indexes = [
+            models.Index(fields=["menu_type", "meal_id"], name="dish_token_meal_idx")
+        ]
+
+    def __str__(self):
+        return self.token
+
+
+class RateLimitBucket(models.Model):
+    """The tokens left to a client for a rate limited endpoint"""
+
+    key = models.CharField(max_length=200, primary_key=True)
+    tokens = models.FloatField()
+    # unix time of the last request, the tokens refill from there
+    updated_at = models.FloatField()
+    # whether the last request was allowed
+    allowed = models.BooleanField()
+
+    class Meta:
+        verbose_name = "limite di richieste"
+        verbose_name_plural = "limiti di richieste"
+
+    def __str__(self):
+        return self.key
+
+
+class MenuImport(models.Model):
+    """A menu file uploaded by a school, imported in the background"""
+
+    class Statuses(models.TextChoices):
+        PENDING = "P", _("In attesa")
+        RUNNING = "R", _("In corso")
+        DONE = "D", _("Completato")
+        FAILED = "F", _("Non riuscito")
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    school = models.ForeignKey(
+        School, on_delete=models.CASCADE, related_name="menu_imports"
+    )
+    season = models.SmallIntegerField(choices=Meal.Seasons.choices)
+    # the uploaded file, kept until the import has read it
+    file = models.FileField(upload_to="menu_imports/", blank=True)
+    status = models.CharField(
+        max_length=1, choices=Statuses.choices, default=Statuses.PENDING
+    )
+    rows_parsed = models.PositiveIntegerField(default=0)
+    rows_written = models.PositiveIntegerField(default=0)
+    rows_created = models.PositiveIntegerField(default=0)
+    rows_updated = models.PositiveIntegerField(default=0)
+    rows_deleted = models.PositiveIntegerField(default=0)
+    message = models.CharField(max_length=300, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "caricamento del menu"
+        verbose_name_plural = "caricamenti del menu"
+
+    def __str__(self):
+        return f"{self.school.name} - {self.created_at:%Y-%m-%d %H:%M}"
+
+    @property
+    def is_finished(self):
+        return self.status in (self.Statuses.DONE, self.Statuses.FAILED)
+
+    @property
+    def has_changes(self):
+        return bool(self.rows_written or self.rows_deleted)
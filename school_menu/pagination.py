@@ -0,0 +1,41 @@
+import base64
+import binascii
+import json
+
+from django.db.models import Q
+
+
+def encode_cursor(school):
+    """
+    Encode the position of a school in the (name, id) ordering as an opaque cursor
+    """
+    data = json.dumps([school.name, school.pk]).encode()
+    return base64.urlsafe_b64encode(data).decode()
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor to the (name, id) of the last school of a page, None if invalid
+    """
+    try:
+        name, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, UnicodeError, ValueError, TypeError):
+        return None
+    if not isinstance(name, str) or not isinstance(pk, int):
+        return None
+    return name, pk
+
+
+def get_school_page(schools, cursor, page_size):
+    """
+    Get the schools after the cursor by (name, id) and the cursor of the next page
+    """
+    schools = schools.order_by("name", "id")
+    position = decode_cursor(cursor) if cursor else None
+    if position is not None:
+        name, pk = position
+        schools = schools.filter(Q(name__gt=name) | Q(name=name, id__gt=pk))
+    page = list(schools[: page_size + 1])
+    if len(page) > page_size:
+        return page[:page_size], encode_cursor(page[page_size - 1])
+    return page, None
@@ -0,0 +1,98 @@
+import os
+import shutil
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django_q.tasks import async_task
+
+from school_menu.calendar import get_today
+
+PRERENDER_PENDING_TIMEOUT = 60 * 5
+
+
+def get_prerender_host():
+    """
+    Get the host of the rendered pages, PRERENDER_HOST or a single ALLOWED_HOSTS
+    """
+    if settings.PRERENDER_HOST:
+        return settings.PRERENDER_HOST
+    return next(
+        (
+            host
+            for host in settings.ALLOWED_HOSTS
+            if host != "*" and not host.startswith(".")
+        ),
+        None,
+    )
+
+
+def get_prerender_dir(day=None):
+    """
+    Get the versioned directory of the pages rendered for the given day (today by default)
+    """
+    return Path(settings.PRERENDER_ROOT) / (day or get_today()).isoformat()
+
+
+def get_prerendered_path(school_id, day=None):
+    """
+    Get the path of the rendered menu page of a school
+    """
+    return get_prerender_dir(day) / f"{school_id}.html"
+
+
+def get_prerendered_menu(school_id):
+    """
+    Get today's rendered menu page of a school, None when it has not been rendered
+    """
+    try:
+        return get_prerendered_path(school_id).read_bytes()
+    except FileNotFoundError:
+        return None
+
+
+def write_prerendered_menu(school_id, content, day=None):
+    """
+    Atomically write the rendered menu page of a school
+    """
+    path = get_prerendered_path(school_id, day)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_suffix(".tmp")
+    temp_path.write_bytes(content)
+    os.replace(temp_path, path)
+
+
+def discard_prerendered_menu(school_id):
+    """
+    Remove today's rendered menu page of a school, so that it is served dynamically
+    """
+    get_prerendered_path(school_id).unlink(missing_ok=True)
+
+
+def remove_stale_prerender_dirs(day):
+    """
+    Remove the directories of the pages rendered for any day but the given one
+    """
+    root = Path(settings.PRERENDER_ROOT)
+    if not root.exists():
+        return
+    current_dir = get_prerender_dir(day)
+    for directory in root.iterdir():
+        if directory.is_dir() and directory != current_dir:
+            shutil.rmtree(directory)
+
+
+def prerender_pending_key(school_id):
+    return f"school_menu:prerender:pending:{school_id}"
+
+
+def schedule_prerender(school_id):
+    """
+    Queue the rendering of a school's menu page once the transaction is committed.
+    A single task is queued for many changes in a row, e.g. during a menu import.
+    """
+    if cache.add(prerender_pending_key(school_id), True, PRERENDER_PENDING_TIMEOUT):
+        transaction.on_commit(
+            lambda: async_task("school_menu.tasks.prerender_school_menu", school_id)
+        )
@@ -0,0 +1,84 @@
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse
+
+from school_menu.models import RateLimitBucket
+
+# the tokens of a bucket refilled since its last request, up to the rate
+REFILLED_TOKENS = (
+    "CASE WHEN {table}.tokens + (excluded.updated_at - {table}.updated_at) * %s / %s"
+    " < %s THEN {table}.tokens + (excluded.updated_at - {table}.updated_at) * %s / %s"
+    " ELSE %s END"
+)
+TAKE_TOKEN_SQL = """
+INSERT INTO {table} (key, tokens, updated_at, allowed) VALUES (%s, %s, %s, %s)
+ON CONFLICT (key) DO UPDATE SET
+    tokens = CASE WHEN {refilled} >= 1 THEN {refilled} - 1 ELSE {refilled} END,
+    updated_at = excluded.updated_at,
+    allowed = {refilled} >= 1
+RETURNING tokens, allowed
+"""
+
+
+def get_client_ip(request):
+    """
+    Get the ip of the client, as seen by the first of RATE_LIMIT_PROXY_COUNT proxies
+    """
+    proxy_count = settings.RATE_LIMIT_PROXY_COUNT
+    forwarded_for = request.headers.get("x-forwarded-for")
+    if proxy_count and forwarded_for:
+        addresses = [address.strip() for address in forwarded_for.split(",")]
+        return addresses[-min(proxy_count, len(addresses))]
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def rate_limit_key(scope, client):
+    return f"{scope}:{client}"
+
+
+def hit(scope, client, rate, period, now=None):
+    """
+    Take a token from the client's bucket for the scope, returning the seconds
+    to wait before the next allowed request, 0 when it is allowed
+    """
+    now = time.time() if now is None else now
+    table = connection.ops.quote_name(RateLimitBucket._meta.db_table)
+    refilled = REFILLED_TOKENS.format(table=table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            TAKE_TOKEN_SQL.format(table=table, refilled=refilled),
+            [rate_limit_key(scope, client), rate - 1, now, True]
+            + [rate, period, rate, rate, period, rate] * 4,
+        )
+        tokens, allowed = cursor.fetchone()
+    if allowed:
+        return 0
+    return max(1, math.ceil((1 - tokens) * period / rate))
+
+
+def rate_limited(scope):
+    """
+    Limit the requests each client makes to the view to RATE_LIMITS[scope],
+    answering 429 with Retry-After once the limit is reached
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            rate, period = settings.RATE_LIMITS[scope]
+            retry_after = hit(scope, get_client_ip(request), rate, period)
+            if retry_after:
+                return HttpResponse(
+                    "Troppe richieste, riprova più tardi.",
+                    status=429,
+                    headers={"Retry-After": str(retry_after)},
+                )
+            return view(request, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
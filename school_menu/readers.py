@@ -0,0 +1,166 @@
+import codecs
+import csv
+import zipfile
+from functools import partial
+from itertools import chain
+from xml.etree.ElementTree import iterparse
+
+from django.core.exceptions import ValidationError
+from openpyxl import load_workbook
+
+SNIFF_SIZE = 4096
+CSV_CHUNK_SIZE = 64 * 1024
+CSV_DELIMITERS = ",;\t"
+ODS_MIMETYPE = b"application/vnd.oasis.opendocument.spreadsheet"
+ODS_TABLE = "{urn:oasis:names:tc:opendocument:xmlns:table:1.0}"
+ODS_OFFICE = "{urn:oasis:names:tc:opendocument:xmlns:office:1.0}"
+ODS_TEXT = "{urn:oasis:names:tc:opendocument:xmlns:text:1.0}"
+# repeated empty cells and rows pad an ODS sheet up to its size, they are not data
+ODS_MAX_REPEAT = 100
+
+
+def get_cell_text(value):
+    return "" if value is None else str(value).strip()
+
+
+def get_rows_by_header(rows):
+    """
+    Yield the rows after the first one as dicts keyed by the first one, skipping
+    empty rows
+    """
+    header = [get_cell_text(value) for value in next(rows, ())]
+    for row in rows:
+        if any(get_cell_text(value) for value in row):
+            yield dict(zip(header, row, strict=False))
+
+
+def iter_xlsx_rows(file):
+    """
+    Yield the rows of the first sheet of an Excel file as dicts keyed by the
+    header row, reading the workbook in read-only mode
+    """
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        yield from get_rows_by_header(
+            workbook.worksheets[0].iter_rows(values_only=True)
+        )
+    finally:
+        workbook.close()
+
+
+def get_ods_cell_value(cell):
+    if cell.get(f"{ODS_OFFICE}value-type") in ("float", "percentage", "currency"):
+        return float(cell.get(f"{ODS_OFFICE}value"))
+    return "\n".join("".join(p.itertext()) for p in cell.iter(f"{ODS_TEXT}p"))
+
+
+def iter_ods_table_rows(content):
+    """
+    Yield the rows of the first table of an ODS content.xml as lists of values,
+    parsing it incrementally and dropping every row once it is read
+    """
+    for event, element in iterparse(content, events=("end",)):
+        if element.tag == f"{ODS_TABLE}table-row":
+            row = []
+            for cell in element:
+                repeat = int(cell.get(f"{ODS_TABLE}number-columns-repeated", 1))
+                row.extend([get_ods_cell_value(cell)] * min(repeat, ODS_MAX_REPEAT))
+            repeat = int(element.get(f"{ODS_TABLE}number-rows-repeated", 1))
+            for _ in range(min(repeat, ODS_MAX_REPEAT)):
+                yield row
+            element.clear()
+        elif element.tag == f"{ODS_TABLE}table":
+            return
+
+
+def iter_ods_rows(file):
+    """
+    Yield the rows of the first sheet of an OpenDocument spreadsheet as dicts keyed
+    by the header row, streaming its content.xml. Empty rows are skipped.
+    """
+    with zipfile.ZipFile(file) as archive, archive.open("content.xml") as content:
+        yield from get_rows_by_header(iter_ods_table_rows(content))
+
+
+def get_text_encoding(sample):
+    """
+    Get the encoding of a text file from its first bytes: UTF-8 (with or without
+    BOM) when they decode as such, the Windows codepage of Excel otherwise
+    """
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(sample)
+    except UnicodeDecodeError:
+        return "cp1252"
+    return "utf-8-sig"
+
+
+def iter_lines(chunks, encoding):
+    """
+    Decode the chunks of a file incrementally and split them in lines, keeping the
+    line endings so that the csv module handles quoted newlines
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    pending = ""
+    for chunk in chunks:
+        *lines, pending = (pending + decoder.decode(chunk)).split("\n")
+        for line in lines:
+            yield f"{line}\n"
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+def get_csv_delimiter(sample):
+    """
+    Get the delimiter of a CSV file as the most frequent of comma, semicolon and
+    tab in its header line, which holds no quoted text unlike the menu rows
+    """
+    header = sample.split("\n", 1)[0]
+    return max(CSV_DELIMITERS, key=header.count)
+
+
+def iter_csv_rows(file):
+    """
+    Yield the rows of a CSV file as dicts keyed by the header row, reading it in
+    chunks
+    """
+    first_chunk = file.read(CSV_CHUNK_SIZE)
+    encoding = get_text_encoding(first_chunk[:SNIFF_SIZE])
+    delimiter = get_csv_delimiter(first_chunk[:SNIFF_SIZE].decode(encoding, "ignore"))
+    chunks = chain([first_chunk], iter(partial(file.read, CSV_CHUNK_SIZE), b""))
+    yield from get_rows_by_header(
+        csv.reader(iter_lines(chunks, encoding), delimiter=delimiter)
+    )
+
+
+def detect_format(file):
+    """
+    Detect the format of a spreadsheet from its first bytes: "ods", "xlsx", "csv"
+    or None
+    """
+    file.seek(0)
+    sample = file.read(SNIFF_SIZE)
+    file.seek(0)
+    if sample.startswith(b"PK\x03\x04"):
+        return "ods" if ODS_MIMETYPE in sample else "xlsx"
+    if sample and b"\x00" not in sample:
+        return "csv"
+    return None
+
+
+READERS = {
+    "xlsx": iter_xlsx_rows,
+    "ods": iter_ods_rows,
+    "csv": iter_csv_rows,
+}
+
+
+def iter_rows(file):
+    """
+    Yield the rows of an uploaded menu as dicts keyed by the header row, with the
+    reader of the format detected from its content
+    """
+    file_format = detect_format(file)
+    if file_format is None:
+        raise ValidationError("Formato non valido. Il file non è un foglio di calcolo.")
+    yield from READERS[file_format](file)
@@ -0,0 +1,281 @@
+import hashlib
+import re
+import unicodedata
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import connection
+
+from school_menu.models import School
+
+MAX_SEARCH_RESULTS = 50
+# results up to this size are cached whole and narrowed in memory for longer queries
+SEARCH_CACHE_THRESHOLD = 200
+SEARCH_CACHE_TIMEOUT = 60 * 10
+SEARCH_VERSION_KEY = "school_menu:search:version"
+
+
+class SqliteSchoolIndex:
+    """School search index stored in an FTS5 table, rowid is the school id"""
+
+    create_sql = [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS school_menu_school_fts "
+        'USING fts5(name, city, tokenize="unicode61 remove_diacritics 2")',
+    ]
+    drop_sql = ["DROP TABLE IF EXISTS school_menu_school_fts"]
+    index_sql = [
+        "DELETE FROM school_menu_school_fts WHERE rowid = %s",
+        "INSERT INTO school_menu_school_fts (rowid, name, city) VALUES (%s, %s, %s)",
+    ]
+    unindex_sql = "DELETE FROM school_menu_school_fts WHERE rowid = %s"
+    rebuild_sql = [
+        "DELETE FROM school_menu_school_fts",
+        "INSERT INTO school_menu_school_fts (rowid, name, city) "
+        "SELECT id, name, city FROM school_menu_school",
+    ]
+    # bm25 is lower for better matches, a match on the name weighs more than the city
+    search_sql = (
+        "SELECT rowid FROM school_menu_school_fts "
+        "WHERE school_menu_school_fts MATCH %s "
+        "ORDER BY bm25(school_menu_school_fts, 10.0, 1.0), rowid LIMIT %s OFFSET %s"
+    )
+    rank_sql = (
+        "SELECT rowid FROM school_menu_school_fts "
+        "WHERE school_menu_school_fts MATCH %s AND rowid IN ({school_ids}) "
+        "ORDER BY bm25(school_menu_school_fts, 10.0, 1.0), rowid"
+    )
+
+    def get_index_params(self, school):
+        return [[school.pk], [school.pk, school.name, school.city]]
+
+    def get_match_query(self, terms):
+        return " ".join(f'"{term}"*' for term in terms)
+
+
+class PostgresSchoolIndex:
+    """School search index stored as an unaccented tsvector with a GIN index"""
+
+    document_sql = (
+        "setweight(to_tsvector('simple', unaccent({name})), 'A') || "
+        "setweight(to_tsvector('simple', unaccent({city})), 'B')"
+    )
+    create_sql = [
+        "CREATE EXTENSION IF NOT EXISTS unaccent",
+        "CREATE TABLE IF NOT EXISTS school_menu_school_search ("
+        "school_id bigint PRIMARY KEY REFERENCES school_menu_school (id) "
+        "ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+        "document tsvector NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS school_menu_school_search_document "
+        "ON school_menu_school_search USING GIN (document)",
+    ]
+    drop_sql = ["DROP TABLE IF EXISTS school_menu_school_search"]
+    index_sql = [
+        "INSERT INTO school_menu_school_search (school_id, document) "
+        f"VALUES (%s, {document_sql.format(name='%s', city='%s')}) "
+        "ON CONFLICT (school_id) DO UPDATE SET document = EXCLUDED.document",
+    ]
+    unindex_sql = "DELETE FROM school_menu_school_search WHERE school_id = %s"
+    rebuild_sql = [
+        "INSERT INTO school_menu_school_search (school_id, document) "
+        f"SELECT id, {document_sql.format(name='name', city='city')} "
+        "FROM school_menu_school "
+        "ON CONFLICT (school_id) DO UPDATE SET document = EXCLUDED.document",
+    ]
+    search_sql = (
+        "SELECT school_id FROM school_menu_school_search, "
+        "to_tsquery('simple', %s) AS query "
+        "WHERE document @@ query "
+        "ORDER BY ts_rank(document, query) DESC, school_id LIMIT %s OFFSET %s"
+    )
+    rank_sql = (
+        "SELECT school_id FROM school_menu_school_search, "
+        "to_tsquery('simple', %s) AS query "
+        "WHERE document @@ query AND school_id IN ({school_ids}) "
+        "ORDER BY ts_rank(document, query) DESC, school_id"
+    )
+
+    def get_index_params(self, school):
+        return [[school.pk, school.name, school.city]]
+
+    def get_match_query(self, terms):
+        return " & ".join(f"{term}:*" for term in terms)
+
+
+SEARCH_INDEXES = {
+    "sqlite": SqliteSchoolIndex(),
+    "postgresql": PostgresSchoolIndex(),
+}
+
+
+def get_search_index(using=None):
+    """
+    Get the search index implementation for the vendor of the given connection
+    """
+    return SEARCH_INDEXES[(using or connection).vendor]
+
+
+def normalize_text(text):
+    """
+    Lowercase the text and strip its accents ("Città" becomes "citta")
+    """
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def get_search_terms(query):
+    """
+    Split a search query in normalized words, punctuation is ignored
+    """
+    return re.findall(r"\w+", normalize_text(query or ""))
+
+
+def create_search_index(using=None):
+    """
+    Create the school search index and fill it with every school
+    """
+    using = using or connection
+    search_index = get_search_index(using)
+    with using.cursor() as cursor:
+        for sql in search_index.create_sql + search_index.rebuild_sql:
+            cursor.execute(sql)
+
+
+def drop_search_index(using=None):
+    using = using or connection
+    with using.cursor() as cursor:
+        for sql in get_search_index(using).drop_sql:
+            cursor.execute(sql)
+
+
+def rebuild_search_index():
+    """
+    Index again every school, returning the number of schools
+    """
+    with connection.cursor() as cursor:
+        for sql in get_search_index().rebuild_sql:
+            cursor.execute(sql)
+    return School.objects.count()
+
+
+def index_school(school):
+    """
+    Add the school to the search index or update its entry
+    """
+    search_index = get_search_index()
+    with connection.cursor() as cursor:
+        for sql, params in zip(
+            search_index.index_sql, search_index.get_index_params(school), strict=True
+        ):
+            cursor.execute(sql, params)
+
+
+def unindex_school(school_id):
+    """
+    Remove the school from the search index
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(get_search_index().unindex_sql, [school_id])
+
+
+def find_schools(query, limit=MAX_SEARCH_RESULTS, offset=0):
+    """
+    Find the schools whose name or city match every word of the query, ranked by
+    relevance
+    """
+    terms = get_search_terms(query)
+    if not terms:
+        return []
+    search_index = get_search_index()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            search_index.search_sql,
+            [search_index.get_match_query(terms), limit, offset],
+        )
+        school_ids = [row[0] for row in cursor.fetchall()]
+    schools = School.objects.in_bulk(school_ids)
+    return [schools[school_id] for school_id in school_ids if school_id in schools]
+
+
+def rank_schools(schools, terms):
+    """
+    Order the schools as the search index ranks them for the terms, with a single
+    query on the index
+    """
+    if not schools:
+        return []
+    search_index = get_search_index()
+    schools_by_id = {school.pk: school for school in schools}
+    with connection.cursor() as cursor:
+        cursor.execute(
+            search_index.rank_sql.format(
+                school_ids=", ".join(["%s"] * len(schools_by_id))
+            ),
+            [search_index.get_match_query(terms), *schools_by_id],
+        )
+        return [schools_by_id[row[0]] for row in cursor.fetchall()]
+
+
+def get_search_version():
+    """
+    Get the version of the cached search results, changed by every school change
+    """
+    return cache.get_or_set(SEARCH_VERSION_KEY, uuid4().hex, None)
+
+
+def invalidate_search_cache():
+    cache.set(SEARCH_VERSION_KEY, uuid4().hex, None)
+
+
+def search_cache_key(version, normalized_query):
+    query_hash = hashlib.md5(normalized_query.encode()).hexdigest()
+    return f"school_menu:search:{version}:{query_hash}"
+
+
+def matches_terms(school, terms):
+    """
+    Tell whether every term is the beginning of a word of the school's name or city,
+    as the search index does
+    """
+    words = get_search_terms(f"{school.name} {school.city}")
+    return all(any(word.startswith(term) for word in words) for term in terms)
+
+
+def get_cached_results(terms, version):
+    """
+    Get the cached results of the query, or narrow those of the longest cached
+    query it starts with. None when nothing is cached.
+    """
+    normalized_query = " ".join(terms)
+    prefixes = [normalized_query[:end] for end in range(len(normalized_query), 0, -1)]
+    keys = [search_cache_key(version, prefix.strip()) for prefix in prefixes]
+    cached = cache.get_many(keys)
+    for key in keys:
+        if key in cached:
+            if key == keys[0]:
+                return cached[key]
+            results = rank_schools(
+                [school for school in cached[key] if matches_terms(school, terms)],
+                terms,
+            )
+            cache.set(keys[0], results, SEARCH_CACHE_TIMEOUT)
+            return results
+    return None
+
+
+def find_schools_cached(query, limit=MAX_SEARCH_RESULTS, offset=0):
+    """
+    Find schools like find_schools, narrowing cached results for longer queries
+    """
+    terms = get_search_terms(query)
+    if not terms:
+        return []
+    version = get_search_version()
+    results = get_cached_results(terms, version)
+    if results is None:
+        results = find_schools(query, limit=SEARCH_CACHE_THRESHOLD + 1)
+        if len(results) > SEARCH_CACHE_THRESHOLD and offset + limit > len(results):
+            return find_schools(query, limit=limit, offset=offset)
+        if len(results) <= SEARCH_CACHE_THRESHOLD:
+            key = search_cache_key(version, " ".join(terms))
+            cache.set(key, results, SEARCH_CACHE_TIMEOUT)
+    return results[offset : offset + limit]
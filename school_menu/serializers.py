@@ -1,9 +1,61 @@
-from rest_framework import serializers
+from school_menu.models import DetailedMeal
 
-from .models import Meal
 
+def serialize_school(school):
+    """Serialize the public data of a school"""
+    return {
+        "name": school.name,
+        "slug": school.slug,
+        "city": school.city,
+        "menu_type": school.menu_type,
+        "url": school.get_absolute_url(),
+    }
 
-class MealSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = Meal
-        fields = ["day", "first_course", "second_course", "fruit", "side_dish", "snack"]
+
+def serialize_meal(meal):
+    """Serialize a simple or detailed meal, None when there is no meal"""
+    if meal is None:
+        return None
+    data = {
+        "day": meal.day,
+        "week": meal.week,
+        "season": meal.season,
+        "type": meal.type,
+        "snack": meal.snack,
+    }
+    if isinstance(meal, DetailedMeal):
+        data.update(
+            {
+                "first_course": meal.first_course,
+                "second_course": meal.second_course,
+                "side_dish": meal.side_dish,
+                "fruit": meal.fruit,
+            }
+        )
+    else:
+        data["menu"] = meal.menu
+    return data
+
+
+def serialize_menu(menu, meal, weekly_meals=None):
+    """Serialize a resolved menu with the meal of the day and optionally the whole week"""
+    data = {
+        "school": serialize_school(menu.school),
+        "season": menu.season,
+        "week": menu.week,
+        "day": menu.day,
+        "meal": serialize_meal(meal),
+    }
+    if weekly_meals is not None:
+        data["weekly_meals"] = [serialize_meal(meal) for meal in weekly_meals]
+    return data
+
+
+def serialize_dish_matches(school, meals):
+    """Serialize a school with the (season, week, day, type) of the meals serving a dish"""
+    data = serialize_school(school)
+    data["meals"] = [
+        {"season": season, "week": week, "day": day, "type": meal_type}
+        for season, week, day, meal_type in meals
+    ]
+    return data
@@ -0,0 +1,275 @@
+import os
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date
+from functools import cached_property, partial, reduce
+from operator import or_
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+from school_menu.cache import (
+    get_cached_weekly_meals,
+    get_meal_model,
+    get_weekly_meals,
+)
+from school_menu.calendar import get_today, resolve_date_range, resolve_school_date
+from school_menu.models import DailyMenu, DetailedMeal, Meal, School, SimpleMeal
+from school_menu.utils import get_meal_for_day
+
+DAILY_MENU_PENDING_TIMEOUT = 60
+
+
+@dataclass(frozen=True)
+class ResolvedMenu:
+    """
+    The menu of a school for a given season, week, day and type
+    """
+
+    school: School
+    season: int
+    week: int
+    day: int
+    type: int
+    meal_ids: tuple | None = None
+    cached: bool = True
+
+    @cached_property
+    def weekly_meals(self):
+        get_meals = get_cached_weekly_meals if self.cached else get_weekly_meals
+        return get_meals(self.school, self.season, self.week, self.type, self.meal_ids)
+
+    @cached_property
+    def meal(self):
+        return get_meal_for_day(self.weekly_meals, self.day)
+
+    @property
+    def context(self):
+        return {
+            "school": self.school,
+            "meal": self.meal,
+            "weekly_meals": self.weekly_meals,
+            "week": self.week,
+            "day": self.day,
+            "type": self.type,
+        }
+
+
+@dataclass(frozen=True)
+class MenuCalendarDay:
+    """The menu of a school for a single date of a date range"""
+
+    date: date
+    season: int
+    week: int
+    day: int
+    meal: Meal | None
+
+
+def get_loaded_daily_menu(school):
+    """
+    Get today's DailyMenu of a school only when it was loaded along with the school
+    (select_related("daily_menu")), so that no query is ever made
+    """
+    related = School.daily_menu.related
+    if not related.is_cached(school):
+        return None
+    daily_menu = related.get_cached_value(school)
+    if daily_menu is None or daily_menu.date != get_today():
+        return None
+    return daily_menu
+
+
+def resolve_menu(
+    school, week=None, day=None, meal_type=Meal.Types.STANDARD, cached=True
+):
+    """
+    Resolve the menu of the given school, defaulting to the current week and day.
+    Query budget: at most 2 queries for an anonymous school_menu hit (+1 on
+    PostgreSQL for the statement timeout).
+    """
+    daily_menu = get_loaded_daily_menu(school)
+    if (
+        daily_menu is not None
+        and week is None
+        and day is None
+        and meal_type == Meal.Types.STANDARD
+    ):
+        return ResolvedMenu(
+            school=school,
+            season=daily_menu.season,
+            week=daily_menu.week,
+            day=daily_menu.day,
+            type=meal_type,
+            meal_ids=tuple(daily_menu.weekly_meal_ids),
+            cached=cached,
+        )
+    today = resolve_school_date(school)
+    return ResolvedMenu(
+        school=school,
+        season=today.season,
+        week=today.week if week is None else week,
+        day=today.day if day is None else day,
+        type=meal_type,
+        cached=cached,
+    )
+
+
+def fetch_school_meals(lookups, meal_type=Meal.Types.STANDARD):
+    """
+    Fetch the meals of each (school, lookup) pair ordered by day, one query per
+    meal table
+    """
+    meals = []
+    for model in (SimpleMeal, DetailedMeal):
+        groups = defaultdict(list)
+        for school, lookup in lookups:
+            if get_meal_model(school) is model:
+                groups[tuple(sorted(lookup.items()))].append(school.pk)
+        if not groups:
+            continue
+        condition = reduce(
+            or_,
+            (
+                Q(school__in=school_ids, **dict(lookup))
+                for lookup, school_ids in groups.items()
+            ),
+        )
+        meals.extend(model.objects.filter(condition, type=meal_type).order_by("day"))
+    return meals
+
+
+def resolve_today_menus(schools, meal_type=Meal.Types.STANDARD):
+    """
+    Resolve today's menu of many schools at once, returning (menu, meal) pairs
+    """
+    menus = [resolve_menu(school, meal_type=meal_type) for school in schools]
+    lookups = [
+        (menu.school, {"season": menu.season, "week": menu.week, "day": menu.day})
+        for menu in menus
+    ]
+    meals = {meal.school_id: meal for meal in fetch_school_meals(lookups, meal_type)}
+    return [(menu, meals.get(menu.school.pk)) for menu in menus]
+
+
+def group_by_menu_week(menus):
+    """
+    Group (menu, meal) pairs by the season and week of the menu, keeping their order
+    within each group
+    """
+    groups = defaultdict(list)
+    for menu, meal in sorted(menus, key=lambda pair: (pair[0].season, pair[0].week)):
+        groups[(menu.season, menu.week)].append((menu, meal))
+    return [
+        {
+            "season": Meal.Seasons(season),
+            "week": Meal.Weeks(week),
+            "menus": group,
+        }
+        for (season, week), group in groups.items()
+    ]
+
+
+def build_daily_menus(schools, day):
+    """
+    Build the DailyMenu of the given schools for the given day
+    """
+    menu_dates = {school.pk: resolve_school_date(school, day) for school in schools}
+    lookups = [
+        (
+            school,
+            {
+                "season": menu_dates[school.pk].season,
+                "week": menu_dates[school.pk].week,
+            },
+        )
+        for school in schools
+    ]
+    weekly_meals = defaultdict(list)
+    for meal in fetch_school_meals(lookups):
+        weekly_meals[meal.school_id].append(meal)
+    daily_menus = []
+    for school in schools:
+        menu_date = menu_dates[school.pk]
+        daily_menus.append(
+            DailyMenu(
+                school=school,
+                date=day,
+                season=menu_date.season,
+                week=menu_date.week,
+                day=menu_date.day,
+                weekly_meal_ids=[meal.pk for meal in weekly_meals[school.pk]],
+            )
+        )
+    return daily_menus
+
+
+def save_daily_menus(daily_menus):
+    """
+    Insert or update the given DailyMenu with a single query
+    """
+    DailyMenu.objects.bulk_create(
+        daily_menus,
+        update_conflicts=True,
+        unique_fields=["school"],
+        update_fields=["date", "season", "week", "day", "weekly_meal_ids"],
+    )
+
+
+def daily_menu_pending_key(school_id):
+    return f"school_menu:daily_menu:pending:{os.getpid()}:{school_id}"
+
+
+def schedule_daily_menu_refresh(school_id):
+    """
+    Resolve again today's menu of a school once the transaction is committed.
+    A single refresh is run for many changes in a row, e.g. a weekly menu saved.
+    """
+    if cache.add(daily_menu_pending_key(school_id), True, DAILY_MENU_PENDING_TIMEOUT):
+        transaction.on_commit(partial(refresh_daily_menu, school_id))
+
+
+def refresh_daily_menu(school_id):
+    """
+    Resolve again today's menu of a school after its meals or settings changed
+    """
+    cache.delete(daily_menu_pending_key(school_id))
+    school = School.objects.filter(pk=school_id).first()
+    if school is not None:
+        save_daily_menus(build_daily_menus([school], get_today()))
+
+
+def resolve_menu_range(school, start, end, meal_type=Meal.Types.STANDARD):
+    """
+    Resolve the menu of every school day between start and end (included)
+    """
+    menu_dates = resolve_date_range(start, end, school.week_bias, school.season_choice)
+    meals = get_meal_model(school).objects.filter(
+        school=school,
+        type=meal_type,
+        season__in={menu_date.season for menu_date in menu_dates.values()},
+        week__in={menu_date.week for menu_date in menu_dates.values()},
+    )
+    meals_by_key = {(meal.season, meal.week, meal.day): meal for meal in meals}
+    return [
+        MenuCalendarDay(
+            date=day,
+            season=menu_date.season,
+            week=menu_date.week,
+            day=menu_date.day,
+            meal=meals_by_key.get((menu_date.season, menu_date.week, menu_date.day)),
+        )
+        for day, menu_date in menu_dates.items()
+    ]
+
+
+def group_by_week(calendar_days):
+    """
+    Group calendar days in weeks of 5 slots (monday to friday), missing days are None
+    """
+    weeks = {}
+    for calendar_day in calendar_days:
+        week = weeks.setdefault(calendar_day.date.isocalendar()[:2], [None] * 5)
+        week[calendar_day.date.weekday()] = calendar_day
+    return list(weeks.values())
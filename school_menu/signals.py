@@ -0,0 +1,85 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from school_menu.autocomplete import (
+    remove_from_autocomplete_index,
+    update_autocomplete_index,
+)
+from school_menu.cache import (
+    invalidate_city_directory,
+    invalidate_menu_cache,
+    is_bulk_menu_write,
+    mark_menu_changed,
+    menu_changed,
+)
+from school_menu.dishes import index_meal_dishes, unindex_meal_dishes
+from school_menu.models import DetailedMeal, School, SimpleMeal
+from school_menu.prerender import discard_prerendered_menu, schedule_prerender
+from school_menu.search import index_school, invalidate_search_cache, unindex_school
+from school_menu.services import schedule_daily_menu_refresh
+
+
+@receiver(post_save, sender=School)
+def school_saved(sender, instance, **kwargs):
+    """Drop the cached menus of a saved school, refresh its menu and search entry"""
+    invalidate_menu_cache(instance.pk)
+    invalidate_city_directory()
+    discard_prerendered_menu(instance.pk)
+    schedule_prerender(instance.pk)
+    schedule_daily_menu_refresh(instance.pk)
+    transaction.on_commit(partial(update_autocomplete_index, instance))
+    index_school(instance)
+    invalidate_search_cache()
+
+
+@receiver(post_delete, sender=School)
+def school_deleted(sender, instance, **kwargs):
+    """Drop the cached menus, the rendered page and the search entry of a deleted school"""
+    invalidate_menu_cache(instance.pk)
+    invalidate_city_directory()
+    discard_prerendered_menu(instance.pk)
+    unindex_school(instance.pk)
+    invalidate_search_cache()
+    transaction.on_commit(partial(remove_from_autocomplete_index, instance.pk))
+
+
+@receiver(post_save, sender=SimpleMeal)
+@receiver(post_delete, sender=SimpleMeal)
+@receiver(post_save, sender=DetailedMeal)
+@receiver(post_delete, sender=DetailedMeal)
+def meal_changed(sender, instance, **kwargs):
+    """Drop the cached menus and bump the menu version of the meal's school"""
+    if instance.school_id and not is_bulk_menu_write():
+        mark_menu_changed(instance.school_id)
+
+
+@receiver(post_save, sender=SimpleMeal)
+@receiver(post_save, sender=DetailedMeal)
+def meal_saved(sender, instance, **kwargs):
+    """Index the dishes of a saved meal"""
+    if instance.school_id:
+        index_meal_dishes(instance)
+
+
+@receiver(post_delete, sender=SimpleMeal)
+@receiver(post_delete, sender=DetailedMeal)
+def meal_deleted(sender, instance, **kwargs):
+    """Remove the dishes of a deleted meal from the index"""
+    if instance.school_id and not is_bulk_menu_write():
+        unindex_meal_dishes(instance)
+
+
+@receiver(menu_changed)
+def refresh_prerendered_menu(sender, school_id, **kwargs):
+    """Serve the menu page dynamically until it is rendered again"""
+    discard_prerendered_menu(school_id)
+    schedule_prerender(school_id)
+
+
+@receiver(menu_changed)
+def refresh_school_daily_menu(sender, school_id, **kwargs):
+    """Resolve today's menu of the school again once the change is committed"""
+    schedule_daily_menu_refresh(school_id)
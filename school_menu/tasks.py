@@ -0,0 +1,113 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.shortcuts import render
+from django.test import RequestFactory
+from django_q.tasks import async_task
+
+from school_menu.calendar import get_today
+from school_menu.models import MenuImport, RateLimitBucket, School
+from school_menu.prerender import (
+    get_prerender_host,
+    prerender_pending_key,
+    remove_stale_prerender_dirs,
+    write_prerendered_menu,
+)
+from school_menu.services import build_daily_menus, resolve_menu, save_daily_menus
+from school_menu.utils import import_menu
+
+# schools rendered by each prerender task, well within the cluster timeout
+PRERENDER_BATCH_SIZE = 200
+
+
+def render_school_menu(school, host):
+    """
+    Render today's public menu page of a school for an anonymous user
+    """
+    request = RequestFactory().get(school.get_absolute_url(), HTTP_HOST=host)
+    request.user = AnonymousUser()
+    menu = resolve_menu(school, cached=False)
+    response = render(request, "school-menu.html", menu.context)
+    return response.content
+
+
+def prerender_school_menu(school_id):
+    """Render the public menu page of a school to a static file"""
+    cache.delete(prerender_pending_key(school_id))
+    host = get_prerender_host()
+    school = School.objects.filter(pk=school_id).first()
+    if school is not None and host is not None:
+        write_prerendered_menu(school.pk, render_school_menu(school, host))
+
+
+def prerender_school_menus(school_ids, day, host):
+    """Render the public menu pages of a batch of schools for the given day"""
+    schools = School.objects.filter(pk__in=school_ids)
+    for school in schools:
+        write_prerendered_menu(school.pk, render_school_menu(school, host), day)
+    return len(schools)
+
+
+def prerender_menus(batch_size=PRERENDER_BATCH_SIZE, sync=False):
+    """
+    Render today's menu page of every school in batched tasks, or right away with
+    sync, returning the number of schools
+    """
+    day = get_today()
+    remove_stale_prerender_dirs(day)
+    host = get_prerender_host()
+    if host is None:
+        return 0
+    school_ids = list(School.objects.order_by("pk").values_list("pk", flat=True))
+    for start in range(0, len(school_ids), batch_size):
+        batch = school_ids[start : start + batch_size]
+        if sync:
+            prerender_school_menus(batch, day, host)
+        else:
+            async_task("school_menu.tasks.prerender_school_menus", batch, day, host)
+    return len(school_ids)
+
+
+def rebuild_daily_menus(batch_size=500):
+    """Resolve today's menu of every school, run right after midnight"""
+    day = get_today()
+    schools = School.objects.order_by("pk")
+    count = 0
+    for start in range(0, schools.count(), batch_size):
+        batch = list(schools[start : start + batch_size])
+        save_daily_menus(build_daily_menus(batch, day))
+        count += len(batch)
+    return count
+
+
+def import_school_menu(menu_import_id):
+    """
+    Import the file uploaded for a MenuImport, reading it from the storage, the
+    progress is recorded on the MenuImport. The file is deleted once read.
+    """
+    menu_import = MenuImport.objects.select_related("school").get(pk=menu_import_id)
+    try:
+        with menu_import.file.open("rb") as file:
+            import_menu(menu_import, file)
+    except Exception:
+        menu_import.status = MenuImport.Statuses.FAILED
+        menu_import.message = "Non è stato possibile importare il menu"
+        menu_import.save(update_fields=["status", "message", "updated_at"])
+        raise
+    finally:
+        menu_import.file.delete(save=False)
+        menu_import.save(update_fields=["file"])
+
+
+def purge_rate_limit_buckets():
+    """
+    Delete the rate limit buckets idle for longer than every period, they are full
+    again and a missing bucket starts full
+    """
+    period = max(period for _, period in settings.RATE_LIMITS.values())
+    deleted, _ = RateLimitBucket.objects.filter(
+        updated_at__lt=time.time() - period
+    ).delete()
+    return deleted
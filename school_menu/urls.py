@@ -9,15 +9,26 @@ urlpatterns = [
     path("", views.index, name="index"),
     path("settings/<int:pk>/", views.settings_view, name="settings"),
     path("school_list", views.school_list, name="school_list"),
+    path("school_list/all/", views.school_directory, name="school_directory"),
+    path("citta/", views.city_list, name="city_list"),
+    path("citta/<slug:slug>/", views.city_schools, name="city_schools"),
+    path("citta/<slug:slug>/menu/", views.district_menu, name="district_menu"),
     path(
         "get-menu/<int:week>/<int:day>/<int:type>/<int:school_id>/",
         views.get_menu,
         name="get_menu",
     ),
     path("info", TemplateView.as_view(template_name="pages/info.html"), name="info"),
-    # TODO: get this url back when ISSUE #34 is implemented
-    # path("json_menu", views.json_menu, name="json_menu"),
+    path("json_menu/", views.json_menu_bulk, name="json_menu_bulk"),
+    path("json_dishes/", views.dish_search, name="dish_search"),
+    path("json_menu/<slug:slug>/", views.json_menu, name="json_menu"),
     path("menu/<slug:slug>/", views.school_menu, name="school_menu"),
+    path("menu/<slug:slug>/menu.ics", views.school_menu_ics, name="school_menu_ics"),
+    path(
+        "menu/<slug:slug>/calendar/",
+        views.school_menu_calendar,
+        name="school_menu_calendar",
+    ),
     path(
         "menu/<int:school_id>/<int:week>/<int:season>/",
         views.create_weekly_menu,
@@ -30,8 +41,18 @@ htmx_urlpatterns = [
     path("school/create/", views.school_create, name="school_create"),
     path("school/update/", views.school_update, name="school_update"),
     path("menu/<int:school_id>/upload/", views.upload_menu, name="upload_menu"),
+    path(
+        "menu/import/<uuid:pk>/",
+        views.menu_import_status,
+        name="menu_import_status",
+    ),
     path("settings/<int:pk>/menu/", views.menu_settings_partial, name="menu_settings"),
     path("search-schools/", views.search_schools, name="search_schools"),
+    path(
+        "autocomplete-schools/",
+        views.autocomplete_schools,
+        name="autocomplete_schools",
+    ),
 ]
 
 urlpatterns += htmx_urlpatterns
@@ -1,58 +1,94 @@
-from datetime import datetime
+import hashlib
+from dataclasses import dataclass
+from datetime import timedelta
 
-import pandas as pd
-from django.contrib import messages
 from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import transaction
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
 
-from school_menu.models import DetailedMeal, School, SimpleMeal
+from school_menu.cache import bulk_menu_write, mark_menu_changed
+from school_menu.dishes import index_school_dishes
+from school_menu.models import DetailedMeal, Meal, MenuImport, School, SimpleMeal
+from school_menu.readers import get_cell_text, iter_rows
 
 
-# TODO: need to refactor this function when number of weeks is different than 4 in settings
-def calculate_week(week, bias):
+def get_meal_for_day(weekly_meals, day):
     """
-    Getting week number from today's date translated to week number available in Meal model (1,2,3,4) shifted by bias
+    Pick the meal of the given day from the already loaded weekly meals
     """
-    week_number = (week + bias) / 4
-    floor_week_number = (week + bias) // 4
-    if week_number == floor_week_number:
-        return 4
-    else:
-        return int((week_number - floor_week_number) * 4)
+    return next((meal for meal in weekly_meals if meal.day == day), None)
 
 
-def get_current_date():
+def get_meal_type(request):
     """
-    Get current week and day
+    Get the meal type from the request query string, standard when missing or invalid
     """
-    today = datetime.now()
-    current_year, current_week, current_day = today.isocalendar()
-    # get next week monday's menu on weekends
-    if current_day > 5:
-        current_week = current_week + 1
-        adjusted_day = 1
-    else:
-        adjusted_day = current_day
-    return current_week, adjusted_day
+    try:
+        meal_type = int(request.GET.get("type", Meal.Types.STANDARD))
+    except ValueError:
+        return Meal.Types.STANDARD
+    if meal_type not in Meal.Types.values:
+        return Meal.Types.STANDARD
+    return meal_type
 
 
-def get_season(school):
+def get_offset(request, max_offset):
     """
-    Get season based on school's settings
+    Get the result offset from the request query string, 0 when missing or invalid
+    and never past max_offset
     """
-    season = school.season_choice
-    if season == School.Seasons.AUTOMATICA:
-        today = datetime.now()
-        day, month = today.day, today.month
-        if (
-            month in [10, 11, 12, 1, 2]
-            or (month == 3 and day < 21)
-            or (month == 9 and day > 22)
-        ):
-            season = School.Seasons.INVERNALE
-        else:
-            season = School.Seasons.PRIMAVERILE
-    return season
+    try:
+        offset = int(request.GET.get("offset", 0))
+    except ValueError:
+        return 0
+    return min(max(offset, 0), max_offset)
+
+
+def get_menu_validators(request, school, *parts):
+    """
+    Get the strong ETag and the Last-Modified date of a school's menu page
+    """
+    start_of_today = timezone.localtime().replace(
+        hour=0, minute=0, second=0, microsecond=0
+    )
+    last_modified = max(school.updated_at, start_of_today)
+    version = ":".join(
+        str(part)
+        for part in (
+            school.pk,
+            school.updated_at.timestamp(),
+            request.get_host(),
+            request.user.pk,
+            *parts,
+        )
+    )
+    etag = quote_etag(hashlib.md5(version.encode(), usedforsecurity=False).hexdigest())
+    return etag, last_modified
+
+
+def get_not_modified_response(request, etag, last_modified):
+    """
+    Get a 304 response if the client already has the current menu, None otherwise
+    """
+    response = get_conditional_response(
+        request, etag=etag, last_modified=int(last_modified.timestamp())
+    )
+    if response is not None:
+        set_menu_validators(response, etag, last_modified)
+    return response
+
+
+def set_menu_validators(response, etag, last_modified):
+    """
+    Set the ETag and Last-Modified headers on a menu response
+    """
+    response.headers["ETag"] = etag
+    response.headers["Last-Modified"] = http_date(last_modified.timestamp())
+    return response
 
 
 def get_user(pk):
@@ -62,88 +98,251 @@ def get_user(pk):
     return user
 
 
-def import_menu(request, file, menu_type, school, season):
-    """take a file and import the menu into the database dealing with validation errors and relative messages"""
-    df = pd.read_excel(file, engine="openpyxl")
-    # Check if 'day' rows contain only the day names
-    day_mapping = {
-        "Lunedì": 1,
-        "Martedì": 2,
-        "Mercoledì": 3,
-        "Giovedì": 4,
-        "Venerdì": 5,
+DAY_MAPPING = {
+    "Lunedì": Meal.Days.LUNEDÌ,
+    "Martedì": Meal.Days.MARTEDÌ,
+    "Mercoledì": Meal.Days.MERCOLEDÌ,
+    "Giovedì": Meal.Days.GIOVEDÌ,
+    "Venerdì": Meal.Days.VENERDÌ,
+}
+# meal model and columns of the uploaded file mapped to the meal fields, by menu type
+MENU_IMPORT_FIELDS = {
+    School.Types.DETAILED: (
+        DetailedMeal,
+        {
+            "primo": "first_course",
+            "secondo": "second_course",
+            "contorno": "side_dish",
+            "frutta": "fruit",
+            "spuntino": "snack",
+        },
+    ),
+    School.Types.SIMPLE: (SimpleMeal, {"pranzo": "menu", "spuntino": "snack"}),
+}
+
+
+def parse_integer(value):
+    """
+    Get the whole number of a cell ("2", 2 or 2.0), None when it is not one
+    """
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return int(number) if number.is_integer() else None
+
+
+def parse_day(value):
+    """
+    Get the day of a cell, given by name ("Lunedì") or by number (1)
+    """
+    text = get_cell_text(value)
+    return DAY_MAPPING.get(text, parse_integer(text))
+
+
+def get_column(row, column, field):
+    """
+    Get the value of a column of the row, also accepted with the name of its meal
+    field ("first_course" for "primo") as in the files exported by the admin
+    """
+    return row[column] if column in row else row.get(field)
+
+
+def validate_menu(rows, menu_type, season):
+    """
+    Validate and coerce the rows of an uploaded menu, yielding the meal fields of
+    each row
+    """
+    model, columns = MENU_IMPORT_FIELDS[menu_type]
+    required_columns = {"giorno": "day", "settimana": "week", **columns}
+    max_lengths = {
+        column: model._meta.get_field(field).max_length
+        for column, field in columns.items()
     }
-    df["giorno"] = df["giorno"].map(day_mapping)
-    if not df["giorno"].isin(day_mapping.values()).all():
-        messages.error(
-            request,
-            'Formato non valido. La colonna "giorno" contiene valori diversi dai giorni della settimana.',
-        )
-        return
-    if menu_type == School.Types.DETAILED:
-        # check if the file contains all the required columns
-        required_columns = [
-            "giorno",
-            "settimana",
-            "primo",
-            "secondo",
-            "contorno",
-            "frutta",
-            "spuntino",
-        ]
-        if not all(column in df.columns for column in required_columns):
-            messages.add_message(
-                request,
-                messages.ERROR,
-                "Formato non valido. Il file non contiene tutte le colonne richieste.",
+    row_number = 1
+    for row_number, row in enumerate(rows, start=2):
+        if not all(
+            column in row or field in row for column, field in required_columns.items()
+        ):
+            raise ValidationError(
+                "Formato non valido. Il file non contiene tutte le colonne richieste."
             )
-            return
-
-        for index, row in df.iterrows():
-            DetailedMeal.objects.update_or_create(
-                week=row["settimana"],
-                day=row["giorno"],
-                season=season,
-                first_course=row["primo"],
-                second_course=row["secondo"],
-                side_dish=row["contorno"],
-                fruit=row["frutta"],
-                snack=row["spuntino"],
-                school=school,
+        row_season = get_cell_text(get_column(row, "stagione", "season"))
+        if row_season and parse_integer(row_season) != int(season):
+            continue
+        day = parse_day(get_column(row, "giorno", "day"))
+        if day not in Meal.Days.values:
+            raise ValidationError(
+                f'Formato non valido. La colonna "giorno" contiene valori diversi dai giorni della settimana (riga {row_number}).'
             )
-        messages.add_message(
-            request,
-            messages.SUCCESS,
-            "<strong>Menu</strong> salvato correttamente",
-        )
-        return
-    else:
-        # check if the file contains all the required columns
-        required_columns = [
-            "giorno",
-            "settimana",
-            "pranzo",
-            "spuntino",
-        ]
-        if not all(column in df.columns for column in required_columns):
-            messages.add_message(
-                request,
-                messages.ERROR,
-                "Formato non valido. Il file non contiene tutte le colonne richieste.",
+        week = parse_integer(get_column(row, "settimana", "week"))
+        if week not in Meal.Weeks.values:
+            raise ValidationError(
+                f'Formato non valido. La colonna "settimana" contiene valori diversi da 1, 2, 3 e 4 (riga {row_number}).'
             )
-            return
-        for index, row in df.iterrows():
-            SimpleMeal.objects.update_or_create(
-                week=row["settimana"],
-                day=row["giorno"],
-                season=season,
-                menu=row["pranzo"],
-                snack=row["spuntino"],
-                school=school,
+        meal_type = get_cell_text(get_column(row, "tipo", "type"))
+        meal_type = parse_integer(meal_type) if meal_type else Meal.Types.STANDARD
+        if meal_type not in Meal.Types.values:
+            raise ValidationError(
+                f'Formato non valido. La colonna "tipo" contiene valori diversi da 1, 2, 3 e 4 (riga {row_number}).'
+            )
+        meal = {"day": day, "week": week, "type": meal_type}
+        for column, field in columns.items():
+            meal[field] = get_cell_text(get_column(row, column, field))
+            if len(meal[field]) > max_lengths[column]:
+                raise ValidationError(
+                    f'Formato non valido. La colonna "{column}" contiene testi più lunghi di {max_lengths[column]} caratteri (riga {row_number}).'
+                )
+        yield meal
+    if row_number == 1:
+        raise ValidationError("Formato non valido. Il file non contiene alcun pasto.")
+
+
+# an unfinished import that records no progress for this long is given up on,
+# its task never started or was killed
+MENU_IMPORT_STALE_AFTER = timedelta(minutes=10)
+# rows read between two saves of the progress of an import
+MENU_IMPORT_PROGRESS_ROWS = 100
+
+
+def fail_stale_menu_import(menu_import):
+    """
+    Mark as failed an unfinished import that has not recorded any progress for
+    MENU_IMPORT_STALE_AFTER, so that its progress stops being polled
+    """
+    if (
+        not menu_import.is_finished
+        and timezone.now() - menu_import.updated_at > MENU_IMPORT_STALE_AFTER
+    ):
+        menu_import.status = MenuImport.Statuses.FAILED
+        menu_import.message = "Il caricamento del menu non è stato completato, riprova"
+        menu_import.file.delete(save=False)
+        menu_import.save(update_fields=["status", "message", "file", "updated_at"])
+
+
+def count_rows(rows, menu_import):
+    """
+    Count on a MenuImport the rows read from its file as they are consumed, saving
+    the count every MENU_IMPORT_PROGRESS_ROWS rows so that the progress is polled
+    """
+    for row in rows:
+        menu_import.rows_parsed += 1
+        if menu_import.rows_parsed % MENU_IMPORT_PROGRESS_ROWS == 0:
+            menu_import.save(update_fields=["rows_parsed", "updated_at"])
+        yield row
+
+
+@dataclass(frozen=True)
+class MenuDiff:
+    """The meals an import created, updated, deleted and left unchanged"""
+
+    created: int = 0
+    updated: int = 0
+    deleted: int = 0
+    unchanged: int = 0
+
+    @property
+    def written(self):
+        return self.created + self.updated
+
+    @property
+    def has_changes(self):
+        return bool(self.written or self.deleted)
+
+
+def save_menu(meals, menu_type, school, season):
+    """
+    Save the validated meals of a school's season, writing only the difference
+    with the saved ones. Returns the MenuDiff.
+    """
+    model, columns = MENU_IMPORT_FIELDS[menu_type]
+    fields = list(columns.values())
+    objs = {
+        (meal["week"], meal["day"], meal["type"]): model(
+            school=school, season=season, **meal
+        )
+        for meal in meals
+    }
+    with transaction.atomic():
+        saved_meals = {
+            (meal.week, meal.day, meal.type): meal
+            for meal in model.objects.select_for_update().filter(
+                school=school, season=season
             )
-        messages.add_message(
-            request,
-            messages.SUCCESS,
-            "<strong>Menu</strong> salvato correttamente",
+        }
+        to_create, to_update = [], []
+        for key, obj in objs.items():
+            meal = saved_meals.get(key)
+            if meal is None:
+                to_create.append(obj)
+            elif any(getattr(meal, field) != getattr(obj, field) for field in fields):
+                for field in fields:
+                    setattr(meal, field, getattr(obj, field))
+                to_update.append(meal)
+        meal_types = {key[2] for key in objs}
+        to_delete = [
+            meal.pk
+            for key, meal in saved_meals.items()
+            if key[2] in meal_types and key not in objs
+        ]
+        diff = MenuDiff(
+            created=len(to_create),
+            updated=len(to_update),
+            deleted=len(to_delete),
+            unchanged=len(objs) - len(to_create) - len(to_update),
         )
-        return
+        if not diff.has_changes:
+            return diff
+        if to_create:
+            model.objects.bulk_create(to_create)
+        if to_update:
+            model.objects.bulk_update(to_update, fields)
+        if to_delete:
+            with bulk_menu_write():
+                model.objects.filter(pk__in=to_delete).delete()
+        index_school_dishes([school.pk])
+    mark_menu_changed(school.pk)
+    return diff
+
+
+def import_menu(menu_import, file):
+    """
+    Import a menu file for the school of a MenuImport, recording the outcome
+    """
+    school = menu_import.school
+    menu_import.status = MenuImport.Statuses.RUNNING
+    menu_import.save(update_fields=["status", "updated_at"])
+    rows = count_rows(iter_rows(file), menu_import)
+    try:
+        diff = save_menu(
+            validate_menu(rows, school.menu_type, menu_import.season),
+            school.menu_type,
+            school,
+            menu_import.season,
+        )
+    except ValidationError as error:
+        menu_import.status = MenuImport.Statuses.FAILED
+        menu_import.message = error.message
+    else:
+        menu_import.status = MenuImport.Statuses.DONE
+        menu_import.rows_written = diff.written
+        menu_import.rows_created = diff.created
+        menu_import.rows_updated = diff.updated
+        menu_import.rows_deleted = diff.deleted
+        menu_import.message = (
+            "Menu salvato correttamente"
+            if diff.has_changes
+            else "Il menu è uguale a quello già salvato, nessuna modifica"
+        )
+    menu_import.save(
+        update_fields=[
+            "status",
+            "rows_parsed",
+            "rows_written",
+            "rows_created",
+            "rows_updated",
+            "rows_deleted",
+            "message",
+            "updated_at",
+        ]
+    )
@@ -1,128 +1,234 @@
+from datetime import timedelta
+from functools import partial
+from itertools import islice
+
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q
+from django.core.cache import cache
+from django.db import transaction
 from django.forms import modelformset_factory
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.template.loader import get_template, render_to_string
 from django.template.response import HttpResponse, TemplateResponse
 from django.urls import reverse
+from django.utils.cache import patch_cache_control
+from django.utils.http import urlencode
+from django.utils.safestring import mark_safe
+from django.views.decorators.http import require_GET
+from django_q.tasks import async_task
 
+from school_menu.autocomplete import get_autocomplete_index
+from school_menu.cache import (
+    ICS_CACHE_TIMEOUT,
+    cache_lines,
+    get_city_directory,
+    get_city_names,
+    ics_cache_key,
+    mark_menu_changed,
+)
+from school_menu.calendar import (
+    get_feed_range,
+    get_month_range,
+    get_today,
+    parse_date_range,
+)
+from school_menu.deadlines import with_deadline
+from school_menu.dishes import find_dish
 from school_menu.forms import (
     DetailedMealForm,
     SchoolForm,
     SimpleMealForm,
     UploadMenuForm,
 )
-from school_menu.models import DetailedMeal, School, SimpleMeal
+from school_menu.ics import iter_ics_lines
+from school_menu.models import DetailedMeal, MenuImport, School, SimpleMeal
+from school_menu.pagination import get_school_page
+from school_menu.prerender import get_prerendered_menu
+from school_menu.ratelimit import rate_limited
+from school_menu.search import find_schools_cached
+from school_menu.serializers import serialize_dish_matches, serialize_menu
+from school_menu.services import (
+    group_by_menu_week,
+    group_by_week,
+    resolve_menu,
+    resolve_menu_range,
+    resolve_today_menus,
+)
 from school_menu.utils import (
-    calculate_week,
-    get_current_date,
-    get_season,
+    fail_stale_menu_import,
+    get_meal_type,
+    get_menu_validators,
+    get_not_modified_response,
+    get_offset,
     get_user,
-    import_menu,
+    set_menu_validators,
 )
 
+API_CACHE_MAX_AGE = 60 * 5
+ICS_CONTENT_TYPE = "text/calendar; charset=utf-8"
+MAX_BULK_SCHOOLS = 100
+MAX_SEARCH_OFFSET = 500
+DIRECTORY_CHUNK_SIZE = 500
+# replaced by the streamed list items in the rendered directory page
+DIRECTORY_PLACEHOLDER = mark_safe("<!-- school-items -->")
+
 
 def index(request):
     context = {}
     if request.user.is_authenticated:
-        school = School.objects.filter(user=request.user).first()
+        school = (
+            School.objects.filter(user=request.user)
+            .select_related("daily_menu")
+            .first()
+        )
         if not school:
             return redirect(reverse("school_menu:settings", args=[request.user.pk]))
-        current_week, adjusted_day = get_current_date()
-        bias = school.week_bias
-        adjusted_week = calculate_week(current_week, bias)
-        season = get_season(school)
-        if school.menu_type == School.Types.SIMPLE:
-            weekly_meals = SimpleMeal.objects.filter(
-                school=school, week=adjusted_week, season=season
-            ).order_by("day")
-            meal_for_today = weekly_meals.filter(day=adjusted_day).first()
-        else:
-            weekly_meals = DetailedMeal.objects.filter(
-                school=school, week=adjusted_week, season=season
-            ).order_by("day")
-            meal_for_today = weekly_meals.filter(day=adjusted_day).first()
-        context = {
-            "school": school,
-            "meal": meal_for_today,
-            "weekly_meals": weekly_meals,
-            "week": adjusted_week,
-            "day": adjusted_day,
-        }
+        context = resolve_menu(school).context
     return render(request, "index.html", context)
 
 
+@with_deadline("school_menu", stale=True)
 def school_menu(request, slug):
     """Return school menu for the given school"""
+    school = get_object_or_404(School.objects.select_related("daily_menu"), slug=slug)
+    menu = resolve_menu(school)
+    etag, last_modified = get_menu_validators(
+        request, school, menu.season, menu.week, menu.day
+    )
+    not_modified = get_not_modified_response(request, etag, last_modified)
+    if not_modified:
+        return not_modified
+    if not request.user.is_authenticated:
+        page = get_prerendered_menu(school.pk)
+        if page is not None:
+            return set_menu_validators(HttpResponse(page), etag, last_modified)
+    response = render(request, "school-menu.html", menu.context)
+    return set_menu_validators(response, etag, last_modified)
+
+
+@with_deadline("school_menu_calendar", stale=True, query_params=("start", "end"))
+def school_menu_calendar(request, slug):
+    """Return school menu for every school day of a date range (current month by default)"""
     school = get_object_or_404(School, slug=slug)
-    current_week, adjusted_day = get_current_date()
-    bias = school.week_bias
-    adjusted_week = calculate_week(current_week, bias)
-    season = get_season(school)
-    if school.menu_type == School.Types.SIMPLE:
-        weekly_meals = SimpleMeal.objects.filter(
-            school=school, week=adjusted_week, season=season
-        ).order_by("day")
-        meal_for_today = weekly_meals.filter(day=adjusted_day).first()
-    else:
-        weekly_meals = DetailedMeal.objects.filter(
-            school=school, week=adjusted_week, season=season
-        ).order_by("day")
-        meal_for_today = weekly_meals.filter(day=adjusted_day).first()
+    start, end = parse_date_range(request.GET.get("start"), request.GET.get("end"))
+    calendar_days = resolve_menu_range(school, start, end)
+    previous_month = get_month_range(start.replace(day=1) - timedelta(days=1))
+    next_month = get_month_range(end.replace(day=28) + timedelta(days=4))
     context = {
         "school": school,
-        "meal": meal_for_today,
-        "weekly_meals": weekly_meals,
-        "week": adjusted_week,
-        "day": adjusted_day,
+        "start": start,
+        "end": end,
+        "weeks": group_by_week(calendar_days),
+        "previous_month": previous_month,
+        "next_month": next_month,
     }
-    return render(request, "school-menu.html", context)
+    return render(request, "school-calendar.html", context)
+
+
+@require_GET
+@with_deadline("school_menu_ics")
+def school_menu_ics(request, slug):
+    """Return the iCalendar feed of the given school for the current season"""
+    school = get_object_or_404(School, slug=slug)
+    start, end = get_feed_range(get_today())
+    etag, last_modified = get_menu_validators(request, school, "ics", start, end)
+    not_modified = get_not_modified_response(request, etag, last_modified)
+    if not_modified:
+        return not_modified
+    key = ics_cache_key(school, start, end)
+    feed = cache.get(key)
+    if feed is not None:
+        response = HttpResponse(feed, content_type=ICS_CONTENT_TYPE)
+    else:
+        calendar_days = resolve_menu_range(school, start, end)
+        lines = iter_ics_lines(school, calendar_days, request.get_host())
+        response = StreamingHttpResponse(
+            cache_lines(key, lines, ICS_CACHE_TIMEOUT),
+            content_type=ICS_CONTENT_TYPE,
+        )
+    response.headers["Content-Disposition"] = f'inline; filename="{school.slug}.ics"'
+    return set_menu_validators(response, etag, last_modified)
 
 
+@rate_limited("get_menu")
+@with_deadline("get_menu", stale=True)
 def get_menu(request, week, day, type, school_id):
     """get menu for the given school, day, week and type"""
-    school = School.objects.get(pk=school_id)
-    season = school.season_choice
-    if school.menu_type == School.Types.SIMPLE:
-        weekly_meals = SimpleMeal.objects.filter(
-            week=week, type=type, season=season, school=school
-        ).order_by("day")
-    else:
-        weekly_meals = DetailedMeal.objects.filter(
-            week=week, type=type, season=season, school=school
-        ).order_by("day")
-    meal_of_the_day = weekly_meals.get(day=day)
-    context = {
-        "school": school,
-        "meal": meal_of_the_day,
-        "weekly_meals": weekly_meals,
-        "week": week,
-        "day": day,
-        "type": type,
-    }
-    return render(request, "partials/_menu.html", context)
+    school = get_object_or_404(School, pk=school_id)
+    menu = resolve_menu(school, week=week, day=day, meal_type=type)
+    etag, last_modified = get_menu_validators(
+        request, school, menu.season, week, day, type
+    )
+    not_modified = get_not_modified_response(request, etag, last_modified)
+    if not_modified:
+        return not_modified
+    response = render(request, "partials/_menu.html", menu.context)
+    return set_menu_validators(response, etag, last_modified)
+
+
+@require_GET
+@with_deadline("json_menu", stale=True, query_params=("type",))
+def json_menu(request, slug):
+    """Return today's menu and the weekly menu of the given school as json"""
+    school = get_object_or_404(School.objects.select_related("daily_menu"), slug=slug)
+    menu = resolve_menu(school, meal_type=get_meal_type(request))
+    etag, last_modified = get_menu_validators(
+        request, school, menu.season, menu.week, menu.day, menu.type
+    )
+    response = get_not_modified_response(request, etag, last_modified)
+    if not response:
+        data = serialize_menu(menu, menu.meal, menu.weekly_meals)
+        response = set_menu_validators(JsonResponse(data), etag, last_modified)
+    patch_cache_control(response, public=True, max_age=API_CACHE_MAX_AGE)
+    return response
+
+
+@require_GET
+@with_deadline("json_menu_bulk", stale=True, query_params=("schools", "type"))
+def json_menu_bulk(request):
+    """Return today's menu of many schools, given as ?schools=slug1,slug2, as json"""
+    slugs = [slug for slug in request.GET.get("schools", "").split(",") if slug]
+    schools = (
+        School.objects.filter(slug__in=slugs[:MAX_BULK_SCHOOLS])
+        .select_related("daily_menu")
+        .order_by("name")
+    )
+    menus = resolve_today_menus(schools, meal_type=get_meal_type(request))
+    data = {"menus": [serialize_menu(menu, meal) for menu, meal in menus]}
+    response = JsonResponse(data)
+    patch_cache_control(response, public=True, max_age=API_CACHE_MAX_AGE)
+    return response
+
+
+@require_GET
+def autocomplete_schools(request):
+    """Return the schools whose name or city start with ?q= as json, from memory"""
+    schools = get_autocomplete_index().search(request.GET.get("q", ""))
+    response = JsonResponse({"schools": schools})
+    patch_cache_control(response, public=True, max_age=API_CACHE_MAX_AGE)
+    return response
 
 
-# TODO: get this view working as requested in ISSUE #34
-# @require_http_methods(["GET"])
-# def json_menu(request):
-#     current_week, adjusted_day = get_current_date()
-#     adjusted_week = calculate_week(current_week, 0)
-#     season = School.objects.first().season_choice
-#     meal_for_today = DetailedMeal.objects.filter(
-#         week=adjusted_week, type=1, season=season
-#     )
-#     serializer = MealSerializer(meal_for_today, many=True)
-#     meals = list(serializer.data)
-#     data = {"current_day": adjusted_day, "meals": meals}
-#     return JsonResponse(data, safe=False)
+@require_GET
+@with_deadline("dish_search", stale=True, query_params=("q", "week"))
+def dish_search(request):
+    """Return the schools serving a dish, given as ?q=, as json.
+    Only the meals of the current week are returned with ?week=current"""
+    current_week = request.GET.get("week") == "current"
+    results = find_dish(request.GET.get("q", ""), current_week=current_week)
+    data = {
+        "schools": [serialize_dish_matches(school, meals) for school, meals in results]
+    }
+    return JsonResponse(data)
 
 
 @login_required
 def settings_view(request, pk):
     """Get the settings page"""
     user = get_user(pk)
-    context = {"user": user}
+    context = {"user": user, "cycle_weeks": settings.MENU_CYCLE_WEEKS}
     return render(request, "settings.html", context)
 
 
@@ -130,7 +236,7 @@ def settings_view(request, pk):
 def menu_settings_partial(request, pk):
     """ " Get the menu partial of the settings page when reloaded after a change via htmx"""
     user = get_user(pk)
-    context = {"user": user}
+    context = {"user": user, "cycle_weeks": settings.MENU_CYCLE_WEEKS}
     return render(request, "settings.html#menu", context)
 
 
@@ -177,23 +283,113 @@ def school_update(request):
     return render(request, "partials/school.html", context)
 
 
+def city_list(request):
+    """Return the cities with the number of their schools"""
+    context = {"cities": get_city_directory()}
+    return render(request, "city-list.html", context)
+
+
+@with_deadline("city_schools", stale=True)
+def city_schools(request, slug):
+    """Return the schools of a city with today's menu of each one"""
+    cities = get_city_names(slug)
+    schools = School.objects.filter(city__in=cities).select_related("daily_menu")
+    menus = resolve_today_menus(schools.order_by("name"))
+    if not menus:
+        raise Http404("Nessuna scuola in questa città")
+    context = {"city": cities[0], "slug": slug, "menus": menus, "today": get_today()}
+    return render(request, "city-schools.html", context)
+
+
+@with_deadline("district_menu", stale=True, query_params=("type",))
+def district_menu(request, slug):
+    """
+    Return today's menu of every school of a city as a table
+    """
+    cities = get_city_names(slug)
+    schools = School.objects.filter(city__in=cities).select_related("daily_menu")
+    meal_type = get_meal_type(request)
+    menus = resolve_today_menus(schools.order_by("name"), meal_type=meal_type)
+    if not menus:
+        raise Http404("Nessuna scuola in questa città")
+    context = {
+        "city": cities[0],
+        "slug": slug,
+        "groups": group_by_menu_week(menus),
+        "today": get_today(),
+        "type": meal_type,
+    }
+    return render(request, "district-menu.html", context)
+
+
 def school_list(request):
-    schools = School.objects.all()
-    context = {"schools": schools}
-    return TemplateResponse(request, "school-list.html", context)
+    """Return a page of schools, the next pages are loaded by infinite scroll"""
+    cursor = request.GET.get("cursor")
+    schools, next_cursor = get_school_page(
+        School.objects.all(), cursor, settings.SCHOOL_PAGE_SIZE
+    )
+    context = {
+        "schools": schools,
+        "next_url": get_school_list_url(next_cursor),
+        "infinite_scroll": True,
+    }
+    template = "school-list.html#school-items" if cursor else "school-list.html"
+    return TemplateResponse(request, template, context)
+
+
+@require_GET
+def school_directory(request):
+    """Stream the whole list of schools, for crawlers, without loading it in memory"""
+    context = {"school_items": DIRECTORY_PLACEHOLDER}
+    page = render_to_string("school-directory.html", context, request=request)
+    header, footer = page.split(DIRECTORY_PLACEHOLDER)
+    schools = School.objects.order_by("name", "id").iterator(
+        chunk_size=DIRECTORY_CHUNK_SIZE
+    )
+    return StreamingHttpResponse(iter_school_directory(header, schools, footer))
+
+
+def iter_school_directory(header, schools, footer):
+    """
+    Yield the directory page header, then the list items rendered a chunk of schools
+    at a time, then the footer. The header is sent before the schools are queried.
+    """
+    yield header
+    items = get_template("school-list.html#school-items")
+    while chunk := list(islice(schools, DIRECTORY_CHUNK_SIZE)):
+        yield items.render({"schools": chunk})
+    yield footer
+
+
+def get_school_list_url(cursor):
+    """Get the url of the school list page after the given cursor"""
+    if cursor is None:
+        return None
+    return f"{reverse('school_menu:school_list')}?{urlencode({'cursor': cursor})}"
 
 
 @login_required
 def upload_menu(request, school_id):
     school = get_object_or_404(School, pk=school_id)
-    menu_type = school.menu_type
     if request.method == "POST":
         form = UploadMenuForm(request.POST, request.FILES)
         if form.is_valid():
-            file = form.cleaned_data["file"]
-            season = form.cleaned_data["season"]
-            import_menu(request, file, menu_type, school, season)
-            return HttpResponse(status=204, headers={"HX-Trigger": "menuModified"})
+            # the upload is stored and the task reads it from the storage, it
+            # does not travel through the queue
+            menu_import = MenuImport.objects.create(
+                school=school,
+                season=form.cleaned_data["season"],
+                file=form.cleaned_data["file"],
+            )
+            transaction.on_commit(
+                partial(
+                    async_task, "school_menu.tasks.import_school_menu", menu_import.pk
+                )
+            )
+            context = {"menu_import": menu_import}
+            return TemplateResponse(
+                request, "partials/_menu_import.html", context, status=202
+            )
         context = {"form": form, "school": school}
         return TemplateResponse(request, "upload-menu.html", context)
     else:
@@ -202,6 +398,23 @@ def upload_menu(request, school_id):
     return TemplateResponse(request, "upload-menu.html", context)
 
 
+@login_required
+def menu_import_status(request, pk):
+    """Return the progress of a menu import, polled until it is finished"""
+    menu_import = get_object_or_404(
+        MenuImport.objects.select_related("school"), pk=pk, school__user=request.user
+    )
+    fail_stale_menu_import(menu_import)
+    context = {"menu_import": menu_import}
+    response = TemplateResponse(request, "partials/_menu_import.html", context)
+    if menu_import.status == MenuImport.Statuses.DONE and menu_import.has_changes:
+        messages.add_message(
+            request, messages.SUCCESS, "<strong>Menu</strong> salvato correttamente"
+        )
+        response.headers["HX-Trigger"] = "menuModified"
+    return response
+
+
 @login_required
 def create_weekly_menu(request, school_id, week, season):
     qs = School.objects.all().select_related("user")
@@ -249,6 +462,7 @@ def create_weekly_menu(request, school_id, week, season):
     if request.method == "POST":
         if formset.is_valid():
             formset.save()
+            mark_menu_changed(school.pk)
             messages.add_message(
                 request, messages.SUCCESS, "Menu settimanale salvato con successo"
             )
@@ -261,19 +475,38 @@ def create_weekly_menu(request, school_id, week, season):
     return render(request, "create-weekly-menu.html", context)
 
 
+@rate_limited("search_schools")
+@with_deadline("search_schools")
 def search_schools(request):
     """get the schools based on the search input via htmx"""
     context = {}
     query = request.GET.get("q")
-    schools = School.objects.filter(Q(name__icontains=query) | Q(city__icontains=query))
+    offset = get_offset(request, MAX_SEARCH_OFFSET)
+    page_size = settings.SCHOOL_PAGE_SIZE
+    if query:
+        # one more school tells whether there is a next page
+        schools = find_schools_cached(query, limit=page_size + 1, offset=offset)
+        next_offset = offset + page_size
+        if len(schools) > page_size and next_offset <= MAX_SEARCH_OFFSET:
+            query_string = urlencode({"q": query, "offset": next_offset})
+            context["next_url"] = (
+                f"{reverse('school_menu:search_schools')}?{query_string}"
+            )
+        schools = schools[:page_size]
+    else:
+        schools, next_cursor = get_school_page(School.objects.all(), None, page_size)
+        context["next_url"] = get_school_list_url(next_cursor)
+        context["infinite_scroll"] = True
     referrer = request.headers.get("referer", None)
     # get a different partial if the search comes from the index page
     if referrer == request.build_absolute_uri(
         reverse("school_menu:index")
     ):  # pragma: no cover
-        template = "index.html#search-result"
+        page = "index.html"
     else:
-        template = "school-list.html#search-result"
+        page = "school-list.html"
+    # the next pages of the results are appended to the list
+    template = f"{page}#school-items" if offset else f"{page}#search-result"
     # hidden results if the input is empty in the index page
     if not query:
         context["hidden"] = True
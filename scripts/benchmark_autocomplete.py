@@ -0,0 +1,36 @@
+"""
+Compare the in-memory autocomplete index with the icontains search it replaces:
+
+    python manage.py runscript benchmark_autocomplete --settings=core.settings.dev
+"""
+
+import timeit
+from functools import partial
+
+from django.db.models import Q
+
+from school_menu.autocomplete import load_autocomplete_index
+from school_menu.models import School
+
+PREFIXES = ["s", "sc", "scuola", "mil", "rodari", "citta", "zzz"]
+REPEAT = 100
+
+
+def search_icontains(query):
+    schools = School.objects.filter(Q(name__icontains=query) | Q(city__icontains=query))
+    return list(schools[:10])
+
+
+def run():
+    count = School.objects.count()
+    load_time = timeit.timeit(load_autocomplete_index, number=1)
+    index = load_autocomplete_index()
+    print(f"{count} schools, index loaded in {load_time * 1000:.1f} ms")
+    print(f"{'prefix':<10}{'icontains':>14}{'index':>14}")
+    for prefix in PREFIXES:
+        database = timeit.timeit(partial(search_icontains, prefix), number=REPEAT)
+        memory = timeit.timeit(partial(index.search, prefix), number=REPEAT)
+        print(
+            f"{prefix:<10}{database / REPEAT * 1000:>11.3f} ms"
+            f"{memory / REPEAT * 1000:>11.3f} ms"
+        )
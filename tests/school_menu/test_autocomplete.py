@@ -0,0 +1,157 @@
+from unittest import mock
+
+import pytest
+
+from school_menu.autocomplete import (
+    PrefixIndex,
+    SchoolAutocomplete,
+    autocomplete_index,
+    get_autocomplete_index,
+    get_word_suffixes,
+    load_autocomplete_index,
+    normalize_key,
+    reload_autocomplete_index,
+)
+
+pytestmark = pytest.mark.django_db
+
+
+class TestKeys:
+    def test_normalize_key(self):
+        assert normalize_key("  Scuola  Sant'Anna, Cantù ") == "scuola sant anna cantu"
+
+    def test_word_suffixes(self):
+        assert get_word_suffixes("a b c") == ["a b c", "b c", "c"]
+
+
+class TestPrefixIndex:
+    def test_search(self):
+        index = PrefixIndex([("roma", 2), ("rodari", 1), ("milano", 3)])
+
+        assert list(index.search("ro")) == [1, 2]
+        assert list(index.search("rom")) == [2]
+        assert list(index.search("z")) == []
+
+    def test_add_and_remove(self):
+        index = PrefixIndex()
+
+        index.add("roma", 1)
+        index.remove("roma", 1)
+        index.remove("roma", 2)
+
+        assert index.entries == []
+
+
+class TestSchoolAutocomplete:
+    def test_ranking(self, school_factory):
+        city_match = school_factory(name="Scuola Verdi", city="Rodi Garganico")
+        word_match = school_factory(name="Scuola Rodari", city="Milano")
+        name_match = school_factory(name="Rodari", city="Torino")
+        index = SchoolAutocomplete()
+        index.load([city_match, word_match, name_match])
+
+        names = [entry["name"] for entry in index.search("Rod")]
+
+        assert names == ["Rodari", "Scuola Rodari", "Scuola Verdi"]
+
+    def test_entries(self, school_factory):
+        school = school_factory(name="Scuola Primaria", city="Città di Castello")
+        index = SchoolAutocomplete()
+        index.load([school])
+
+        assert index.search("CITTA di") == [
+            {
+                "name": "Scuola Primaria",
+                "city": "Città di Castello",
+                "url": school.get_absolute_url(),
+            }
+        ]
+
+    def test_limit_and_duplicates(self, school_factory):
+        schools = school_factory.create_batch(3, city="Milano")
+        index = SchoolAutocomplete()
+        index.load(schools)
+
+        assert len(index.search("milano", limit=2)) == 2
+        assert len(index.search("milano")) == 3
+
+    def test_empty_query(self, school_factory):
+        index = SchoolAutocomplete()
+        index.load([school_factory()])
+
+        assert index.search(" ! ") == []
+
+    def test_update_and_remove(self, school_factory):
+        school = school_factory(name="Scuola Verdi", city="Milano")
+        index = SchoolAutocomplete()
+        index.load([school])
+
+        school.city = "Torino"
+        index.update(school)
+
+        assert index.search("milano") == []
+        assert index.search("torino")[0]["city"] == "Torino"
+
+        index.remove(school.pk)
+
+        assert index.search("torino") == []
+
+
+class TestProcessIndex:
+    def test_loaded_on_first_use(self, school_factory, django_assert_num_queries):
+        school_factory(city="Milano")
+
+        with django_assert_num_queries(1):
+            get_autocomplete_index()
+        with django_assert_num_queries(0):
+            assert len(get_autocomplete_index().search("milano")) == 1
+
+    @mock.patch("school_menu.autocomplete.Thread")
+    def test_loaded_again_in_the_background_when_stale(
+        self, mock_thread, django_assert_num_queries
+    ):
+        load_autocomplete_index()
+
+        with mock.patch("school_menu.autocomplete.AUTOCOMPLETE_MAX_AGE", -1):
+            with django_assert_num_queries(0):
+                assert get_autocomplete_index() is autocomplete_index
+                get_autocomplete_index()
+
+        mock_thread.assert_called_once_with(
+            target=reload_autocomplete_index, daemon=True
+        )
+        mock_thread.return_value.start.assert_called_once_with()
+
+    @mock.patch("school_menu.autocomplete.connection")
+    def test_reload(self, mock_connection, school_factory):
+        school_factory(city="Milano")
+        autocomplete_index.start_reload()
+
+        reload_autocomplete_index()
+
+        assert len(autocomplete_index.search("milano")) == 1
+        assert not autocomplete_index.reloading
+        mock_connection.close.assert_called_once_with()
+
+    def test_school_changes_are_indexed(
+        self, school_factory, django_capture_on_commit_callbacks
+    ):
+        load_autocomplete_index()
+
+        with django_capture_on_commit_callbacks(execute=True):
+            school = school_factory(city="Milano")
+        assert len(autocomplete_index.search("milano")) == 1
+
+        with django_capture_on_commit_callbacks(execute=True):
+            school.delete()
+        assert autocomplete_index.search("milano") == []
+
+    def test_changes_ignored_until_loaded(
+        self, school_factory, django_capture_on_commit_callbacks
+    ):
+        with django_capture_on_commit_callbacks(execute=True):
+            school = school_factory(city="Milano")
+            school.delete()
+
+        assert autocomplete_index.loaded_at is None
+        assert autocomplete_index.schools == {}
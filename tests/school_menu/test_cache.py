@@ -0,0 +1,209 @@
+import pytest
+from django.core.cache import cache
+from django.utils import timezone
+
+from school_menu.cache import (
+    get_cached_weekly_meals,
+    get_city_directory,
+    get_city_names,
+    get_meal_model,
+    invalidate_menu_cache,
+    mark_menu_changed,
+    menu_cache_key,
+)
+from school_menu.models import DetailedMeal, Meal, School, SimpleMeal
+
+pytestmark = pytest.mark.django_db
+
+
+class TestGetMealModel:
+    def test_simple_school(self, school_factory):
+        school = school_factory(menu_type=School.Types.SIMPLE)
+
+        assert get_meal_model(school) == SimpleMeal
+
+    def test_detailed_school(self, school_factory):
+        school = school_factory(menu_type=School.Types.DETAILED)
+
+        assert get_meal_model(school) == DetailedMeal
+
+
+class TestGetCachedWeeklyMeals:
+    def test_cache_is_filled_on_read(self, school_factory, simple_meal_factory):
+        school = school_factory(menu_type=School.Types.SIMPLE)
+        meal = simple_meal_factory(
+            school=school, day=2, week=1, season=Meal.Seasons.INVERNALE
+        )
+        key = menu_cache_key(school.pk, Meal.Seasons.INVERNALE, 1, Meal.Types.STANDARD)
+
+        weekly_meals = get_cached_weekly_meals(
+            school, Meal.Seasons.INVERNALE, 1, Meal.Types.STANDARD
+        )
+
+        assert weekly_meals == [meal]
+        assert cache.get(key) == (school.updated_at, [meal])
+
+    def test_warm_read_makes_no_queries(
+        self, school_factory, detailed_meal_factory, django_assert_num_queries
+    ):
+        school = school_factory(menu_type=School.Types.DETAILED)
+        detailed_meal_factory(
+            school=school, day=1, week=1, season=Meal.Seasons.INVERNALE
+        )
+        get_cached_weekly_meals(school, Meal.Seasons.INVERNALE, 1, Meal.Types.STANDARD)
+
+        with django_assert_num_queries(0):
+            weekly_meals = get_cached_weekly_meals(
+                school, Meal.Seasons.INVERNALE, 1, Meal.Types.STANDARD
+            )
+
+        assert len(weekly_meals) == 1
+
+    def test_meals_of_another_menu_version_are_reloaded(
+        self, school_factory, simple_meal_factory
+    ):
+        school = school_factory(menu_type=School.Types.SIMPLE)
+        meal = simple_meal_factory(
+            school=school, day=1, week=1, season=Meal.Seasons.INVERNALE, menu="Pasta"
+        )
+        get_cached_weekly_meals(school, Meal.Seasons.INVERNALE, 1, Meal.Types.STANDARD)
+        # changed by another process, whose invalidation did not reach this cache
+        SimpleMeal.objects.filter(pk=meal.pk).update(menu="Riso")
+        School.objects.filter(pk=school.pk).update(updated_at=timezone.now())
+        school.refresh_from_db()
+
+        weekly_meals = get_cached_weekly_meals(
+            school, Meal.Seasons.INVERNALE, 1, Meal.Types.STANDARD
+        )
+
+        assert weekly_meals[0].menu == "Riso"
+
+    def test_meals_are_ordered_by_day(self, school_factory, simple_meal_factory):
+        school = school_factory(menu_type=School.Types.SIMPLE)
+        for day in [3, 1, 2]:
+            simple_meal_factory(
+                school=school, day=day, week=1, season=Meal.Seasons.INVERNALE
+            )
+
+        weekly_meals = get_cached_weekly_meals(
+            school, Meal.Seasons.INVERNALE, 1, Meal.Types.STANDARD
+        )
+
+        assert [meal.day for meal in weekly_meals] == [1, 2, 3]
+
+
+class TestInvalidation:
+    def test_invalidate_menu_cache(self, school_factory):
+        school = school_factory()
+        key = menu_cache_key(school.pk, Meal.Seasons.INVERNALE, 4, Meal.Types.VEGAN)
+        cache.set(key, [])
+
+        invalidate_menu_cache(school.pk)
+
+        assert cache.get(key) is None
+
+    def test_meal_save_invalidates_cache(self, school_factory, simple_meal_factory):
+        school = school_factory(menu_type=School.Types.SIMPLE)
+        meal = simple_meal_factory(
+            school=school, day=1, week=1, season=Meal.Seasons.INVERNALE
+        )
+        get_cached_weekly_meals(school, Meal.Seasons.INVERNALE, 1, Meal.Types.STANDARD)
+
+        meal.menu = "Pasta al Pesto"
+        meal.save()
+        weekly_meals = get_cached_weekly_meals(
+            school, Meal.Seasons.INVERNALE, 1, Meal.Types.STANDARD
+        )
+
+        assert weekly_meals[0].menu == "Pasta al Pesto"
+
+    def test_meal_delete_invalidates_cache(self, school_factory, detailed_meal_factory):
+        school = school_factory(menu_type=School.Types.DETAILED)
+        meal = detailed_meal_factory(
+            school=school, day=1, week=1, season=Meal.Seasons.INVERNALE
+        )
+        get_cached_weekly_meals(school, Meal.Seasons.INVERNALE, 1, Meal.Types.STANDARD)
+
+        meal.delete()
+        weekly_meals = get_cached_weekly_meals(
+            school, Meal.Seasons.INVERNALE, 1, Meal.Types.STANDARD
+        )
+
+        assert weekly_meals == []
+
+    def test_school_save_invalidates_cache(self, school_factory):
+        school = school_factory()
+        key = menu_cache_key(school.pk, Meal.Seasons.INVERNALE, 1, Meal.Types.STANDARD)
+        cache.set(key, [])
+
+        school.save()
+
+        assert cache.get(key) is None
+
+    def test_meal_without_school_is_ignored(self):
+        meal = SimpleMeal.objects.create(menu="Pasta", snack="Yogurt", school=None)
+
+        assert meal.pk is not None
+
+
+class TestMarkMenuChanged:
+    def test_bumps_menu_version(self, school_factory):
+        school = school_factory()
+        updated_at = school.updated_at
+        key = menu_cache_key(school.pk, Meal.Seasons.INVERNALE, 1, Meal.Types.STANDARD)
+        cache.set(key, [])
+
+        mark_menu_changed(school.pk)
+        school.refresh_from_db()
+
+        assert school.updated_at > updated_at
+        assert cache.get(key) is None
+
+    def test_meal_save_bumps_menu_version(self, school_factory, simple_meal_factory):
+        school = school_factory()
+        updated_at = school.updated_at
+
+        simple_meal_factory(school=school)
+        school.refresh_from_db()
+
+        assert school.updated_at > updated_at
+
+
+class TestCityDirectory:
+    def test_counts_schools_by_city(self, school_factory, django_assert_num_queries):
+        school_factory.create_batch(2, city="Milano")
+        school_factory(city="Bergamo")
+
+        with django_assert_num_queries(1):
+            cities = get_city_directory()
+        with django_assert_num_queries(0):
+            get_city_directory()
+
+        assert cities == [
+            {"city": "Bergamo", "count": 1, "slug": "bergamo"},
+            {"city": "Milano", "count": 2, "slug": "milano"},
+        ]
+
+    def test_city_names(self, school_factory):
+        school_factory(city="Bolzano/Bozen")
+        school_factory(city="bolzano bozen")
+        school_factory(city="Bolzano")
+
+        assert get_city_names("bolzanobozen") == ["Bolzano/Bozen"]
+        assert get_city_names("bolzano-bozen") == ["bolzano bozen"]
+        assert get_city_names("atlantide") == []
+
+    def test_school_changes_invalidate(self, school_factory):
+        school = school_factory(city="Milano")
+        get_city_directory()
+
+        school.city = "Torino"
+        school.save()
+
+        assert get_city_directory() == [
+            {"city": "Torino", "count": 1, "slug": "torino"}
+        ]
+
+        school.delete()
+
+        assert get_city_directory() == []
@@ -0,0 +1,210 @@
+from datetime import date
+from unittest import mock
+
+import pytest
+from django.test import override_settings
+
+from school_menu.calendar import (
+    MAX_RANGE_DAYS,
+    MenuDate,
+    get_cycle_week,
+    get_date_season,
+    get_feed_range,
+    get_month_range,
+    get_school_day,
+    get_season_end,
+    get_today,
+    parse_date_range,
+    resolve_date,
+    resolve_date_range,
+    resolve_school_date,
+)
+from school_menu.models import School
+
+pytestmark = pytest.mark.django_db
+
+WINTER_START = (9, 23)
+SPRING_START = (3, 21)
+
+
+class TestGetCycleWeek:
+    @pytest.mark.parametrize(
+        "test_date, bias, expected",
+        [
+            (date(2023, 1, 2), 0, 1),  # week 1, no bias, beginning of the cycle
+            (date(2023, 1, 23), 0, 4),  # week 4, no bias, end of the cycle
+            (date(2023, 1, 30), 0, 1),  # week 5, no bias, beginning of next cycle
+            (date(2023, 2, 20), 0, 4),  # week 8, no bias, end of next cycle
+            (date(2023, 1, 2), 3, 4),  # week 1, bias shifts to end of cycle
+            (date(2023, 12, 25), 0, 4),  # week 52, no bias, last week of the year
+            (date(2023, 12, 4), 3, 4),  # week 49, bias shifts to last week
+        ],
+    )
+    def test_get_cycle_week(self, test_date, bias, expected):
+        assert get_cycle_week(test_date, bias, 4) == expected
+
+    def test_custom_cycle_length(self):
+        # week 5 in a 6 weeks cycle
+        assert get_cycle_week(date(2023, 1, 30), 0, 6) == 5
+
+
+class TestGetSchoolDay:
+    @pytest.mark.parametrize(
+        "test_date, expected",
+        [
+            (date(2023, 4, 3), date(2023, 4, 3)),  # Monday
+            (date(2023, 4, 5), date(2023, 4, 5)),  # Wednesday
+            (date(2023, 4, 8), date(2023, 4, 10)),  # Saturday, next Monday
+            (date(2023, 4, 9), date(2023, 4, 10)),  # Sunday, next Monday
+        ],
+    )
+    def test_get_school_day(self, test_date, expected):
+        assert get_school_day(test_date) == expected
+
+
+class TestGetDateSeason:
+    @pytest.mark.parametrize(
+        "test_date, season_choice, expected_season",
+        [
+            (date(2023, 1, 15), School.Seasons.AUTOMATICA, School.Seasons.INVERNALE),
+            (date(2023, 6, 15), School.Seasons.AUTOMATICA, School.Seasons.PRIMAVERILE),
+            (date(2023, 10, 1), School.Seasons.AUTOMATICA, School.Seasons.INVERNALE),
+            (date(2023, 9, 23), School.Seasons.AUTOMATICA, School.Seasons.INVERNALE),
+            (date(2023, 9, 22), School.Seasons.AUTOMATICA, School.Seasons.PRIMAVERILE),
+            (date(2023, 3, 20), School.Seasons.AUTOMATICA, School.Seasons.INVERNALE),
+            (date(2023, 3, 21), School.Seasons.AUTOMATICA, School.Seasons.PRIMAVERILE),
+            (date(2023, 4, 1), School.Seasons.INVERNALE, School.Seasons.INVERNALE),
+            (date(2023, 1, 1), School.Seasons.PRIMAVERILE, School.Seasons.PRIMAVERILE),
+        ],
+    )
+    def test_get_date_season(self, test_date, season_choice, expected_season):
+        season = get_date_season(test_date, season_choice, WINTER_START, SPRING_START)
+
+        assert season == expected_season
+
+
+class TestResolveDate:
+    @pytest.mark.parametrize(
+        "test_date, expected",
+        [
+            (
+                date(2023, 4, 3),
+                MenuDate(week=2, day=1, season=School.Seasons.PRIMAVERILE),
+            ),
+            (
+                date(2023, 4, 5),
+                MenuDate(week=2, day=3, season=School.Seasons.PRIMAVERILE),
+            ),
+            (
+                date(2023, 4, 8),
+                MenuDate(week=3, day=1, season=School.Seasons.PRIMAVERILE),
+            ),
+            (
+                date(2023, 4, 9),
+                MenuDate(week=3, day=1, season=School.Seasons.PRIMAVERILE),
+            ),
+        ],
+    )
+    def test_resolve_date(self, test_date, expected):
+        assert resolve_date(test_date, 0, School.Seasons.AUTOMATICA) == expected
+
+    @override_settings(MENU_CYCLE_WEEKS=2)
+    def test_resolve_date_with_custom_cycle(self):
+        menu_date = resolve_date(date(2023, 4, 3), 0, School.Seasons.AUTOMATICA)
+
+        assert menu_date.week == 2
+
+    def test_resolve_school_date(self, school_factory):
+        school = school_factory(week_bias=1, season_choice=School.Seasons.INVERNALE)
+
+        with mock.patch(
+            "school_menu.calendar.get_today", return_value=date(2023, 4, 5)
+        ):
+            menu_date = resolve_school_date(school)
+
+        assert menu_date == MenuDate(week=3, day=3, season=School.Seasons.INVERNALE)
+
+    def test_resolve_school_date_with_given_date(self, school_factory):
+        school = school_factory(week_bias=0, season_choice=School.Seasons.AUTOMATICA)
+
+        menu_date = resolve_school_date(school, date(2023, 10, 2))
+
+        assert menu_date == MenuDate(week=4, day=1, season=School.Seasons.INVERNALE)
+
+    def test_get_today(self):
+        assert isinstance(get_today(), date)
+
+
+class TestResolveDateRange:
+    def test_weekends_are_skipped(self):
+        menu_dates = resolve_date_range(
+            date(2023, 4, 3), date(2023, 4, 16), 0, School.Seasons.AUTOMATICA
+        )
+
+        assert len(menu_dates) == 10
+        assert all(menu_date.weekday() < 5 for menu_date in menu_dates)
+        assert menu_dates[date(2023, 4, 14)] == MenuDate(
+            week=3, day=5, season=School.Seasons.PRIMAVERILE
+        )
+
+
+class TestDateRanges:
+    def test_get_month_range(self):
+        assert get_month_range(date(2024, 2, 10)) == (
+            date(2024, 2, 1),
+            date(2024, 2, 29),
+        )
+
+    def test_parse_date_range(self):
+        assert parse_date_range("2023-09-01", "2023-09-30") == (
+            date(2023, 9, 1),
+            date(2023, 9, 30),
+        )
+
+    @pytest.mark.parametrize(
+        "start, end",
+        [
+            (None, None),
+            ("2023-09-01", None),
+            ("2023-09-30", "2023-09-01"),
+            ("not-a-date", "2023-09-01"),
+            ("2023-02-30", "2023-03-01"),
+        ],
+    )
+    def test_parse_invalid_date_range(self, start, end):
+        with mock.patch(
+            "school_menu.calendar.get_today", return_value=date(2023, 4, 5)
+        ):
+            assert parse_date_range(start, end) == (date(2023, 4, 1), date(2023, 4, 30))
+
+    def test_parse_date_range_is_capped(self):
+        start, end = parse_date_range("2023-09-01", "2030-09-01")
+
+        assert (end - start).days == MAX_RANGE_DAYS - 1
+
+
+class TestSeasonEnd:
+    @pytest.mark.parametrize(
+        "test_date, expected",
+        [
+            (date(2023, 10, 2), date(2024, 3, 20)),
+            (date(2024, 1, 15), date(2024, 3, 20)),
+            (date(2024, 3, 21), date(2024, 9, 22)),
+            (date(2024, 9, 22), date(2024, 9, 22)),
+            (date(2024, 9, 23), date(2025, 3, 20)),
+        ],
+    )
+    def test_get_season_end(self, test_date, expected):
+        assert get_season_end(test_date) == expected
+
+    def test_get_feed_range(self):
+        # saturday, the feed starts from the next school week
+        assert get_feed_range(date(2024, 3, 16)) == (
+            date(2024, 3, 18),
+            date(2024, 3, 20),
+        )
+        # wednesday, the feed starts from the monday of the same week
+        assert get_feed_range(date(2024, 3, 27)) == (
+            date(2024, 3, 25),
+            date(2024, 9, 22),
+        )
@@ -0,0 +1,218 @@
+from unittest import mock
+
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.db import OperationalError, connection
+from django.http import HttpResponse, StreamingHttpResponse
+from django.template import engines
+from django.template.response import SimpleTemplateResponse
+
+from school_menu.deadlines import (
+    Deadline,
+    stale_response_key,
+    statement_deadline,
+    with_deadline,
+)
+
+# counts to a hundred million, taking seconds on sqlite
+SLOW_QUERY = (
+    "WITH RECURSIVE counter(x) AS (SELECT 1 UNION ALL "
+    "SELECT x + 1 FROM counter WHERE x < 100000000) SELECT count(*) FROM counter"
+)
+
+
+def run_slow_query():
+    with connection.cursor() as cursor:
+        cursor.execute(SLOW_QUERY)
+
+
+def get_request(rf, user=None, path="/menu/?type=1"):
+    request = rf.get(path)
+    request.user = user or AnonymousUser()
+    return request
+
+
+def test_deadline_expired():
+    with mock.patch("school_menu.deadlines.time.monotonic", return_value=10):
+        deadline = Deadline(500)
+
+    with mock.patch("school_menu.deadlines.time.monotonic", return_value=10.4):
+        assert not deadline.expired
+    with mock.patch("school_menu.deadlines.time.monotonic", return_value=10.5):
+        assert deadline.expired
+
+
+@pytest.mark.django_db
+class TestStatementDeadline:
+    def test_sqlite_query_is_interrupted(self):
+        with pytest.raises(OperationalError):
+            with statement_deadline(Deadline(10)):
+                run_slow_query()
+
+    def test_sqlite_handler_is_removed(self):
+        with statement_deadline(Deadline(0)):
+            pass
+
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT count(*) FROM school_menu_school")
+            assert cursor.fetchone() == (0,)
+
+    def test_postgresql_statement_timeout(self):
+        using = mock.MagicMock(vendor="postgresql", alias="default")
+        cursor = using.cursor.return_value.__enter__.return_value
+
+        with mock.patch("school_menu.deadlines.transaction.atomic") as atomic:
+            with statement_deadline(Deadline(300), using=using):
+                atomic.return_value.__enter__.assert_called_once()
+                atomic.return_value.__exit__.assert_not_called()
+
+        # a single query, the timeout ends with the transaction
+        atomic.assert_called_once_with(using="default", savepoint=False)
+        atomic.return_value.__exit__.assert_called_once()
+        assert cursor.execute.call_args_list == [
+            mock.call("SELECT set_config('statement_timeout', %s, true)", ["300"])
+        ]
+
+    def test_other_vendors(self):
+        using = mock.Mock(vendor="oracle")
+
+        with statement_deadline(Deadline(300), using=using):
+            pass
+
+        using.cursor.assert_not_called()
+
+
+@pytest.mark.django_db
+class TestWithDeadline:
+    @pytest.fixture(autouse=True)
+    def deadlines(self, settings):
+        settings.REQUEST_DEADLINES = {"menu": 10}
+
+    def test_response(self, rf):
+        view = with_deadline("menu")(lambda request: HttpResponse("menu"))
+
+        response = view(get_request(rf))
+
+        assert response.content == b"menu"
+
+    def test_without_deadline(self, rf, settings):
+        settings.REQUEST_DEADLINES = {}
+        view = with_deadline("menu")(lambda request: HttpResponse("menu"))
+
+        with mock.patch("school_menu.deadlines.statement_deadline") as deadline:
+            response = view(get_request(rf))
+
+        assert response.content == b"menu"
+        deadline.assert_not_called()
+
+    def test_template_response_is_rendered(self, rf):
+        template = engines["django"].from_string("menu")
+        view = with_deadline("menu")(lambda request: SimpleTemplateResponse(template))
+
+        response = view(get_request(rf))
+
+        assert response.is_rendered
+        assert response.content == b"menu"
+
+    def test_unavailable_past_the_deadline(self, rf):
+        def view(request):
+            run_slow_query()
+
+        response = with_deadline("menu")(view)(get_request(rf))
+
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "5"
+
+    def test_other_errors_are_raised(self, rf):
+        def view(request):
+            raise OperationalError("database is locked")
+
+        with pytest.raises(OperationalError):
+            with_deadline("menu")(view)(get_request(rf))
+
+    def test_stale_response_past_the_deadline(self, rf):
+        slow = False
+
+        def view(request):
+            if slow:
+                run_slow_query()
+            return HttpResponse("menu")
+
+        view = with_deadline("menu", stale=True)(view)
+        view(get_request(rf))
+        slow = True
+        response = view(get_request(rf))
+
+        assert response.status_code == 200
+        assert response.content == b"menu"
+        assert response.headers["Warning"] == '110 - "Response is Stale"'
+
+    def test_stale_copy_is_written_only_when_changed(self, rf):
+        content = "menu"
+        view = with_deadline("menu", stale=True)(lambda request: HttpResponse(content))
+        view(get_request(rf))
+
+        with mock.patch("school_menu.deadlines.cache.set_many") as set_many:
+            view(get_request(rf))
+            set_many.assert_not_called()
+            content = "new menu"
+            view(get_request(rf))
+            set_many.assert_called_once()
+
+    def test_stale_copy_by_etag(self, rf):
+        def view(request):
+            response = HttpResponse("menu")
+            response.headers["ETag"] = '"v1"'
+            return response
+
+        with mock.patch("school_menu.deadlines.cache.set_many") as set_many:
+            with_deadline("menu", stale=True)(view)(get_request(rf))
+
+        assert set(set_many.call_args.args[0]) == {
+            stale_response_key(get_request(rf), ()),
+            f'{stale_response_key(get_request(rf), ())}:"v1"',
+        }
+
+    def test_stale_copy_ignores_other_query_params(self, rf):
+        view = with_deadline("menu", stale=True, query_params=("type",))(
+            lambda request: HttpResponse("menu")
+        )
+        view(get_request(rf, path="/menu/?type=2&x=1"))
+
+        response = with_deadline("menu", stale=True, query_params=("type",))(
+            lambda request: run_slow_query()
+        )(get_request(rf, path="/menu/?x=2&type=2"))
+
+        assert response.status_code == 200
+        assert stale_response_key(
+            get_request(rf, path="/menu/?type=2&x=1"), ("type",)
+        ) != stale_response_key(get_request(rf, path="/menu/?type=1"), ("type",))
+
+    @pytest.mark.parametrize(
+        "response",
+        [
+            HttpResponse("error", status=500),
+            StreamingHttpResponse(iter(["menu"])),
+        ],
+    )
+    def test_response_not_kept(self, rf, response):
+        view = with_deadline("menu", stale=True)(lambda request: response)
+        view(get_request(rf))
+
+        with mock.patch("school_menu.deadlines.Deadline.expired", True):
+            response = with_deadline("menu", stale=True)(
+                lambda request: run_slow_query()
+            )(get_request(rf))
+
+        assert response.status_code == 503
+
+    def test_no_stale_response_for_users(self, rf, user_factory):
+        request = get_request(rf, user_factory())
+        view = with_deadline("menu", stale=True)(lambda request: HttpResponse("menu"))
+        view(request)
+
+        response = with_deadline("menu", stale=True)(lambda request: run_slow_query())(
+            request
+        )
+
+        assert response.status_code == 503
@@ -0,0 +1,214 @@
+from io import StringIO
+from unittest import mock
+
+import pytest
+from django.core.management import call_command
+
+from school_menu.dishes import (
+    find_dish,
+    get_dish_tokens,
+    index_school_dishes,
+)
+from school_menu.models import DishToken, School, SimpleMeal
+from school_menu.services import resolve_menu
+
+pytestmark = pytest.mark.django_db
+
+
+class TestDishTokens:
+    def test_simple_meal(self, school_factory):
+        meal = SimpleMeal(menu="Pasta al pomodoro, Pollo con patate", snack="Yogurt")
+
+        assert get_dish_tokens(meal) == {
+            "pasta",
+            "pomodoro",
+            "pollo",
+            "patate",
+            "yogurt",
+        }
+
+    def test_detailed_meal(self, detailed_meal_factory):
+        meal = detailed_meal_factory.build(
+            first_course="Risotto alla milanese",
+            second_course="Merluzzo",
+            side_dish="Purè",
+            fruit="Frutta",
+            snack="Crackers",
+        )
+
+        assert get_dish_tokens(meal) == {
+            "risotto",
+            "milanese",
+            "merluzzo",
+            "pure",
+            "frutta",
+            "crackers",
+        }
+
+
+class TestIndex:
+    def test_meal_writes_are_indexed(self, school_factory, simple_meal_factory):
+        school = school_factory(menu_type=School.Types.SIMPLE)
+        meal = simple_meal_factory(school=school, menu="Pasta", snack="Mela")
+
+        assert set(DishToken.objects.values_list("token", flat=True)) == {
+            "pasta",
+            "mela",
+        }
+
+        meal.menu = "Riso"
+        meal.save()
+
+        assert set(DishToken.objects.values_list("token", flat=True)) == {
+            "riso",
+            "mela",
+        }
+
+        meal.delete()
+
+        assert not DishToken.objects.exists()
+
+    def test_edited_meal_key_replaces_its_tokens(
+        self, school_factory, simple_meal_factory
+    ):
+        school = school_factory(menu_type=School.Types.SIMPLE)
+        meal = simple_meal_factory(
+            school=school, season=1, week=1, day=1, type=1, menu="Pasta", snack=""
+        )
+        other_meal = simple_meal_factory(
+            school=school, season=1, week=1, day=2, type=1, menu="Pasta", snack=""
+        )
+
+        meal.week = 2
+        meal.day = 3
+        meal.save()
+
+        assert set(DishToken.objects.values_list("meal_id", "week", "day")) == {
+            (meal.pk, 2, 3),
+            (other_meal.pk, 1, 2),
+        }
+        assert find_dish("pasta") == [(school, [(1, 1, 2, 1), (1, 2, 3, 1)])]
+
+    def test_meal_without_school(self):
+        meal = SimpleMeal.objects.create(menu="Pasta", snack="Mela", school=None)
+        meal.delete()
+
+        assert not DishToken.objects.exists()
+
+    def test_rebuild(self, school_factory, simple_meal_factory, detailed_meal_factory):
+        simple_school = school_factory(menu_type=School.Types.SIMPLE)
+        simple_meal_factory(school=simple_school, menu="Pasta", snack="Mela")
+        detailed_school = school_factory(menu_type=School.Types.DETAILED)
+        detailed_meal_factory(
+            school=detailed_school,
+            first_course="Riso",
+            second_course="Uova",
+            side_dish="",
+            fruit="",
+            snack="",
+        )
+        DishToken.objects.all().delete()
+
+        assert index_school_dishes(batch_size=1) == 4
+        assert DishToken.objects.count() == 4
+        assert index_school_dishes([simple_school.pk]) == 2
+        assert DishToken.objects.count() == 4
+
+    @mock.patch(
+        "school_menu.management.commands.rebuild_dish_index.index_school_dishes"
+    )
+    def test_command(self, mock_index_school_dishes):
+        mock_index_school_dishes.return_value = 2
+        out = StringIO()
+
+        call_command("rebuild_dish_index", stdout=out)
+
+        assert "Indexed 2 dish words." in out.getvalue()
+
+
+class TestFindDish:
+    def test_every_word_must_match_the_same_meal(
+        self, school_factory, simple_meal_factory
+    ):
+        school = school_factory(menu_type=School.Types.SIMPLE, name="A")
+        meal = simple_meal_factory(
+            school=school, day=1, menu="Pasta al tonno", snack=""
+        )
+        simple_meal_factory(school=school, day=2, menu="Pasta al pesto", snack="")
+        simple_meal_factory(school=school, day=3, menu="Tonno", snack="")
+
+        results = find_dish("pasta TONN")
+
+        assert results == [(school, [(meal.season, meal.week, 1, meal.type)])]
+
+    def test_no_match(self, school_factory, simple_meal_factory):
+        school = school_factory(menu_type=School.Types.SIMPLE)
+        simple_meal_factory(school=school, menu="Pasta", snack="")
+
+        assert find_dish("pasta riso") == []
+        assert find_dish("della") == []
+
+    def test_short_words_are_left_out(
+        self, school_factory, simple_meal_factory, django_assert_num_queries
+    ):
+        school = school_factory(menu_type=School.Types.SIMPLE)
+        simple_meal_factory(school=school, menu="Pasta al tonno", snack="")
+
+        with django_assert_num_queries(0):
+            assert find_dish("p pa") == []
+        assert [result[0] for result in find_dish("pa pasta")] == [school]
+
+    def test_results_are_capped(self, school_factory, simple_meal_factory):
+        for name in ["C", "A", "B"]:
+            school = school_factory(menu_type=School.Types.SIMPLE, name=name)
+            simple_meal_factory(school=school, menu="Pasta", snack="")
+
+        with mock.patch("school_menu.dishes.MAX_DISH_RESULTS", 2):
+            results = find_dish("pasta")
+
+        assert [school.name for school, _ in results] == ["A", "B"]
+
+    def test_query_budget(
+        self, school_factory, simple_meal_factory, django_assert_num_queries
+    ):
+        for _ in range(3):
+            school = school_factory(menu_type=School.Types.SIMPLE)
+            simple_meal_factory(school=school, menu="Pasta al tonno", snack="")
+
+        with django_assert_num_queries(3):
+            results = find_dish("pasta tonno")
+
+        assert len(results) == 3
+
+    def test_inactive_menu_type_is_ignored(self, school_factory, simple_meal_factory):
+        school = school_factory(menu_type=School.Types.SIMPLE)
+        simple_meal_factory(school=school, menu="Pasta", snack="")
+        school.menu_type = School.Types.DETAILED
+        school.save()
+
+        assert find_dish("pasta") == []
+
+    def test_current_week(self, school_factory, simple_meal_factory):
+        school = school_factory(menu_type=School.Types.SIMPLE)
+        today = resolve_menu(school)
+        other_week = today.week % 4 + 1
+        simple_meal_factory(
+            school=school, season=today.season, week=today.week, menu="Pasta"
+        )
+        simple_meal_factory(
+            school=school, season=today.season, week=other_week, menu="Pasta"
+        )
+
+        results = find_dish("pasta", current_week=True)
+
+        assert [meal[1] for meal in results[0][1]] == [today.week]
+        assert len(find_dish("pasta")[0][1]) == 2
+
+    def test_current_week_without_match(self, school_factory, simple_meal_factory):
+        school = school_factory(menu_type=School.Types.SIMPLE)
+        today = resolve_menu(school)
+        simple_meal_factory(
+            school=school, season=today.season, week=today.week % 4 + 1, menu="Pasta"
+        )
+
+        assert find_dish("pasta", current_week=True) == []
@@ -69,7 +69,41 @@ class TestUploadMenuForm:
 
         # Assert the form is invalid
         assert form.is_valid() is False
-        assert form.errors == {"file": ["Il file deve essere in formato xls o xlsx"]}
+        assert form.errors == {
+            "file": ["Il file deve essere in formato xlsx, ods o csv"]
+        }
+
+    @pytest.mark.parametrize(
+        "name, content, valid",
+        [
+            ("menu.csv", b"giorno;settimana\nLuned\xc3\xac;1\n", True),
+            ("menu.ods", b"PK\x03\x04mimetypeapplication/vnd.oasis", True),
+            ("menu.xlsx", b"\xd0\xcf\x11\xe0\x00\x00", False),
+            ("menu.xls", b"PK\x03\x04", False),
+        ],
+    )
+    def test_form_file_content(self, name, content, valid):
+        form = UploadMenuForm(
+            data={"season": Meal.Seasons.INVERNALE},
+            files={"file": SimpleUploadedFile(name, content)},
+        )
+
+        assert form.is_valid() is valid
+
+    def test_form_file_too_large(self, settings):
+        settings.MENU_UPLOAD_MAX_SIZE = 1024 * 1024
+        mock_file = SimpleUploadedFile(
+            "menu.csv", b"giorno;settimana\n" + b"x" * 1024 * 1024
+        )
+
+        form = UploadMenuForm(
+            data={"season": Meal.Seasons.INVERNALE}, files={"file": mock_file}
+        )
+
+        assert form.is_valid() is False
+        assert form.errors == {
+            "file": ["Il file è troppo grande, la dimensione massima è di 1 MB"]
+        }
 
     def def_form_no_file(self):
         # Initialize the form with mock data and file
@@ -0,0 +1,86 @@
+from datetime import date
+
+import pytest
+
+from school_menu.ics import (
+    escape_text,
+    fold_line,
+    get_meal_description,
+    iter_ics_lines,
+)
+from school_menu.models import School
+from school_menu.services import resolve_menu_range
+
+pytestmark = pytest.mark.django_db
+
+
+class TestEscapeText:
+    def test_escape_text(self):
+        assert escape_text("a,b;c\\d\ne\r\nf") == "a\\,b\\;c\\\\d\\ne\\nf"
+
+
+class TestFoldLine:
+    def test_short_line(self):
+        assert fold_line("BEGIN:VCALENDAR") == "BEGIN:VCALENDAR\r\n"
+
+    def test_long_line(self):
+        folded = fold_line("DESCRIPTION:" + "x" * 200)
+
+        lines = folded.removesuffix("\r\n").split("\r\n")
+        assert all(len(line.encode()) <= 75 for line in lines)
+        assert all(line.startswith(" ") for line in lines[1:])
+        assert "".join(line.removeprefix(" ") for line in lines) == (
+            "DESCRIPTION:" + "x" * 200
+        )
+
+    def test_multibyte_characters_are_not_split(self):
+        folded = fold_line("DESCRIPTION:" + "è" * 100)
+
+        lines = folded.removesuffix("\r\n").split("\r\n")
+        assert all(len(line.encode()) <= 75 for line in lines)
+        assert "".join(line.removeprefix(" ") for line in lines) == (
+            "DESCRIPTION:" + "è" * 100
+        )
+
+
+class TestGetMealDescription:
+    def test_simple_meal(self, simple_meal_factory):
+        meal = simple_meal_factory(menu="Pasta al Pomodoro", snack="Yogurt")
+
+        assert get_meal_description(meal) == "Pasta al Pomodoro\nSpuntino: Yogurt"
+
+    def test_detailed_meal(self, detailed_meal_factory):
+        meal = detailed_meal_factory(
+            first_course="Pasta",
+            second_course="Pollo",
+            side_dish="Piselli",
+            fruit="Mela",
+            snack="Yogurt",
+        )
+
+        assert get_meal_description(meal) == (
+            "Primo: Pasta\nSecondo: Pollo\nContorno: Piselli\nFrutta: Mela\nSpuntino: Yogurt"
+        )
+
+
+class TestIterIcsLines:
+    def test_one_event_per_day_with_meal(self, school_factory, simple_meal_factory):
+        school = school_factory(
+            menu_type=School.Types.SIMPLE,
+            season_choice=School.Seasons.INVERNALE,
+            week_bias=0,
+        )
+        for day in [1, 3]:
+            simple_meal_factory(
+                school=school, day=day, week=1, season=School.Seasons.INVERNALE
+            )
+        calendar_days = resolve_menu_range(school, date(2023, 1, 2), date(2023, 1, 8))
+
+        feed = "".join(iter_ics_lines(school, calendar_days, "testserver"))
+
+        assert feed.startswith("BEGIN:VCALENDAR\r\n")
+        assert feed.endswith("END:VCALENDAR\r\n")
+        assert feed.count("BEGIN:VEVENT") == 2
+        assert "DTSTART;VALUE=DATE:20230102\r\n" in feed
+        assert "DTEND;VALUE=DATE:20230105\r\n" in feed
+        assert f"UID:{school.slug}-20230104@testserver" in feed
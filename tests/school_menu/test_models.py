@@ -1,6 +1,9 @@
+from datetime import date, datetime
+
 import pytest
+from django.db import IntegrityError
 
-from school_menu.models import Meal
+from school_menu.models import DailyMenu, DishToken, Meal, MenuImport, RateLimitBucket
 
 pytestmark = pytest.mark.django_db
 
@@ -30,6 +33,15 @@ class TestSimpleMealModel:
 
         assert simple_meal.__str__() == "Lunedì - Settimana 1 [Invernale]"
 
+    def test_natural_key_is_unique(self, school_factory, simple_meal_factory):
+        school = school_factory()
+        simple_meal_factory(school=school, day=1, week=1, season=Meal.Seasons.INVERNALE)
+
+        with pytest.raises(IntegrityError):
+            simple_meal_factory(
+                school=school, day=1, week=1, season=Meal.Seasons.INVERNALE
+            )
+
 
 class TestSchoolModel:
     def test_factory(self, user_factory, school_factory):
@@ -42,3 +54,43 @@ class TestSchoolModel:
         school = school_factory()
 
         assert school.get_absolute_url() == f"/menu/{school.slug}/"
+
+
+class TestDailyMenuModel:
+    def test_str(self, school_factory):
+        school = school_factory(name="Test School")
+        daily_menu = DailyMenu(school=school, date=date(2023, 1, 11), week=2, day=3)
+
+        assert daily_menu.__str__() == "Test School - 2023-01-11"
+
+
+class TestDishTokenModel:
+    def test_str(self):
+        assert DishToken(token="pasta").__str__() == "pasta"
+
+
+class TestRateLimitBucketModel:
+    def test_str(self):
+        assert RateLimitBucket(key="search:1.1.1.1").__str__() == "search:1.1.1.1"
+
+
+class TestMenuImportModel:
+    def test_str(self, school_factory):
+        school = school_factory(name="Test School")
+        menu_import = MenuImport(
+            school=school, created_at=datetime(2023, 1, 11, 8, 30), season=1
+        )
+
+        assert menu_import.__str__() == "Test School - 2023-01-11 08:30"
+
+    @pytest.mark.parametrize(
+        "status, expected",
+        [
+            (MenuImport.Statuses.PENDING, False),
+            (MenuImport.Statuses.RUNNING, False),
+            (MenuImport.Statuses.DONE, True),
+            (MenuImport.Statuses.FAILED, True),
+        ],
+    )
+    def test_is_finished(self, status, expected):
+        assert MenuImport(status=status).is_finished is expected
@@ -0,0 +1,43 @@
+import pytest
+
+from school_menu.models import School
+from school_menu.pagination import decode_cursor, encode_cursor, get_school_page
+
+pytestmark = pytest.mark.django_db
+
+
+class TestCursor:
+    def test_roundtrip(self, school_factory):
+        school = school_factory(name="Scuola Città")
+
+        assert decode_cursor(encode_cursor(school)) == ("Scuola Città", school.pk)
+
+    @pytest.mark.parametrize("cursor", ["not a cursor", "WzEsIDJd", "bnVsbA==", "é"])
+    def test_invalid(self, cursor):
+        assert decode_cursor(cursor) is None
+
+
+class TestGetSchoolPage:
+    def test_pages_follow_name_and_id(self, school_factory):
+        schools = [school_factory(name=name) for name in ("B", "A", "B2", "C")]
+        # schools with the same name are ordered by id
+        School.objects.filter(pk=schools[2].pk).update(name="B")
+        expected = [schools[1], schools[0], schools[2], schools[3]]
+
+        first, cursor = get_school_page(School.objects.all(), None, 3)
+        second, last_cursor = get_school_page(School.objects.all(), cursor, 3)
+
+        assert first + second == expected
+        assert last_cursor is None
+
+    def test_invalid_cursor_gets_first_page(self, school_factory):
+        school = school_factory()
+
+        assert get_school_page(School.objects.all(), "invalid", 10) == ([school], None)
+
+    def test_single_query(self, school_factory, django_assert_num_queries):
+        school_factory.create_batch(3)
+        _, cursor = get_school_page(School.objects.all(), None, 1)
+
+        with django_assert_num_queries(1):
+            get_school_page(School.objects.all(), cursor, 1)
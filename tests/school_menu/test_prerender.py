@@ -0,0 +1,107 @@
+from datetime import date
+from unittest import mock
+
+import pytest
+from django.core.cache import cache
+
+from school_menu.prerender import (
+    discard_prerendered_menu,
+    get_prerender_dir,
+    get_prerender_host,
+    get_prerendered_menu,
+    get_prerendered_path,
+    prerender_pending_key,
+    remove_stale_prerender_dirs,
+    schedule_prerender,
+    write_prerendered_menu,
+)
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.mark.parametrize(
+    "prerender_host, allowed_hosts, expected",
+    [
+        ("menu.example.com", ["*"], "menu.example.com"),
+        ("", ["*", ".example.com", "www.example.com"], "www.example.com"),
+        ("", ["*"], None),
+        ("", [], None),
+    ],
+)
+def test_get_prerender_host(settings, prerender_host, allowed_hosts, expected):
+    settings.PRERENDER_HOST = prerender_host
+    settings.ALLOWED_HOSTS = allowed_hosts
+
+    assert get_prerender_host() == expected
+
+
+class TestPrerenderedFiles:
+    def test_paths_are_versioned_by_day(self, prerender_root):
+        path = get_prerendered_path(7, date(2024, 9, 16))
+
+        assert path == prerender_root / "2024-09-16" / "7.html"
+        assert get_prerender_dir(date(2024, 9, 16)) == path.parent
+
+    def test_write_and_read(self):
+        write_prerendered_menu(1, b"<html></html>")
+
+        assert get_prerendered_menu(1) == b"<html></html>"
+        assert not get_prerendered_path(1).with_suffix(".tmp").exists()
+
+    def test_read_missing_page(self):
+        assert get_prerendered_menu(1) is None
+
+    def test_discard(self):
+        write_prerendered_menu(1, b"<html></html>")
+
+        discard_prerendered_menu(1)
+        discard_prerendered_menu(1)
+
+        assert get_prerendered_menu(1) is None
+
+    def test_remove_stale_dirs(self):
+        write_prerendered_menu(1, b"old", date(2024, 9, 15))
+        write_prerendered_menu(1, b"new", date(2024, 9, 16))
+
+        remove_stale_prerender_dirs(date(2024, 9, 16))
+
+        assert not get_prerender_dir(date(2024, 9, 15)).exists()
+        assert get_prerendered_path(1, date(2024, 9, 16)).read_bytes() == b"new"
+
+    def test_remove_stale_dirs_without_root(self):
+        remove_stale_prerender_dirs(date(2024, 9, 16))
+
+
+class TestSchedulePrerender:
+    @mock.patch("school_menu.prerender.async_task")
+    def test_one_task_for_many_changes(
+        self, mock_async_task, django_capture_on_commit_callbacks
+    ):
+        with django_capture_on_commit_callbacks(execute=True):
+            schedule_prerender(1)
+            schedule_prerender(1)
+
+        mock_async_task.assert_called_once_with(
+            "school_menu.tasks.prerender_school_menu", 1
+        )
+        assert cache.get(prerender_pending_key(1))
+
+    @mock.patch("school_menu.prerender.schedule_prerender")
+    def test_meal_change_discards_page(
+        self, mock_schedule_prerender, school_factory, simple_meal_factory
+    ):
+        school = school_factory()
+        write_prerendered_menu(school.pk, b"<html></html>")
+
+        simple_meal_factory(school=school)
+
+        assert get_prerendered_menu(school.pk) is None
+
+    def test_school_delete_discards_page(self, school_factory):
+        school = school_factory()
+        school_id = school.pk
+        write_prerendered_menu(school_id, b"<html></html>")
+
+        school.delete()
+
+        assert get_prerendered_menu(school_id) is None
@@ -0,0 +1,85 @@
+import pytest
+from django.http import HttpResponse
+
+from school_menu.models import RateLimitBucket
+from school_menu.ratelimit import get_client_ip, hit, rate_limited
+
+
+class TestGetClientIp:
+    def test_remote_addr(self, rf, settings):
+        settings.RATE_LIMIT_PROXY_COUNT = 0
+        request = rf.get("/", HTTP_X_FORWARDED_FOR="1.1.1.1", REMOTE_ADDR="2.2.2.2")
+
+        assert get_client_ip(request) == "2.2.2.2"
+
+    @pytest.mark.parametrize(
+        "forwarded_for, proxy_count, expected",
+        [
+            ("1.1.1.1, 3.3.3.3", 1, "3.3.3.3"),
+            ("1.1.1.1, 3.3.3.3", 2, "1.1.1.1"),
+            ("3.3.3.3", 2, "3.3.3.3"),
+        ],
+    )
+    def test_forwarded_for(self, rf, settings, forwarded_for, proxy_count, expected):
+        settings.RATE_LIMIT_PROXY_COUNT = proxy_count
+        request = rf.get("/", HTTP_X_FORWARDED_FOR=forwarded_for)
+
+        assert get_client_ip(request) == expected
+
+
+@pytest.mark.django_db
+class TestHit:
+    def test_bucket(self):
+        assert [hit("search", "1.1.1.1", 2, 60, now=120) for _ in range(3)] == [
+            0,
+            0,
+            30,
+        ]
+        # a token every 30 seconds
+        assert hit("search", "1.1.1.1", 2, 60, now=135) == 15
+        assert hit("search", "1.1.1.1", 2, 60, now=150) == 0
+        assert hit("search", "1.1.1.1", 2, 60, now=150) == 30
+
+    def test_bucket_refills_up_to_the_rate(self):
+        hit("search", "1.1.1.1", 2, 60, now=120)
+
+        assert [hit("search", "1.1.1.1", 2, 60, now=1200) for _ in range(3)] == [
+            0,
+            0,
+            30,
+        ]
+
+    def test_denied_requests_take_no_token(self):
+        hit("search", "1.1.1.1", 1, 60, now=120)
+        hit("search", "1.1.1.1", 1, 60, now=150)
+
+        assert hit("search", "1.1.1.1", 1, 60, now=180) == 0
+        assert RateLimitBucket.objects.get(key="search:1.1.1.1").allowed
+
+    def test_clients_and_scopes_are_separate(self):
+        hit("search", "1.1.1.1", 1, 60, now=120)
+
+        assert hit("search", "2.2.2.2", 1, 60, now=120) == 0
+        assert hit("menu", "1.1.1.1", 1, 60, now=120) == 0
+
+    def test_retry_after_is_at_least_one_second(self):
+        hit("search", "1.1.1.1", 1, 60, now=120)
+
+        assert hit("search", "1.1.1.1", 1, 60, now=179.5) == 1
+
+    def test_single_query(self, django_assert_num_queries):
+        with django_assert_num_queries(1):
+            hit("search", "1.1.1.1", 1, 60)
+
+
+@pytest.mark.django_db
+class TestRateLimited:
+    def test_throttled(self, rf, settings):
+        settings.RATE_LIMITS = {"test": (1, 60)}
+        view = rate_limited("test")(lambda request: HttpResponse("ok"))
+
+        assert view(rf.get("/")).status_code == 200
+        response = view(rf.get("/"))
+
+        assert response.status_code == 429
+        assert 1 <= int(response["Retry-After"]) <= 60
@@ -0,0 +1,223 @@
+import zipfile
+from io import BytesIO
+from unittest import mock
+
+import pytest
+from django.core.exceptions import ValidationError
+from openpyxl import Workbook
+
+from school_menu.readers import (
+    detect_format,
+    get_cell_text,
+    iter_csv_rows,
+    iter_lines,
+    iter_ods_rows,
+    iter_rows,
+    iter_xlsx_rows,
+)
+
+ODS_CONTENT = """<?xml version="1.0" encoding="UTF-8"?>
+<office:document-content
+    xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0"
+    xmlns:table="urn:oasis:names:tc:opendocument:xmlns:table:1.0"
+    xmlns:text="urn:oasis:names:tc:opendocument:xmlns:text:1.0">
+<office:body><office:spreadsheet>{tables}</office:spreadsheet></office:body>
+</office:document-content>"""
+
+
+def write_workbook(path, *sheets):
+    workbook = Workbook()
+    workbook.remove(workbook.active)
+    for index, rows in enumerate(sheets):
+        sheet = workbook.create_sheet(f"Foglio {index + 1}")
+        for row in rows:
+            sheet.append(row)
+    workbook.save(path)
+    return path
+
+
+def write_ods(*tables):
+    """Write an OpenDocument spreadsheet with a table for each given XML of rows"""
+    file = BytesIO()
+    with zipfile.ZipFile(file, "w") as archive:
+        archive.writestr("mimetype", "application/vnd.oasis.opendocument.spreadsheet")
+        archive.writestr(
+            "content.xml",
+            ODS_CONTENT.format(
+                tables="".join(f"<table:table>{rows}</table:table>" for rows in tables)
+            ),
+        )
+    file.seek(0)
+    return file
+
+
+def test_get_cell_text():
+    assert get_cell_text(None) == ""
+    assert get_cell_text(" Pasta ") == "Pasta"
+    assert get_cell_text(2) == "2"
+
+
+class TestIterXlsxRows:
+    def test_rows_by_header(self, tmp_path):
+        path = write_workbook(
+            tmp_path / "menu.xlsx",
+            [
+                [" giorno ", "settimana", "pranzo"],
+                ["Lunedì", 1, "Pasta"],
+                [None, None, None],
+                ["Martedì", 2],
+            ],
+        )
+
+        rows = list(iter_xlsx_rows(path))
+
+        assert rows == [
+            {"giorno": "Lunedì", "settimana": 1, "pranzo": "Pasta"},
+            {"giorno": "Martedì", "settimana": 2, "pranzo": None},
+        ]
+
+    def test_only_first_sheet(self, tmp_path):
+        path = write_workbook(
+            tmp_path / "menu.xlsx",
+            [["giorno"], ["Lunedì"]],
+            [["giorno"], ["Martedì"]],
+        )
+
+        assert list(iter_xlsx_rows(path)) == [{"giorno": "Lunedì"}]
+
+    def test_empty_sheet(self, tmp_path):
+        path = write_workbook(tmp_path / "menu.xlsx", [])
+
+        assert list(iter_xlsx_rows(path)) == []
+
+    def test_rows_are_read_lazily(self, tmp_path):
+        path = write_workbook(
+            tmp_path / "menu.xlsx",
+            [["giorno"], *([["Lunedì"]] * 1000)],
+        )
+
+        rows = iter_xlsx_rows(path)
+
+        assert next(rows) == {"giorno": "Lunedì"}
+        rows.close()
+
+
+class TestIterOdsRows:
+    def test_rows_by_header(self):
+        file = write_ods(
+            "<table:table-row>"
+            "<table:table-cell><text:p>giorno</text:p></table:table-cell>"
+            "<table:table-cell><text:p>settimana</text:p></table:table-cell>"
+            "<table:table-cell><text:p>pranzo</text:p></table:table-cell>"
+            "<table:table-cell table:number-columns-repeated='1000'/>"
+            "</table:table-row>"
+            "<table:table-row>"
+            "<table:table-cell><text:p>Lunedì</text:p></table:table-cell>"
+            "<table:table-cell office:value-type='float' office:value='2'>"
+            "<text:p>2</text:p></table:table-cell>"
+            "<table:table-cell><text:p>Pasta</text:p><text:p>al sugo</text:p>"
+            "</table:table-cell>"
+            "</table:table-row>"
+            "<table:table-row table:number-rows-repeated='1048000'>"
+            "<table:table-cell table:number-columns-repeated='1024'/>"
+            "</table:table-row>",
+            "<table:table-row><table:table-cell><text:p>altro</text:p>"
+            "</table:table-cell></table:table-row>",
+        )
+
+        rows = list(iter_ods_rows(file))
+
+        assert rows == [
+            {"giorno": "Lunedì", "settimana": 2.0, "pranzo": "Pasta\nal sugo"}
+        ]
+
+    def test_repeated_rows(self):
+        file = write_ods(
+            "<table:table-row><table:table-cell><text:p>giorno</text:p>"
+            "</table:table-cell></table:table-row>"
+            "<table:table-row table:number-rows-repeated='2'>"
+            "<table:table-cell><text:p>Lunedì</text:p></table:table-cell>"
+            "</table:table-row>"
+        )
+
+        assert list(iter_ods_rows(file)) == [{"giorno": "Lunedì"}] * 2
+
+    def test_no_tables(self):
+        assert list(iter_ods_rows(write_ods())) == []
+
+
+class TestIterCsvRows:
+    def test_semicolons_and_quoted_newlines(self):
+        file = BytesIO(
+            "\ufeffgiorno;settimana;pranzo\r\n"
+            'Lunedì;1;"Pasta\r\nal sugo"\r\n'
+            ";;\r\n"
+            "Martedì;2;Riso\r\n".encode()
+        )
+
+        rows = list(iter_csv_rows(file))
+
+        assert rows == [
+            {"giorno": "Lunedì", "settimana": "1", "pranzo": "Pasta\r\nal sugo"},
+            {"giorno": "Martedì", "settimana": "2", "pranzo": "Riso"},
+        ]
+
+    def test_windows_encoding(self):
+        file = BytesIO("giorno,pranzo\nLunedì,Caffè\n".encode("cp1252"))
+
+        assert list(iter_csv_rows(file)) == [{"giorno": "Lunedì", "pranzo": "Caffè"}]
+
+    def test_single_column(self):
+        file = BytesIO(b"giorno\nLunedi")
+
+        assert list(iter_csv_rows(file)) == [{"giorno": "Lunedi"}]
+
+    def test_read_in_chunks(self):
+        content = "giorno,pranzo\n" + "Lunedì,Pasta\n" * 100
+        file = BytesIO(content.encode())
+
+        with mock.patch("school_menu.readers.CSV_CHUNK_SIZE", 7):
+            with mock.patch.object(file, "read", wraps=file.read) as read:
+                rows = iter_csv_rows(file)
+                assert next(rows) == {"giorno": "Lunedì", "pranzo": "Pasta"}
+                assert read.call_count < 10
+                assert len(list(rows)) == 99
+
+
+def test_iter_lines_across_chunks():
+    chunks = ["a,b\r".encode(), "\nc".encode(), ",\xc3".encode("latin-1"), b"\xac"]
+
+    assert list(iter_lines(chunks, "utf-8")) == ["a,b\r\n", "c,ì"]
+
+
+@pytest.mark.parametrize(
+    "content, expected",
+    [
+        (
+            b"PK\x03\x04\x00\x00mimetypeapplication/vnd.oasis.opendocument.spreadsheet",
+            "ods",
+        ),
+        (b"PK\x03\x04\x00\x00[Content_Types].xml", "xlsx"),
+        (b"giorno,settimana\n", "csv"),
+        (b"\xd0\xcf\x11\xe0\x00\x00", None),
+        (b"", None),
+    ],
+)
+def test_detect_format(content, expected):
+    file = BytesIO(content)
+    file.read(2)
+
+    assert detect_format(file) == expected
+    assert file.tell() == 0
+
+
+class TestIterRows:
+    def test_detected_reader(self, tmp_path):
+        path = write_workbook(tmp_path / "menu.csv", [["giorno"], ["Lunedì"]])
+
+        with open(path, "rb") as file:
+            assert list(iter_rows(file)) == [{"giorno": "Lunedì"}]
+
+    def test_not_a_spreadsheet(self):
+        with pytest.raises(ValidationError):
+            list(iter_rows(BytesIO(b"\x00\x01")))
@@ -0,0 +1,194 @@
+from io import StringIO
+from unittest import mock
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+
+from school_menu.search import (
+    PostgresSchoolIndex,
+    SqliteSchoolIndex,
+    create_search_index,
+    drop_search_index,
+    find_schools,
+    find_schools_cached,
+    get_search_index,
+    get_search_terms,
+    normalize_text,
+    rebuild_search_index,
+)
+
+pytestmark = pytest.mark.django_db
+
+
+class TestSearchTerms:
+    def test_normalize_text(self):
+        assert normalize_text("Città di CANTÙ") == "citta di cantu"
+
+    def test_terms(self):
+        assert get_search_terms("  Scuola, Città!") == ["scuola", "citta"]
+
+    def test_no_terms(self):
+        assert get_search_terms(None) == []
+
+    def test_sqlite_match_query(self):
+        assert SqliteSchoolIndex().get_match_query(["via", "ro"]) == '"via"* "ro"*'
+
+    def test_postgres_match_query(self):
+        assert PostgresSchoolIndex().get_match_query(["via", "ro"]) == "via:* & ro:*"
+
+    def test_postgres_index_params(self, school_factory):
+        school = school_factory(name="Scuola Rodari", city="Milano")
+
+        params = PostgresSchoolIndex().get_index_params(school)
+
+        assert params == [[school.pk, "Scuola Rodari", "Milano"]]
+
+    def test_index_for_vendor(self):
+        with mock.patch.object(connection, "vendor", "postgresql"):
+            assert isinstance(get_search_index(), PostgresSchoolIndex)
+
+
+class TestFindSchools:
+    def test_accents_are_ignored(self, school_factory):
+        school = school_factory(name="Scuola Primaria", city="Città di Castello")
+
+        assert find_schools("citta") == [school]
+        assert find_schools("CITTÀ castel") == [school]
+
+    def test_every_word_must_match(self, school_factory):
+        school_factory(name="Scuola Primaria", city="Milano")
+
+        assert find_schools("primaria roma") == []
+
+    def test_name_matches_rank_first(self, school_factory):
+        city_match = school_factory(name="Scuola Verdi", city="Rodari")
+        name_match = school_factory(name="Scuola Rodari", city="Milano")
+
+        assert find_schools("rodari") == [name_match, city_match]
+
+    def test_limit(self, school_factory):
+        school_factory.create_batch(3, city="Milano")
+
+        assert len(find_schools("milano", limit=2)) == 2
+
+    def test_offset(self, school_factory):
+        schools = [school_factory(name=f"Scuola {n}", city="Milano") for n in range(3)]
+
+        assert find_schools("milano", offset=1) == schools[1:]
+
+    def test_no_terms(self, django_assert_num_queries):
+        with django_assert_num_queries(0):
+            assert find_schools("!!") == []
+
+    def test_two_queries(self, school_factory, django_assert_num_queries):
+        school_factory.create_batch(3, city="Milano")
+
+        with django_assert_num_queries(2):
+            find_schools("milano")
+
+    def test_updated_school(self, school_factory):
+        school = school_factory(city="Milano")
+
+        school.city = "Torino"
+        school.save()
+
+        assert find_schools("milano") == []
+        assert find_schools("torino") == [school]
+
+    def test_deleted_school(self, school_factory):
+        school = school_factory(city="Milano")
+
+        school.delete()
+
+        assert find_schools("milano") == []
+
+
+class TestRebuildSearchIndex:
+    def test_drop_and_create(self, school_factory):
+        school = school_factory(city="Milano")
+
+        drop_search_index()
+        create_search_index()
+
+        assert find_schools("milano") == [school]
+
+    def test_rebuild(self, school_factory):
+        school = school_factory(city="Milano")
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM school_menu_school_fts")
+
+        assert rebuild_search_index() == 1
+        assert find_schools("milano") == [school]
+
+    @mock.patch(
+        "school_menu.management.commands.rebuild_search_index.rebuild_search_index"
+    )
+    def test_command(self, mock_rebuild_search_index):
+        mock_rebuild_search_index.return_value = 2
+        out = StringIO()
+
+        call_command("rebuild_search_index", stdout=out)
+
+        assert "Indexed 2 schools." in out.getvalue()
+
+
+class TestFindSchoolsCached:
+    def test_longer_queries_narrow_cached_results(
+        self, school_factory, django_assert_num_queries
+    ):
+        milano = school_factory(name="Scuola Verdi", city="Milano")
+        milazzo = school_factory(name="Scuola Rossi", city="Milazzo")
+        find_schools_cached("mil")
+
+        # the narrowed schools are ranked again on the search index
+        with django_assert_num_queries(1):
+            assert find_schools_cached("MILA") == [milano, milazzo]
+        with django_assert_num_queries(1):
+            assert find_schools_cached("milan") == [milano]
+        with django_assert_num_queries(0):
+            assert find_schools_cached("milan", limit=1, offset=1) == []
+        assert find_schools_cached("mila verdi") == [milano]
+        assert find_schools_cached("milazzo scuola") == [milazzo]
+        with django_assert_num_queries(0):
+            assert find_schools_cached("milano ross") == []
+
+    def test_narrowed_results_are_ranked_for_the_query(self, school_factory):
+        # "mil" matches the name and the city of the first school, "milano" only
+        # its city, while it matches the name of the second
+        milazzo = school_factory(name="Milazzo", city="Milano")
+        milano = school_factory(name="Scuola Milano", city="Roma")
+        assert find_schools_cached("mil") == [milazzo, milano]
+
+        assert find_schools_cached("milano") == find_schools("milano")
+        assert find_schools_cached("milano") == [milano, milazzo]
+
+    def test_school_changes_invalidate(self, school_factory):
+        school = school_factory(city="Milano")
+        assert find_schools_cached("milano") == [school]
+
+        school.city = "Torino"
+        school.save()
+        assert find_schools_cached("milano") == []
+
+        new_school = school_factory(city="Milano")
+        assert find_schools_cached("milano") == [new_school]
+
+        new_school.delete()
+        assert find_schools_cached("milano") == []
+
+    def test_large_results_are_not_cached(
+        self, school_factory, django_assert_num_queries
+    ):
+        school_factory.create_batch(3, city="Milano")
+
+        with mock.patch("school_menu.search.SEARCH_CACHE_THRESHOLD", 1):
+            # the first page is within the results fetched to check the size
+            with django_assert_num_queries(2):
+                assert len(find_schools_cached("milano", limit=1)) == 1
+            # later pages are fetched from the search index
+            with django_assert_num_queries(4):
+                assert len(find_schools_cached("milano", limit=2, offset=1)) == 2
+
+    def test_no_terms(self):
+        assert find_schools_cached("!!") == []
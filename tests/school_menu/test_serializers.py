@@ -0,0 +1,79 @@
+import pytest
+
+from school_menu.models import Meal, School
+from school_menu.serializers import serialize_meal, serialize_menu, serialize_school
+from school_menu.services import resolve_menu
+
+pytestmark = pytest.mark.django_db
+
+
+class TestSerializeSchool:
+    def test_serialize_school(self, school_factory):
+        school = school_factory(name="Test School", city="Milano")
+
+        assert serialize_school(school) == {
+            "name": "Test School",
+            "slug": "test-school",
+            "city": "Milano",
+            "menu_type": school.menu_type,
+            "url": "/menu/test-school/",
+        }
+
+
+class TestSerializeMeal:
+    def test_simple_meal(self, simple_meal_factory):
+        meal = simple_meal_factory(
+            day=1,
+            week=2,
+            season=Meal.Seasons.INVERNALE,
+            menu="Pasta al Pomodoro",
+            snack="Yogurt",
+        )
+
+        assert serialize_meal(meal) == {
+            "day": 1,
+            "week": 2,
+            "season": Meal.Seasons.INVERNALE,
+            "type": Meal.Types.STANDARD,
+            "snack": "Yogurt",
+            "menu": "Pasta al Pomodoro",
+        }
+
+    def test_detailed_meal(self, detailed_meal_factory):
+        meal = detailed_meal_factory(first_course="Pasta al Pesto", fruit="Mela")
+
+        data = serialize_meal(meal)
+
+        assert data["first_course"] == "Pasta al Pesto"
+        assert data["fruit"] == "Mela"
+        assert "menu" not in data
+
+    def test_no_meal(self):
+        assert serialize_meal(None) is None
+
+
+class TestSerializeMenu:
+    def test_serialize_menu(self, school_factory, simple_meal_factory):
+        school = school_factory(
+            menu_type=School.Types.SIMPLE, season_choice=School.Seasons.INVERNALE
+        )
+        meal = simple_meal_factory(
+            school=school, day=2, week=1, season=School.Seasons.INVERNALE
+        )
+        menu = resolve_menu(school, week=1, day=2)
+
+        data = serialize_menu(menu, menu.meal, menu.weekly_meals)
+
+        assert data["school"]["slug"] == school.slug
+        assert (data["season"], data["week"], data["day"]) == (
+            School.Seasons.INVERNALE,
+            1,
+            2,
+        )
+        assert data["meal"] == serialize_meal(meal)
+        assert data["weekly_meals"] == [serialize_meal(meal)]
+
+    def test_serialize_menu_without_week(self, school_factory):
+        menu = resolve_menu(school_factory(), week=1, day=1)
+
+        assert "weekly_meals" not in serialize_menu(menu, None)
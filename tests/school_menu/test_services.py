@@ -0,0 +1,358 @@
+from datetime import date
+from unittest import mock
+
+import pytest
+from django.core.cache import cache
+
+from school_menu.calendar import get_today
+from school_menu.models import DailyMenu, Meal, School
+from school_menu.services import (
+    ResolvedMenu,
+    build_daily_menus,
+    daily_menu_pending_key,
+    group_by_menu_week,
+    group_by_week,
+    refresh_daily_menu,
+    resolve_menu,
+    resolve_menu_range,
+    resolve_today_menus,
+    save_daily_menus,
+)
+
+pytestmark = pytest.mark.django_db
+
+
+class TestResolveMenu:
+    def test_resolve_current_menu(self, school_factory):
+        school = school_factory(week_bias=1, season_choice=School.Seasons.INVERNALE)
+
+        # 2023-01-11 is the wednesday of the second ISO week
+        with mock.patch(
+            "school_menu.calendar.get_today", return_value=date(2023, 1, 11)
+        ):
+            menu = resolve_menu(school)
+
+        assert menu == ResolvedMenu(
+            school=school,
+            season=School.Seasons.INVERNALE,
+            week=3,
+            day=3,
+            type=Meal.Types.STANDARD,
+        )
+
+    def test_resolve_given_menu(self, school_factory):
+        school = school_factory(season_choice=School.Seasons.PRIMAVERILE)
+
+        menu = resolve_menu(school, week=2, day=4, meal_type=Meal.Types.VEGAN)
+
+        assert (menu.week, menu.day, menu.type) == (2, 4, Meal.Types.VEGAN)
+        assert menu.season == School.Seasons.PRIMAVERILE
+
+    def test_resolve_makes_no_queries(self, school_factory, django_assert_num_queries):
+        school = school_factory()
+
+        with django_assert_num_queries(0):
+            resolve_menu(school)
+
+
+class TestResolvedMenu:
+    def test_meal_is_picked_from_the_week(
+        self, school_factory, simple_meal_factory, django_assert_num_queries
+    ):
+        school = school_factory(
+            menu_type=School.Types.SIMPLE, season_choice=School.Seasons.INVERNALE
+        )
+        meals = [
+            simple_meal_factory(
+                school=school, day=day, week=1, season=School.Seasons.INVERNALE
+            )
+            for day in range(1, 6)
+        ]
+        menu = resolve_menu(school, week=1, day=3)
+
+        with django_assert_num_queries(1):
+            context = menu.context
+
+        assert context["meal"] == meals[2]
+        assert context["weekly_meals"] == meals
+        assert context["school"] == school
+        assert (context["week"], context["day"]) == (1, 3)
+
+    def test_meal_missing(self, school_factory):
+        school = school_factory(menu_type=School.Types.DETAILED)
+
+        menu = resolve_menu(school, week=1, day=1)
+
+        assert menu.meal is None
+        assert menu.weekly_meals == []
+
+
+class TestResolveMenuRange:
+    def test_days_are_mapped_to_meals(
+        self, school_factory, simple_meal_factory, django_assert_num_queries
+    ):
+        school = school_factory(
+            menu_type=School.Types.SIMPLE,
+            season_choice=School.Seasons.INVERNALE,
+            week_bias=0,
+        )
+        # 2023-01-02 is the monday of the first ISO week
+        monday = simple_meal_factory(
+            school=school, day=1, week=1, season=School.Seasons.INVERNALE
+        )
+        friday = simple_meal_factory(
+            school=school, day=5, week=2, season=School.Seasons.INVERNALE
+        )
+
+        with django_assert_num_queries(1):
+            calendar_days = resolve_menu_range(
+                school, date(2023, 1, 2), date(2023, 1, 31)
+            )
+
+        days = {calendar_day.date: calendar_day for calendar_day in calendar_days}
+        assert len(calendar_days) == 22
+        assert days[date(2023, 1, 2)].meal == monday
+        assert days[date(2023, 1, 13)].meal == friday
+        assert days[date(2023, 1, 30)].meal == monday
+        assert days[date(2023, 1, 3)].meal is None
+
+    def test_query_count_does_not_depend_on_range(
+        self, school_factory, django_assert_num_queries
+    ):
+        school = school_factory()
+
+        with django_assert_num_queries(1):
+            resolve_menu_range(school, date(2023, 9, 1), date(2024, 6, 30))
+
+
+class TestGroupByWeek:
+    def test_weeks_have_five_slots(self, school_factory):
+        school = school_factory()
+        # from wednesday to the next tuesday
+        calendar_days = resolve_menu_range(school, date(2023, 1, 4), date(2023, 1, 10))
+
+        weeks = group_by_week(calendar_days)
+
+        assert len(weeks) == 2
+        assert weeks[0][:2] == [None, None]
+        assert weeks[0][2].date == date(2023, 1, 4)
+        assert weeks[1][1].date == date(2023, 1, 10)
+        assert weeks[1][2:] == [None, None, None]
+
+
+class TestResolveTodayMenus:
+    def test_one_query_per_meal_table(
+        self,
+        school_factory,
+        simple_meal_factory,
+        detailed_meal_factory,
+        django_assert_num_queries,
+    ):
+        schools = []
+        menu_types = [School.Types.SIMPLE, School.Types.DETAILED] * 3
+        for index, menu_type in enumerate(menu_types):
+            school = school_factory(
+                menu_type=menu_type,
+                season_choice=School.Seasons.INVERNALE,
+                week_bias=index % 4,
+            )
+            factory = (
+                simple_meal_factory
+                if menu_type == School.Types.SIMPLE
+                else detailed_meal_factory
+            )
+            # 2023-01-11 is the wednesday of the second ISO week
+            factory(
+                school=school,
+                day=3,
+                week=(1 + index) % 4 + 1,
+                season=School.Seasons.INVERNALE,
+            )
+            schools.append(school)
+
+        with mock.patch(
+            "school_menu.calendar.get_today", return_value=date(2023, 1, 11)
+        ):
+            with django_assert_num_queries(2):
+                menus = resolve_today_menus(schools)
+
+        assert [menu.school for menu, meal in menus] == schools
+        assert all(meal.school_id == menu.school.pk for menu, meal in menus)
+
+    def test_missing_meals(self, school_factory):
+        school = school_factory(menu_type=School.Types.SIMPLE)
+
+        menus = resolve_today_menus([school])
+
+        assert menus[0][1] is None
+
+    def test_no_schools(self, django_assert_num_queries):
+        with django_assert_num_queries(0):
+            assert resolve_today_menus([]) == []
+
+
+class TestGroupByMenuWeek:
+    def test_groups_keep_order(self):
+        menus = [
+            (ResolvedMenu(school=name, season=2, week=week, day=1, type=1), None)
+            for name, week in [("a", 3), ("b", 1), ("c", 3), ("d", 1)]
+        ]
+
+        groups = group_by_menu_week(menus)
+
+        assert [(group["season"], group["week"]) for group in groups] == [
+            (Meal.Seasons.INVERNALE, Meal.Weeks.SETTIMANA_1),
+            (Meal.Seasons.INVERNALE, Meal.Weeks.SETTIMANA_3),
+        ]
+        assert [[menu.school for menu, meal in group["menus"]] for group in groups] == [
+            ["b", "d"],
+            ["a", "c"],
+        ]
+
+
+class TestDailyMenus:
+    def test_build_one_query_per_meal_table(
+        self,
+        school_factory,
+        simple_meal_factory,
+        detailed_meal_factory,
+        django_assert_num_queries,
+    ):
+        simple_school = school_factory(
+            menu_type=School.Types.SIMPLE,
+            season_choice=School.Seasons.INVERNALE,
+            week_bias=0,
+        )
+        detailed_school = school_factory(
+            menu_type=School.Types.DETAILED,
+            season_choice=School.Seasons.INVERNALE,
+            week_bias=1,
+        )
+        # 2023-01-11 is the wednesday of the second ISO week
+        simple_meals = [
+            simple_meal_factory(
+                school=simple_school, day=day, week=2, season=School.Seasons.INVERNALE
+            )
+            for day in (1, 3)
+        ]
+        detailed_meal = detailed_meal_factory(
+            school=detailed_school, day=3, week=3, season=School.Seasons.INVERNALE
+        )
+
+        with django_assert_num_queries(2):
+            simple_menu, detailed_menu = build_daily_menus(
+                [simple_school, detailed_school], date(2023, 1, 11)
+            )
+
+        assert (simple_menu.week, simple_menu.day) == (2, 3)
+        assert simple_menu.weekly_meal_ids == [meal.pk for meal in simple_meals]
+        assert detailed_menu.weekly_meal_ids == [detailed_meal.pk]
+        assert detailed_menu.date == date(2023, 1, 11)
+
+    def test_build_missing_meal(self, school_factory):
+        school = school_factory()
+
+        daily_menu = build_daily_menus([school], date(2023, 1, 11))[0]
+
+        assert daily_menu.weekly_meal_ids == []
+
+    def test_save_updates_existing_rows(self, school_factory):
+        school = school_factory()
+        save_daily_menus(build_daily_menus([school], date(2023, 1, 11)))
+
+        save_daily_menus(build_daily_menus([school], date(2023, 1, 12)))
+
+        assert DailyMenu.objects.get().date == date(2023, 1, 12)
+
+    def test_refresh(self, school_factory):
+        school = school_factory()
+
+        refresh_daily_menu(school.pk)
+
+        assert DailyMenu.objects.get(school=school).date == get_today()
+
+    def test_refresh_deleted_school(self):
+        refresh_daily_menu(999)
+
+        assert not DailyMenu.objects.exists()
+
+    @mock.patch("school_menu.prerender.async_task")
+    def test_meal_change_refreshes_daily_menu(
+        self,
+        mock_async_task,
+        school_factory,
+        simple_meal_factory,
+        django_capture_on_commit_callbacks,
+    ):
+        with django_capture_on_commit_callbacks(execute=True):
+            school = school_factory(menu_type=School.Types.SIMPLE)
+        today = resolve_menu(school)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            meal = simple_meal_factory(
+                school=school, season=today.season, week=today.week, day=today.day
+            )
+
+        assert DailyMenu.objects.get(school=school).weekly_meal_ids == [meal.pk]
+
+    @mock.patch("school_menu.prerender.async_task")
+    def test_changes_in_a_row_refresh_once(
+        self,
+        mock_async_task,
+        school_factory,
+        simple_meal_factory,
+        django_capture_on_commit_callbacks,
+    ):
+        with django_capture_on_commit_callbacks(execute=True):
+            school = school_factory(menu_type=School.Types.SIMPLE)
+
+        with django_capture_on_commit_callbacks() as callbacks:
+            for day in range(1, 6):
+                simple_meal_factory(school=school, season=1, week=1, day=day)
+
+        assert len(callbacks) == 1
+        callbacks[0]()
+        assert not cache.get(daily_menu_pending_key(school.pk))
+
+
+class TestResolveDailyMenu:
+    def test_daily_menu_is_used(
+        self, school_factory, simple_meal_factory, django_assert_num_queries
+    ):
+        school = school_factory(menu_type=School.Types.SIMPLE)
+        menu = resolve_menu(school)
+        meal = simple_meal_factory(
+            school=school, season=menu.season, week=menu.week, day=menu.day
+        )
+        refresh_daily_menu(school.pk)
+        school = School.objects.select_related("daily_menu").get(pk=school.pk)
+
+        with mock.patch("school_menu.services.resolve_school_date") as mock_resolve:
+            menu = resolve_menu(school)
+            with django_assert_num_queries(1):
+                assert menu.meal == meal
+
+        mock_resolve.assert_not_called()
+        assert menu.meal_ids == (meal.pk,)
+
+    def test_stale_daily_menu_is_ignored(self, school_factory):
+        school = school_factory()
+        save_daily_menus(build_daily_menus([school], date(2023, 1, 11)))
+        school = School.objects.select_related("daily_menu").get(pk=school.pk)
+
+        menu = resolve_menu(school)
+
+        assert menu.meal_ids is None
+
+    def test_missing_daily_menu(self, school_factory):
+        school_factory()
+        school = School.objects.select_related("daily_menu").get()
+
+        assert resolve_menu(school).meal_ids is None
+
+    def test_given_menu_ignores_daily_menu(self, school_factory):
+        school = school_factory()
+        refresh_daily_menu(school.pk)
+        school = School.objects.select_related("daily_menu").get(pk=school.pk)
+
+        assert resolve_menu(school, week=1, day=1).meal_ids is None
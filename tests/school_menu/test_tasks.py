@@ -0,0 +1,223 @@
+import os
+import time
+from datetime import date
+from io import StringIO
+from unittest import mock
+from zipfile import BadZipFile
+
+import pandas as pd
+import pytest
+from django.core.cache import cache
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+
+from school_menu.calendar import get_today
+from school_menu.models import (
+    DailyMenu,
+    MenuImport,
+    RateLimitBucket,
+    School,
+    SimpleMeal,
+)
+from school_menu.prerender import (
+    get_prerender_dir,
+    get_prerendered_menu,
+    prerender_pending_key,
+    write_prerendered_menu,
+)
+from school_menu.ratelimit import hit
+from school_menu.services import resolve_menu
+from school_menu.tasks import (
+    import_school_menu,
+    prerender_menus,
+    prerender_school_menu,
+    prerender_school_menus,
+    purge_rate_limit_buckets,
+    rebuild_daily_menus,
+    render_school_menu,
+)
+
+pytestmark = pytest.mark.django_db
+
+
+class TestRenderSchoolMenu:
+    def test_render(self, school_factory):
+        school = school_factory(name="Test School")
+
+        content = render_school_menu(school, "scuola.example.com").decode()
+
+        assert "Test School" in content
+        assert f"scuola.example.com{school.get_absolute_url()}" in content
+
+    def test_render_skips_the_menu_cache(self, school_factory, simple_meal_factory):
+        school = school_factory(menu_type=School.Types.SIMPLE)
+        menu = resolve_menu(school)
+        meal = simple_meal_factory(
+            school=school,
+            season=menu.season,
+            week=menu.week,
+            day=menu.day,
+            type=menu.type,
+            menu="Pasta al pomodoro",
+        )
+        assert resolve_menu(school).meal == meal
+        # edited by another process, the cache of this one is not invalidated
+        SimpleMeal.objects.filter(pk=meal.pk).update(menu="Risotto alla milanese")
+
+        content = render_school_menu(school, "testserver").decode()
+
+        assert "Risotto alla milanese" in content
+
+
+class TestPrerenderSchoolMenu:
+    def test_prerender(self, school_factory):
+        school = school_factory()
+        cache.set(prerender_pending_key(school.pk), True)
+
+        prerender_school_menu(school.pk)
+
+        assert get_prerendered_menu(school.pk)
+        assert cache.get(prerender_pending_key(school.pk)) is None
+
+    def test_prerender_deleted_school(self):
+        prerender_school_menu(999)
+
+        assert get_prerendered_menu(999) is None
+
+    def test_prerender_without_host(self, settings, school_factory):
+        settings.PRERENDER_HOST = ""
+        settings.ALLOWED_HOSTS = []
+        school = school_factory()
+
+        prerender_school_menu(school.pk)
+
+        assert get_prerendered_menu(school.pk) is None
+
+
+class TestPrerenderMenus:
+    def test_prerender_all_schools(self, school_factory):
+        schools = school_factory.create_batch(3)
+        write_prerendered_menu(schools[0].pk, b"old", date(2020, 1, 1))
+
+        count = prerender_menus(batch_size=2, sync=True)
+
+        assert count == 3
+        assert all(get_prerendered_menu(school.pk) for school in schools)
+        assert not get_prerender_dir(date(2020, 1, 1)).exists()
+
+    def test_batches_are_queued(self, school_factory):
+        schools = school_factory.create_batch(3)
+
+        with mock.patch("school_menu.tasks.async_task") as async_task:
+            count = prerender_menus(batch_size=2)
+
+        assert count == 3
+        day = get_today()
+        assert async_task.call_args_list == [
+            mock.call(
+                "school_menu.tasks.prerender_school_menus",
+                [schools[0].pk, schools[1].pk],
+                day,
+                "testserver",
+            ),
+            mock.call(
+                "school_menu.tasks.prerender_school_menus",
+                [schools[2].pk],
+                day,
+                "testserver",
+            ),
+        ]
+        assert not any(get_prerendered_menu(school.pk) for school in schools)
+
+    def test_without_host(self, settings, school_factory):
+        settings.PRERENDER_HOST = ""
+        settings.ALLOWED_HOSTS = ["*"]
+        school = school_factory()
+
+        with mock.patch("school_menu.tasks.async_task") as async_task:
+            assert prerender_menus() == 0
+
+        async_task.assert_not_called()
+        assert get_prerendered_menu(school.pk) is None
+
+    def test_prerender_batch(self, school_factory):
+        schools = school_factory.create_batch(2)
+
+        count = prerender_school_menus(
+            [school.pk for school in schools], get_today(), "testserver"
+        )
+
+        assert count == 2
+        assert all(get_prerendered_menu(school.pk) for school in schools)
+
+    @mock.patch("school_menu.management.commands.prerender_menus.prerender_menus")
+    def test_command(self, mock_prerender_menus):
+        mock_prerender_menus.return_value = 2
+        out = StringIO()
+
+        call_command("prerender_menus", stdout=out)
+
+        mock_prerender_menus.assert_called_once_with(sync=True)
+        assert "Rendered 2 menu pages." in out.getvalue()
+
+
+class TestRebuildDailyMenus:
+    def test_rebuild_all_schools(self, school_factory, django_assert_num_queries):
+        school_factory.create_batch(3, menu_type=School.Types.SIMPLE)
+
+        # count, then per batch: schools, meals and upsert
+        with django_assert_num_queries(1 + 2 * 3):
+            count = rebuild_daily_menus(batch_size=2)
+
+        assert count == 3
+        assert DailyMenu.objects.count() == 3
+
+
+class TestImportSchoolMenu:
+    def test_import(self, tmp_path, school_factory):
+        school = school_factory(menu_type=School.Types.SIMPLE)
+        path = tmp_path / "menu.xlsx"
+        pd.DataFrame(
+            [["Lunedì", 1, "Pasta al pomodoro", "Yogurt"]],
+            columns=["giorno", "settimana", "pranzo", "spuntino"],
+        ).to_excel(path, index=False, engine="openpyxl")
+        menu_import = MenuImport.objects.create(
+            school=school, season=1, file=File(path.open("rb"), name="menu.xlsx")
+        )
+        stored = menu_import.file.path
+
+        import_school_menu(menu_import.pk)
+
+        menu_import.refresh_from_db()
+        assert menu_import.status == MenuImport.Statuses.DONE
+        assert SimpleMeal.objects.filter(school=school).count() == 1
+        assert not menu_import.file
+        assert not os.path.exists(stored)
+
+    def test_unreadable_file(self, school_factory):
+        menu_import = MenuImport.objects.create(
+            school=school_factory(),
+            season=1,
+            file=ContentFile(b"PK\x03\x04not a spreadsheet", name="menu.xlsx"),
+        )
+
+        with pytest.raises(BadZipFile):
+            import_school_menu(menu_import.pk)
+
+        menu_import.refresh_from_db()
+        assert menu_import.status == MenuImport.Statuses.FAILED
+        assert menu_import.message
+        assert not menu_import.file
+
+
+class TestPurgeRateLimitBuckets:
+    def test_purge(self, settings):
+        settings.RATE_LIMITS = {"search": (1, 60), "menu": (1, 600)}
+        hit("search", "1.1.1.1", 1, 60, now=time.time() - 601)
+        hit("search", "2.2.2.2", 1, 60, now=time.time() - 599)
+
+        assert purge_rate_limit_buckets() == 1
+        assert list(RateLimitBucket.objects.values_list("key", flat=True)) == [
+            "search:2.2.2.2"
+        ]
@@ -1,118 +1,75 @@
-from datetime import datetime
-from unittest import mock
+from io import BytesIO
 from unittest.mock import MagicMock, patch
 
 import pandas as pd
 import pytest
+from django.core.exceptions import ValidationError
 from django.http import Http404
 
-from school_menu.models import DetailedMeal, School, SimpleMeal
+from school_menu.models import (
+    DetailedMeal,
+    DishToken,
+    Meal,
+    MenuImport,
+    School,
+    SimpleMeal,
+)
 from school_menu.utils import (
-    calculate_week,
-    get_current_date,
-    get_season,
+    count_rows,
+    get_meal_for_day,
+    get_meal_type,
+    get_offset,
     get_user,
     import_menu,
+    validate_menu,
 )
 
 pytestmark = pytest.mark.django_db
 
 
-class TestCalculateWeek:
-    @pytest.mark.parametrize(
-        "week, bias, expected",
-        [
-            (1, 0, 1),  # Test case 1: No bias, beginning of the month
-            (4, 0, 4),  # Test case 2: No bias, end of the month
-            (5, 0, 1),  # Test case 3: No bias, beginning of next month
-            (8, 0, 4),  # Test case 4: No bias, end of next month
-            (1, 3, 4),  # Test case 5: Positive bias, shifts to end of month
-            (52, 0, 4),  # Test case 6: No bias, last week of the year
-            (49, 3, 4),  # Test case 7: Positive bias, shifts to last week of the year
-        ],
-    )
-    def test_calculate_week(self, week, bias, expected):
-        assert (
-            calculate_week(week, bias) == expected
-        ), f"Failed for week: {week}, bias: {bias}"
+class TestGetMealForDay:
+    def test_meal_found(self, simple_meal_factory):
+        meals = [simple_meal_factory(day=day) for day in [1, 2, 3]]
 
+        assert get_meal_for_day(meals, 2) == meals[1]
 
-class TestGetCurrentDate:
-    # Test scenarios for different days of the week
+    def test_meal_not_found(self, simple_meal_factory):
+        meals = [simple_meal_factory(day=1)]
+
+        assert get_meal_for_day(meals, 5) is None
+
+
+class TestGetMealType:
     @pytest.mark.parametrize(
-        "test_date, expected_week, expected_day",
+        "query, expected",
         [
-            ("2023-04-03", 14, 1),  # Monday
-            ("2023-04-05", 14, 3),  # Wednesday
-            ("2023-04-08", 15, 1),  # Saturday (should return next Monday)
-            ("2023-04-09", 15, 1),  # Sunday (should return next Monday)
+            ({}, Meal.Types.STANDARD),
+            ({"type": "2"}, Meal.Types.GLUTEN_FREE),
+            ({"type": "9"}, Meal.Types.STANDARD),
+            ({"type": "vegan"}, Meal.Types.STANDARD),
         ],
     )
-    def test_get_current_date(self, test_date, expected_week, expected_day):
-        # Mock datetime.now() to return a specific test date
-        with mock.patch("school_menu.utils.datetime") as mock_datetime:
-            mock_datetime.now.return_value = datetime.strptime(test_date, "%Y-%m-%d")
-            mock_datetime.isocalendar = datetime.isocalendar
-            current_week, current_day = get_current_date()
-            assert (
-                current_week == expected_week
-            ), f"Expected week {expected_week}, got {current_week}"
-            assert (
-                current_day == expected_day
-            ), f"Expected day {expected_day}, got {current_day}"
-
-
-class TestGetSeason:
+    def test_get_meal_type(self, rf, query, expected):
+        request = rf.get("/", data=query)
+
+        assert get_meal_type(request) == expected
+
+
+class TestGetOffset:
     @pytest.mark.parametrize(
-        "current_date, season_choice, expected_season",
+        "query, expected",
         [
-            (
-                datetime(2023, 1, 15),
-                School.Seasons.AUTOMATICA,
-                School.Seasons.INVERNALE,
-            ),  # Winter case
-            (
-                datetime(2023, 6, 15),
-                School.Seasons.AUTOMATICA,
-                School.Seasons.PRIMAVERILE,
-            ),  # Spring/Summer case
-            (
-                datetime(2023, 10, 1),
-                School.Seasons.AUTOMATICA,
-                School.Seasons.INVERNALE,
-            ),  # Autumn, should be winter
-            (
-                datetime(2023, 9, 23),
-                School.Seasons.AUTOMATICA,
-                School.Seasons.INVERNALE,
-            ),  # Winter Edge Case
-            (
-                datetime(2023, 6, 20),
-                School.Seasons.AUTOMATICA,
-                School.Seasons.PRIMAVERILE,
-            ),  # Spring Edge Case
-            (
-                datetime(2023, 4, 1),
-                School.Seasons.INVERNALE,
-                School.Seasons.INVERNALE,
-            ),  # Explicitly set to winter
-            (
-                datetime(2023, 1, 1),
-                School.Seasons.PRIMAVERILE,
-                School.Seasons.PRIMAVERILE,
-            ),  # Explicitly set to spring
+            ({}, 0),
+            ({"offset": "20"}, 20),
+            ({"offset": "-5"}, 0),
+            ({"offset": "9999"}, 100),
+            ({"offset": "next"}, 0),
         ],
     )
-    def test_get_season(
-        self,
-        current_date: datetime,
-        season_choice: School.Seasons | School.Seasons | School.Seasons,
-        expected_season: School.Seasons | School.Seasons,
-    ):
-        with mock.patch("school_menu.utils.datetime") as mock_datetime:
-            mock_datetime.now.return_value = current_date
-            school = School(season_choice=season_choice)
-            assert get_season(school) == expected_season
+    def test_get_offset(self, rf, query, expected):
+        request = rf.get("/", data=query)
+
+        assert get_offset(request, 100) == expected
 
 
 @pytest.fixture
@@ -141,6 +98,14 @@ class TestGetUser:
                 get_user(pk=999)
 
 
+SIMPLE_COLUMNS = ["giorno", "settimana", "pranzo", "spuntino"]
+
+
+def write_menu_file(path, rows, columns=SIMPLE_COLUMNS):
+    pd.DataFrame(rows, columns=columns).to_excel(path, index=False, engine="openpyxl")
+    return BytesIO(path.read_bytes())
+
+
 @pytest.fixture
 def simple_meal_file(tmp_path):
     data = [
@@ -149,7 +114,7 @@ def simple_meal_file(tmp_path):
     df = pd.DataFrame(data, columns=["giorno", "settimana", "pranzo", "spuntino"])
     file_path = tmp_path / "simple_meal_import.xlsx"
     df.to_excel(file_path, index=False, engine="openpyxl")
-    yield file_path
+    yield BytesIO(file_path.read_bytes())
 
 
 @pytest.fixture
@@ -160,7 +125,7 @@ def simple_meal_file_missing_column(tmp_path):
     df = pd.DataFrame(data, columns=["giorno", "settimana", "pranzo"])
     file_path = tmp_path / "simple_meal_import.xlsx"
     df.to_excel(file_path, index=False, engine="openpyxl")
-    yield file_path
+    yield BytesIO(file_path.read_bytes())
 
 
 @pytest.fixture
@@ -171,7 +136,7 @@ def simple_meal_file_wrong_day(tmp_path):
     df = pd.DataFrame(data, columns=["giorno", "settimana", "pranzo", "spuntino"])
     file_path = tmp_path / "simple_meal_import.xlsx"
     df.to_excel(file_path, index=False, engine="openpyxl")
-    yield file_path
+    yield BytesIO(file_path.read_bytes())
 
 
 @pytest.fixture
@@ -201,7 +166,7 @@ def detailed_meal_file(tmp_path):
     )
     file_path = tmp_path / "detailed_meal_import.xlsx"
     df.to_excel(file_path, index=False, engine="openpyxl")
-    yield file_path
+    yield BytesIO(file_path.read_bytes())
 
 
 @pytest.fixture
@@ -222,7 +187,7 @@ def detailed_meal_file_missing_column(tmp_path):
     )
     file_path = tmp_path / "detailed_meal_import.xlsx"
     df.to_excel(file_path, index=False, engine="openpyxl")
-    yield file_path
+    yield BytesIO(file_path.read_bytes())
 
 
 @pytest.fixture
@@ -252,66 +217,78 @@ def detailed_meal_file_wrong_day(tmp_path):
     )
     file_path = tmp_path / "detailed_meal_import.xlsx"
     df.to_excel(file_path, index=False, engine="openpyxl")
-    yield file_path
+    yield BytesIO(file_path.read_bytes())
 
 
 class TestImportMenu:
     def test_simple_meal_import_success(self, simple_meal_file, school_factory):
-        school = school_factory()
-        request = MagicMock()
+        school = school_factory(menu_type=School.Types.SIMPLE)
+
+        menu_import = MenuImport.objects.create(
+            school=school, season=School.Seasons.PRIMAVERILE
+        )
+
+        import_menu(menu_import, simple_meal_file)
+
+        assert SimpleMeal.objects.count() == 1
+        menu_import.refresh_from_db()
+        assert menu_import.status == MenuImport.Statuses.DONE
+        assert (menu_import.rows_parsed, menu_import.rows_written) == (1, 1)
+
+    def test_simple_meal_reimport_updates_meal(self, simple_meal_file, school_factory):
+        school = school_factory(menu_type=School.Types.SIMPLE)
+        SimpleMeal.objects.create(
+            school=school,
+            week=1,
+            day=1,
+            season=School.Seasons.PRIMAVERILE,
+            menu="Riso in bianco",
+            snack="Crackers",
+        )
 
         import_menu(
-            request,
+            MenuImport.objects.create(school=school, season=School.Seasons.PRIMAVERILE),
             simple_meal_file,
-            School.Types.SIMPLE,
-            school,
-            School.Seasons.PRIMAVERILE,
         )
 
         assert SimpleMeal.objects.count() == 1
+        assert SimpleMeal.objects.get().menu == "Pasta al Pomodoro"
 
     def test_simple_meal_import_missing_column(
         self, simple_meal_file_missing_column, school_factory
     ):
-        school = school_factory()
-        request = MagicMock()
+        school = school_factory(menu_type=School.Types.SIMPLE)
 
-        import_menu(
-            request,
-            simple_meal_file_missing_column,
-            School.Types.SIMPLE,
-            school,
-            School.Seasons.PRIMAVERILE,
+        menu_import = MenuImport.objects.create(
+            school=school, season=School.Seasons.PRIMAVERILE
         )
 
+        import_menu(menu_import, simple_meal_file_missing_column)
+
         assert SimpleMeal.objects.count() == 0
+        menu_import.refresh_from_db()
+        assert menu_import.status == MenuImport.Statuses.FAILED
+        assert (menu_import.rows_parsed, menu_import.rows_written) == (1, 0)
+        assert "colonne richieste" in menu_import.message
 
     def test_simple_meal_import_wrong_day(
         self, simple_meal_file_wrong_day, school_factory
     ):
-        school = school_factory()
-        request = MagicMock()
+        school = school_factory(menu_type=School.Types.SIMPLE)
 
         import_menu(
-            request,
+            MenuImport.objects.create(school=school, season=School.Seasons.PRIMAVERILE),
             simple_meal_file_wrong_day,
-            School.Types.SIMPLE,
-            school,
-            School.Seasons.PRIMAVERILE,
         )
 
         assert SimpleMeal.objects.count() == 0
 
     def test_detailed_meal_import_success(self, detailed_meal_file, school_factory):
-        school = school_factory()
-        request = MagicMock()
+        school = school_factory(menu_type=School.Types.DETAILED)
 
         import_menu(
-            request,
+            MenuImport.objects.create(school=school, season=School.Seasons.PRIMAVERILE),
             detailed_meal_file,
-            School.Types.DETAILED,
-            school,
-            School.Seasons.PRIMAVERILE,
         )
 
         assert DetailedMeal.objects.count() == 1
@@ -319,15 +296,11 @@ class TestImportMenu:
     def test_detailed_meal_wrong_day(
         self, detailed_meal_file_wrong_day, school_factory
     ):
-        school = school_factory()
-        request = MagicMock()
+        school = school_factory(menu_type=School.Types.DETAILED)
 
         import_menu(
-            request,
+            MenuImport.objects.create(school=school, season=School.Seasons.PRIMAVERILE),
             detailed_meal_file_wrong_day,
-            School.Types.DETAILED,
-            school,
-            School.Seasons.PRIMAVERILE,
         )
 
         assert DetailedMeal.objects.count() == 0
@@ -335,15 +308,278 @@ class TestImportMenu:
     def test_detailed_meal_missing_column(
         self, detailed_meal_file_missing_column, school_factory
     ):
-        school = school_factory()
-        request = MagicMock()
+        school = school_factory(menu_type=School.Types.DETAILED)
 
         import_menu(
-            request,
+            MenuImport.objects.create(school=school, season=School.Seasons.PRIMAVERILE),
             detailed_meal_file_missing_column,
-            School.Types.DETAILED,
-            school,
-            School.Seasons.PRIMAVERILE,
         )
 
         assert DetailedMeal.objects.count() == 0
+
+    def test_season_import_query_budget(
+        self, tmp_path, school_factory, django_assert_num_queries
+    ):
+        school = school_factory(menu_type=School.Types.SIMPLE)
+        days = ["Lunedì", "Martedì", "Mercoledì", "Giovedì", "Venerdì"]
+        rows = [
+            [day, week, f"Pasta {week} {day}", "Yogurt"]
+            for week in range(1, 5)
+            for day in days
+        ]
+        path = write_menu_file(tmp_path / "menu.xlsx", rows)
+
+        # progress, savepoint, saved meals, insert, dish tokens (delete, two meal
+        # tables, insert), release, menu version and outcome, the same for 20 or 2
+        menu_import = MenuImport.objects.create(
+            school=school, season=School.Seasons.INVERNALE
+        )
+
+        with django_assert_num_queries(11):
+            import_menu(menu_import, path)
+
+        assert SimpleMeal.objects.filter(school=school).count() == 20
+        assert DishToken.objects.filter(school=school, token="pasta").count() == 20
+
+    def test_reimport_updates_edited_meal(self, tmp_path, school_factory):
+        school = school_factory(menu_type=School.Types.SIMPLE)
+        rows = [["Lunedì", 1, "Pasta al pomodoro", "Yogurt"]]
+        path = write_menu_file(tmp_path / "menu.xlsx", rows)
+        import_menu(MenuImport.objects.create(school=school, season=1), path)
+        rows = [["Lunedì", 1, "Riso al pomodoro", "Mela"]]
+        path = write_menu_file(tmp_path / "menu.xlsx", rows)
+
+        import_menu(MenuImport.objects.create(school=school, season=1), path)
+
+        meal = SimpleMeal.objects.get(school=school)
+        assert (meal.menu, meal.snack) == ("Riso al pomodoro", "Mela")
+        assert set(DishToken.objects.values_list("token", flat=True)) == {
+            "riso",
+            "pomodoro",
+            "mela",
+        }
+
+    def test_reimport_writes_only_the_diff(
+        self, tmp_path, school_factory, simple_meal_factory
+    ):
+        school = school_factory(menu_type=School.Types.SIMPLE)
+        meal = simple_meal_factory(
+            school=school, season=1, week=1, day=1, type=1, menu="Pasta", snack=""
+        )
+        edited = simple_meal_factory(
+            school=school, season=1, week=1, day=2, type=1, menu="Riso", snack=""
+        )
+        simple_meal_factory(
+            school=school, season=1, week=1, day=3, type=1, menu="Pizza", snack=""
+        )
+        other_type = simple_meal_factory(school=school, season=1, week=1, day=3, type=2)
+        other_season = simple_meal_factory(
+            school=school, season=2, week=1, day=3, type=1
+        )
+        rows = [
+            ["Lunedì", 1, "Pasta", ""],
+            ["Martedì", 1, "Risotto", ""],
+            ["Giovedì", 1, "Gnocchi", ""],
+        ]
+        path = write_menu_file(tmp_path / "menu.xlsx", rows)
+        menu_import = MenuImport.objects.create(school=school, season=1)
+
+        import_menu(menu_import, path)
+
+        assert (
+            menu_import.rows_written,
+            menu_import.rows_created,
+            menu_import.rows_updated,
+            menu_import.rows_deleted,
+        ) == (2, 1, 1, 1)
+        assert menu_import.message == "Menu salvato correttamente"
+        assert set(
+            SimpleMeal.objects.filter(school=school, season=1, type=1).values_list(
+                "day", "menu"
+            )
+        ) == {(1, "Pasta"), (2, "Risotto"), (4, "Gnocchi")}
+        assert (
+            SimpleMeal.objects.filter(
+                pk__in=[meal.pk, edited.pk, other_type.pk, other_season.pk]
+            ).count()
+            == 4
+        )
+
+    def test_unchanged_reimport_writes_nothing(
+        self, tmp_path, school_factory, django_assert_num_queries
+    ):
+        school = school_factory(menu_type=School.Types.SIMPLE)
+        rows = [["Lunedì", 1, "Pasta al pomodoro", "Yogurt"]]
+        path = write_menu_file(tmp_path / "menu.xlsx", rows)
+        import_menu(MenuImport.objects.create(school=school, season=1), path)
+        menu_import = MenuImport.objects.create(school=school, season=1)
+        path = write_menu_file(tmp_path / "menu.xlsx", rows)
+
+        # progress, savepoint, saved meals, release and outcome
+        with patch("school_menu.utils.mark_menu_changed") as mark_menu_changed:
+            with django_assert_num_queries(5):
+                import_menu(menu_import, path)
+
+        mark_menu_changed.assert_not_called()
+        assert menu_import.status == MenuImport.Statuses.DONE
+        assert not menu_import.has_changes
+        assert "nessuna modifica" in menu_import.message
+
+    def test_reimport_deleting_meals_query_budget(
+        self, tmp_path, school_factory, django_assert_num_queries
+    ):
+        school = school_factory(menu_type=School.Types.SIMPLE)
+        days = ["Lunedì", "Martedì", "Mercoledì", "Giovedì", "Venerdì"]
+        rows = [
+            [day, week, f"Pasta {week} {day}", "Yogurt"]
+            for week in range(1, 5)
+            for day in days
+        ]
+        import_menu(
+            MenuImport.objects.create(school=school, season=1),
+            write_menu_file(tmp_path / "menu.xlsx", rows),
+        )
+        path = write_menu_file(tmp_path / "menu.xlsx", rows[:5])
+        menu_import = MenuImport.objects.create(school=school, season=1)
+
+        # progress, savepoint, saved meals, select and delete, dish tokens (delete,
+        # two meal tables, insert), release, menu version and outcome, the same
+        # for 15 deleted meals or 1
+        with django_assert_num_queries(12):
+            import_menu(menu_import, path)
+
+        assert menu_import.rows_deleted == 15
+        assert SimpleMeal.objects.filter(school=school).count() == 5
+        assert DishToken.objects.filter(school=school, token="pasta").count() == 5
+
+    def test_repeated_day_keeps_last_row(self, tmp_path, school_factory):
+        school = school_factory(menu_type=School.Types.SIMPLE)
+        rows = [["Lunedì", 1, "Pasta", "Yogurt"], ["Lunedì", 1, "Riso", "Mela"]]
+        path = write_menu_file(tmp_path / "menu.xlsx", rows)
+        menu_import = MenuImport.objects.create(school=school, season=1)
+
+        import_menu(menu_import, path)
+
+        assert SimpleMeal.objects.get(school=school).menu == "Riso"
+        assert (menu_import.rows_parsed, menu_import.rows_written) == (2, 1)
+
+    def test_csv_exported_by_the_admin(self, settings, school_factory):
+        school = school_factory(menu_type=School.Types.DETAILED)
+        menu_import = MenuImport.objects.create(school=school, season=1)
+
+        with open(settings.BASE_DIR / "data" / "menu_scuola.csv", "rb") as file:
+            import_menu(menu_import, file)
+
+        assert menu_import.status == MenuImport.Statuses.DONE
+        # both seasons of the four meal types, only the chosen season is imported
+        assert (menu_import.rows_parsed, menu_import.rows_written) == (160, 80)
+        assert DetailedMeal.objects.filter(school=school, type=4).count() == 20
+
+    def test_not_a_spreadsheet(self, school_factory):
+        menu_import = MenuImport.objects.create(school=school_factory(), season=1)
+
+        import_menu(menu_import, BytesIO(b"\x00\x01"))
+
+        assert menu_import.status == MenuImport.Statuses.FAILED
+        assert "foglio di calcolo" in menu_import.message
+
+    def test_import_is_atomic(self, tmp_path, school_factory):
+        school = school_factory(menu_type=School.Types.SIMPLE)
+        path = write_menu_file(
+            tmp_path / "menu.xlsx", [["Lunedì", 1, "Pasta al pomodoro", "Yogurt"]]
+        )
+
+        with patch("school_menu.utils.index_school_dishes", side_effect=RuntimeError):
+            with pytest.raises(RuntimeError):
+                import_menu(MenuImport.objects.create(school=school, season=1), path)
+
+        assert not SimpleMeal.objects.exists()
+
+
+def get_rows(*rows):
+    return [dict(zip(SIMPLE_COLUMNS, row, strict=True)) for row in rows]
+
+
+class TestCountRows:
+    def test_progress_is_saved_while_reading(self, school_factory):
+        menu_import = MenuImport.objects.create(school=school_factory(), season=1)
+        saved_counts = []
+
+        with patch("school_menu.utils.MENU_IMPORT_PROGRESS_ROWS", 2):
+            for row in count_rows(iter(range(5)), menu_import):
+                saved_counts.append(
+                    MenuImport.objects.get(pk=menu_import.pk).rows_parsed
+                )
+
+        assert saved_counts == [0, 2, 2, 4, 4]
+        assert menu_import.rows_parsed == 5
+
+
+class TestValidateMenu:
+    def test_coerce_columns(self):
+        rows = get_rows(
+            [" Lunedì ", "2", " Pasta ", None],
+            ["Martedì", 1.0, "Riso", "Mela"],
+        )
+
+        meals = validate_menu(rows, School.Types.SIMPLE, 1)
+
+        assert list(meals) == [
+            {"day": 1, "week": 2, "type": 1, "menu": "Pasta", "snack": ""},
+            {"day": 2, "week": 1, "type": 1, "menu": "Riso", "snack": "Mela"},
+        ]
+
+    def test_field_names_type_and_season(self):
+        rows = [
+            {"day": "3", "week": 2, "type": "2", "season": "1", "menu": "Riso"},
+            {"day": 3, "week": 2, "type": "", "season": 2, "menu": "Pasta"},
+        ]
+        rows = [{**row, "snack": "Mela"} for row in rows]
+
+        meals = validate_menu(rows, School.Types.SIMPLE, "1")
+
+        assert list(meals) == [
+            {"day": 3, "week": 2, "type": 2, "menu": "Riso", "snack": "Mela"}
+        ]
+
+    def test_rows_are_validated_lazily(self):
+        rows = get_rows(["Lunedì", 1, "Pasta", ""], ["Sabato", 1, "Pasta", ""])
+
+        meals = validate_menu(iter(rows), School.Types.SIMPLE, 1)
+
+        assert next(meals)["menu"] == "Pasta"
+        with pytest.raises(ValidationError):
+            next(meals)
+
+    @pytest.mark.parametrize(
+        "row, message",
+        [
+            (["Lunedì", 5, "Pasta", ""], '"settimana"'),
+            (["Lunedì", "prima", "Pasta", ""], '"settimana"'),
+            (["Lunedì", 1.5, "Pasta", ""], '"settimana"'),
+            (["Lunedì", None, "Pasta", ""], '"settimana"'),
+            (["Sabato", 1, "Pasta", ""], '"giorno"'),
+            (["6", 1, "Pasta", ""], '"giorno"'),
+            (["Lunedì", 1, "Pasta", "x" * 201], '"spuntino"'),
+        ],
+    )
+    def test_invalid_values(self, row, message):
+        with pytest.raises(ValidationError) as error:
+            list(validate_menu(get_rows(row), School.Types.SIMPLE, 1))
+
+        assert message in error.value.message
+        assert "(riga 2)" in error.value.message
+
+    def test_invalid_type(self):
+        rows = [{**get_rows(["Lunedì", 1, "Pasta", ""])[0], "tipo": "vegano"}]
+
+        with pytest.raises(ValidationError) as error:
+            list(validate_menu(rows, School.Types.SIMPLE, 1))
+
+        assert '"tipo"' in error.value.message
+
+    def test_no_rows(self):
+        with pytest.raises(ValidationError) as error:
+            list(validate_menu([], School.Types.SIMPLE, 1))
+
+        assert "alcun pasto" in error.value.message
@@ -1,10 +1,16 @@
+from datetime import timedelta
 from unittest.mock import patch
 
 from django.contrib.messages import get_messages
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import OperationalError
+from django.utils import timezone
 from pytest_django.asserts import assertTemplateUsed
 
-from school_menu.models import DetailedMeal, School, SimpleMeal
+from school_menu.cache import get_city_directory
+from school_menu.models import DetailedMeal, MenuImport, School, SimpleMeal
+from school_menu.prerender import write_prerendered_menu
+from school_menu.services import resolve_menu
 from school_menu.test import TestCase
 from tests.school_menu.factories import (
     DetailedMealFactory,
@@ -104,6 +110,178 @@ class SchoolMenuView(TestCase):
         assertTemplateUsed(response, "school-menu.html")
         assert response.context["school"] == school
 
+    def test_get_query_budget(self):
+        school = SchoolFactory(menu_type=School.Types.DETAILED)
+        DetailedMealFactory.create_batch(5, school=school)
+
+        # school lookup + weekly meals
+        with self.assertNumQueries(2):
+            response = self.get("school_menu:school_menu", slug=school.slug)
+
+        self.response_200(response)
+
+    def test_warm_get_makes_no_meal_queries(self):
+        school = SchoolFactory(menu_type=School.Types.SIMPLE)
+        self.get("school_menu:school_menu", slug=school.slug)
+
+        # only the school lookup hits the database once the menu is cached
+        with self.assertNumQueries(1):
+            response = self.get("school_menu:school_menu", slug=school.slug)
+
+        self.response_200(response)
+
+    def test_get_prerendered_page(self):
+        school = SchoolFactory()
+        write_prerendered_menu(school.pk, b"<html>prerendered</html>")
+
+        response = self.get("school_menu:school_menu", slug=school.slug)
+
+        self.response_200(response)
+        assert response.content == b"<html>prerendered</html>"
+        assert response.headers["ETag"]
+
+    def test_get_prerendered_page_with_authenticated_user(self):
+        user = self.make_user()
+        school = SchoolFactory()
+        write_prerendered_menu(school.pk, b"<html>prerendered</html>")
+
+        with self.login(user):
+            response = self.get("school_menu:school_menu", slug=school.slug)
+
+        self.response_200(response)
+        assertTemplateUsed(response, "school-menu.html")
+
+    def test_get_sets_validators(self):
+        school = SchoolFactory()
+
+        response = self.get("school_menu:school_menu", slug=school.slug)
+
+        self.response_200(response)
+        assert response.headers["ETag"]
+        assert response.headers["Last-Modified"]
+
+    def test_get_not_modified(self):
+        school = SchoolFactory()
+        response = self.get("school_menu:school_menu", slug=school.slug)
+        etag = response.headers["ETag"]
+
+        response = self.get(
+            "school_menu:school_menu",
+            slug=school.slug,
+            extra={"HTTP_IF_NONE_MATCH": etag},
+        )
+
+        assert response.status_code == 304
+        assert response.headers["ETag"] == etag
+        assert response.content == b""
+
+    def test_etag_changes_when_menu_changes(self):
+        school = SchoolFactory(menu_type=School.Types.SIMPLE)
+        response = self.get("school_menu:school_menu", slug=school.slug)
+        etag = response.headers["ETag"]
+
+        SimpleMealFactory(school=school)
+        response = self.get(
+            "school_menu:school_menu",
+            slug=school.slug,
+            extra={"HTTP_IF_NONE_MATCH": etag},
+        )
+
+        self.response_200(response)
+        assert response.headers["ETag"] != etag
+
+    def test_stale_page_past_the_deadline(self):
+        school = SchoolFactory()
+        page = self.get("school_menu:school_menu", slug=school.slug).content
+
+        with patch(
+            "school_menu.views.resolve_menu",
+            side_effect=OperationalError("interrupted"),
+        ):
+            with patch("school_menu.deadlines.Deadline.expired", True):
+                response = self.get("school_menu:school_menu", slug=school.slug)
+
+        self.response_200(response)
+        assert response.content == page
+        assert "Warning" in response.headers
+
+    def test_unavailable_past_the_deadline(self):
+        school = SchoolFactory()
+
+        with patch(
+            "school_menu.views.resolve_menu",
+            side_effect=OperationalError("interrupted"),
+        ):
+            with patch("school_menu.deadlines.Deadline.expired", True):
+                response = self.get("school_menu:school_menu", slug=school.slug)
+
+        assert response.status_code == 503
+
+
+class SchoolMenuCalendarView(TestCase):
+    def test_get(self):
+        school = SchoolFactory(menu_type=School.Types.DETAILED)
+        DetailedMealFactory.create_batch(5, school=school)
+
+        # school lookup + meals of the whole range
+        with self.assertNumQueries(2):
+            response = self.get(
+                "school_menu:school_menu_calendar",
+                slug=school.slug,
+                data={"start": "2023-09-01", "end": "2024-06-30"},
+            )
+
+        self.response_200(response)
+        assertTemplateUsed(response, "school-calendar.html")
+        assert response.context["school"] == school
+        assert len(response.context["weeks"]) == 44
+
+    def test_get_current_month(self):
+        school = SchoolFactory(menu_type=School.Types.SIMPLE)
+        SimpleMealFactory.create_batch(5, school=school)
+
+        response = self.get("school_menu:school_menu_calendar", slug=school.slug)
+
+        self.response_200(response)
+        assert response.context["start"].day == 1
+
+
+class SchoolMenuIcsView(TestCase):
+    def test_get(self):
+        school = SchoolFactory(menu_type=School.Types.DETAILED)
+
+        response = self.get("school_menu:school_menu_ics", slug=school.slug)
+
+        self.response_200(response)
+        assert response.headers["Content-Type"] == "text/calendar; charset=utf-8"
+        assert response.headers["ETag"]
+        feed = b"".join(response.streaming_content).decode()
+        assert feed.startswith("BEGIN:VCALENDAR")
+
+    def test_cached_feed(self):
+        school = SchoolFactory(menu_type=School.Types.SIMPLE)
+        response = self.get("school_menu:school_menu_ics", slug=school.slug)
+        feed = b"".join(response.streaming_content)
+
+        # only the school lookup hits the database once the feed is cached
+        with self.assertNumQueries(1):
+            response = self.get("school_menu:school_menu_ics", slug=school.slug)
+
+        self.response_200(response)
+        assert response.content == feed
+
+    def test_get_not_modified(self):
+        school = SchoolFactory()
+        response = self.get("school_menu:school_menu_ics", slug=school.slug)
+
+        response = self.get(
+            "school_menu:school_menu_ics",
+            slug=school.slug,
+            extra={"HTTP_IF_NONE_MATCH": response.headers["ETag"]},
+        )
+
+        assert response.status_code == 304
+
 
 class GetMenuView(TestCase):
     def test_get_with_simple_menu(self):
@@ -142,6 +320,104 @@ class GetMenuView(TestCase):
         self.response_200(response)
         assert response.context["meal"] == meal
 
+    def test_get_with_missing_day(self):
+        school = SchoolFactory(
+            menu_type=School.Types.SIMPLE, season_choice=School.Seasons.PRIMAVERILE
+        )
+
+        response = self.get("school_menu:get_menu", 1, 1, 1, school.pk)
+
+        self.response_200(response)
+        assert response.context["meal"] is None
+
+    def test_get_not_modified(self):
+        school = SchoolFactory()
+        response = self.get("school_menu:get_menu", 1, 1, 1, school.pk)
+        etag = response.headers["ETag"]
+
+        response = self.get(
+            "school_menu:get_menu",
+            1,
+            1,
+            1,
+            school.pk,
+            extra={"HTTP_IF_NONE_MATCH": etag},
+        )
+
+        assert response.status_code == 304
+
+
+class JsonMenuView(TestCase):
+    def test_get(self):
+        school = SchoolFactory(menu_type=School.Types.DETAILED)
+        DetailedMealFactory.create_batch(5, school=school)
+
+        response = self.get("school_menu:json_menu", slug=school.slug)
+
+        self.response_200(response)
+        data = response.json()
+        assert data["school"]["slug"] == school.slug
+        assert "weekly_meals" in data
+        assert "max-age=300" in response.headers["Cache-Control"]
+        assert response.headers["ETag"]
+
+    def test_get_with_type(self):
+        school = SchoolFactory(menu_type=School.Types.SIMPLE)
+
+        response = self.get(
+            "school_menu:json_menu", slug=school.slug, data={"type": "4"}
+        )
+
+        self.response_200(response)
+        assert response.json()["meal"] is None
+
+    def test_get_not_modified(self):
+        school = SchoolFactory()
+        response = self.get("school_menu:json_menu", slug=school.slug)
+
+        response = self.get(
+            "school_menu:json_menu",
+            slug=school.slug,
+            extra={"HTTP_IF_NONE_MATCH": response.headers["ETag"]},
+        )
+
+        assert response.status_code == 304
+        assert "max-age=300" in response.headers["Cache-Control"]
+
+    def test_post_not_allowed(self):
+        school = SchoolFactory()
+
+        response = self.post("school_menu:json_menu", slug=school.slug)
+
+        assert response.status_code == 405
+
+
+class JsonMenuBulkView(TestCase):
+    def test_get(self):
+        schools = [
+            SchoolFactory(menu_type=School.Types.SIMPLE),
+            SchoolFactory(menu_type=School.Types.DETAILED),
+            SchoolFactory(menu_type=School.Types.DETAILED),
+        ]
+        slugs = ",".join(school.slug for school in schools)
+
+        # schools + one query per meal table
+        with self.assertNumQueries(3):
+            response = self.get("school_menu:json_menu_bulk", data={"schools": slugs})
+
+        self.response_200(response)
+        menus = response.json()["menus"]
+        assert {menu["school"]["slug"] for menu in menus} == {
+            school.slug for school in schools
+        }
+        assert "max-age=300" in response.headers["Cache-Control"]
+
+    def test_get_without_schools(self):
+        response = self.get("school_menu:json_menu_bulk")
+
+        self.response_200(response)
+        assert response.json() == {"menus": []}
+
 
 class SettingView(TestCase):
     def test_get(self):
@@ -251,6 +527,240 @@ class SchoolListView(TestCase):
         assertTemplateUsed(response, "school-list.html")
         assert school in response.context["schools"]
 
+    def test_pages(self):
+        schools = [SchoolFactory(name=f"Scuola {index}") for index in range(3)]
+
+        with self.settings(SCHOOL_PAGE_SIZE=2):
+            response = self.get("school_menu:school_list")
+            next_url = response.context["next_url"]
+            next_page = self.client.get(next_url)
+
+        assert list(response.context["schools"]) == schools[:2]
+        assert f'hx-get="{next_url}"' in response.content.decode()
+        assert list(next_page.context["schools"]) == schools[2:]
+        assert next_page.context["next_url"] is None
+        assert "<section" not in next_page.content.decode()
+
+    def test_page_queries(self):
+        SchoolFactory.create_batch(3)
+
+        with self.assertNumQueries(1):
+            self.get("school_menu:school_list")
+
+
+class AutocompleteSchoolsView(TestCase):
+    def test_get(self):
+        school = SchoolFactory(name="Scuola Rodari", city="Milano")
+
+        response = self.get("school_menu:autocomplete_schools", data={"q": "rod"})
+
+        self.response_200(response)
+        assert response.json() == {
+            "schools": [
+                {
+                    "name": "Scuola Rodari",
+                    "city": "Milano",
+                    "url": school.get_absolute_url(),
+                }
+            ]
+        }
+        assert "max-age=300" in response["Cache-Control"]
+
+    def test_no_queries_once_loaded(self):
+        SchoolFactory.create_batch(3)
+        self.get("school_menu:autocomplete_schools", data={"q": "a"})
+
+        with self.assertNumQueries(0):
+            self.get("school_menu:autocomplete_schools", data={"q": "b"})
+
+
+class CityListView(TestCase):
+    def test_get(self):
+        SchoolFactory.create_batch(2, city="Città di Castello")
+
+        response = self.get("school_menu:city_list")
+
+        self.response_200(response)
+        assert response.context["cities"] == [
+            {"city": "Città di Castello", "count": 2, "slug": "citta-di-castello"}
+        ]
+        assert "/citta/citta-di-castello/" in response.content.decode()
+
+    def test_city_names_with_slashes(self):
+        SchoolFactory(city="Bolzano/Bozen")
+        SchoolFactory(city="!!!")
+
+        response = self.get("school_menu:city_list")
+
+        self.response_200(response)
+        content = response.content.decode()
+        assert "/citta/bolzanobozen/" in content
+        assert "!!!" in content
+
+
+class CitySchoolsView(TestCase):
+    def test_get(self):
+        schools = [
+            SchoolFactory(city="Milano", menu_type=menu_type)
+            for menu_type in (School.Types.SIMPLE, School.Types.DETAILED) * 3
+        ]
+        SchoolFactory(city="Roma")
+
+        # city directory, schools, simple meals and detailed meals
+        with self.assertNumQueries(4):
+            response = self.get("school_menu:city_schools", "milano")
+
+        self.response_200(response)
+        assert {menu.school for menu, meal in response.context["menus"]} == set(schools)
+        assert "Nessun menù" in response.content.decode()
+
+    def test_meals(self):
+        school = SchoolFactory(city="Milano", menu_type=School.Types.SIMPLE)
+        menu = resolve_menu(school)
+        SimpleMealFactory(
+            school=school,
+            season=menu.season,
+            week=menu.week,
+            day=menu.day,
+            menu="Pasta al pomodoro",
+        )
+
+        response = self.get("school_menu:city_schools", "milano")
+
+        assert "Pasta al pomodoro" in response.content.decode()
+
+    def test_city_with_slash(self):
+        school = SchoolFactory(city="Bolzano/Bozen")
+
+        response = self.get("school_menu:city_schools", "bolzanobozen")
+
+        self.response_200(response)
+        content = response.content.decode()
+        assert school.name in content
+        assert self.reverse("school_menu:district_menu", "bolzanobozen") in content
+
+    def test_unknown_city(self):
+        response = self.get("school_menu:city_schools", "atlantide")
+
+        self.response_404(response)
+
+
+class DistrictMenuView(TestCase):
+    def test_query_budget(self):
+        for index, menu_type in enumerate(
+            (School.Types.SIMPLE, School.Types.DETAILED) * 5
+        ):
+            SchoolFactory(city="Milano", menu_type=menu_type, week_bias=index % 4)
+        SchoolFactory(city="Roma")
+
+        get_city_directory()
+
+        # schools, simple meals and detailed meals, the city directory is cached
+        with self.assertNumQueries(3):
+            response = self.get("school_menu:district_menu", "milano")
+
+        self.response_200(response)
+        assertTemplateUsed(response, "district-menu.html")
+        menus = [
+            menu for group in response.context["groups"] for menu in group["menus"]
+        ]
+        assert len(menus) == 10
+
+    def test_meals(self):
+        simple_school = SchoolFactory(city="Milano", menu_type=School.Types.SIMPLE)
+        detailed_school = SchoolFactory(city="Milano", menu_type=School.Types.DETAILED)
+        simple_menu = resolve_menu(simple_school, meal_type=2)
+        detailed_menu = resolve_menu(detailed_school, meal_type=2)
+        SimpleMealFactory(
+            school=simple_school,
+            season=simple_menu.season,
+            week=simple_menu.week,
+            day=simple_menu.day,
+            type=2,
+            menu="Pasta al pomodoro",
+        )
+        DetailedMealFactory(
+            school=detailed_school,
+            season=detailed_menu.season,
+            week=detailed_menu.week,
+            day=detailed_menu.day,
+            type=2,
+            first_course="Risotto alla milanese",
+        )
+
+        response = self.get("school_menu:district_menu", "milano", data={"type": 2})
+
+        content = response.content.decode()
+        assert "Pasta al pomodoro" in content
+        assert "Risotto alla milanese" in content
+        assert "Nessun menù" not in content
+
+    def test_unknown_city(self):
+        response = self.get("school_menu:district_menu", "atlantide")
+
+        self.response_404(response)
+
+
+class DishSearchView(TestCase):
+    def test_get(self):
+        school = SchoolFactory(menu_type=School.Types.SIMPLE)
+        SimpleMealFactory(
+            school=school, season=2, week=2, day=3, menu="Pasta al tonno", snack=""
+        )
+
+        response = self.get("school_menu:dish_search", data={"q": "tonno"})
+
+        self.response_200(response)
+        data = response.json()["schools"]
+        assert data[0]["slug"] == school.slug
+        assert data[0]["meals"] == [{"season": 2, "week": 2, "day": 3, "type": 1}]
+
+    def test_current_week(self):
+        school = SchoolFactory(menu_type=School.Types.SIMPLE)
+        menu = resolve_menu(school)
+        SimpleMealFactory(
+            school=school,
+            season=menu.season,
+            week=menu.week % 4 + 1,
+            day=1,
+            menu="Tonno",
+            snack="",
+        )
+
+        response = self.get(
+            "school_menu:dish_search", data={"q": "tonno", "week": "current"}
+        )
+
+        assert response.json() == {"schools": []}
+
+
+class SchoolDirectoryView(TestCase):
+    def test_get(self):
+        schools = [SchoolFactory(name=f"Scuola {index}") for index in range(5)]
+
+        with patch("school_menu.views.DIRECTORY_CHUNK_SIZE", 2):
+            response = self.get("school_menu:school_directory")
+            content = b"".join(response.streaming_content).decode()
+
+        self.response_200(response)
+        assert response.streaming
+        positions = [content.index(school.get_absolute_url()) for school in schools]
+        assert positions == sorted(positions)
+        assert content.index("<section") < positions[0]
+        assert content.rstrip().endswith("</html>")
+        assert "<!-- school-items -->" not in content
+
+    def test_header_is_sent_before_the_query(self):
+        SchoolFactory.create_batch(3)
+        response = self.get("school_menu:school_directory")
+
+        with self.assertNumQueries(0):
+            header = next(response.streaming_content)
+        with self.assertNumQueries(1):
+            b"".join(response.streaming_content)
+
+        assert b"Elenco completo delle scuole" in header
+
 
 class UploadMenuView(TestCase):
     def test_get(self):
@@ -264,8 +774,8 @@ class UploadMenuView(TestCase):
         assertTemplateUsed(response, "upload-menu.html")
         assert response.context["school"] == school
 
-    @patch("school_menu.views.import_menu")
-    def test_post_with_valid_data(self, mock_import_menu):
+    @patch("school_menu.views.async_task")
+    def test_post_with_valid_data(self, mock_async_task):
         user = self.make_user()
         school = SchoolFactory(user=user)
         data = {
@@ -278,10 +788,20 @@ class UploadMenuView(TestCase):
         }
 
         with self.login(user):
-            response = self.post("school_menu:upload_menu", school.pk, data=data)
-
-        self.response_204(response)
-        mock_import_menu.assert_called_once()
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.post("school_menu:upload_menu", school.pk, data=data)
+
+        assert response.status_code == 202
+        menu_import = MenuImport.objects.get(school=school)
+        assert menu_import.status == MenuImport.Statuses.PENDING
+        assert str(menu_import.pk) in response.content.decode()
+        assert self.reverse("school_menu:menu_import_status", menu_import.pk) in (
+            response.content.decode()
+        )
+        assert menu_import.file.read() == b"these are the file contents!"
+        mock_async_task.assert_called_once_with(
+            "school_menu.tasks.import_school_menu", menu_import.pk
+        )
 
     def test_post_with_invalid_data(self):
         user = self.make_user()
@@ -299,6 +819,101 @@ class UploadMenuView(TestCase):
         assert "file" in response.context["form"].errors
 
 
+class MenuImportStatusView(TestCase):
+    def setUp(self):
+        self.user = self.make_user()
+        self.school = SchoolFactory(user=self.user)
+
+    def test_running(self):
+        menu_import = MenuImport.objects.create(
+            school=self.school, season=1, status=MenuImport.Statuses.RUNNING
+        )
+
+        with self.login(self.user):
+            response = self.get("school_menu:menu_import_status", menu_import.pk)
+
+        self.response_200(response)
+        assert "hx-get" in response.content.decode()
+        assert "HX-Trigger" not in response.headers
+
+    def test_done(self):
+        menu_import = MenuImport.objects.create(
+            school=self.school,
+            season=1,
+            status=MenuImport.Statuses.DONE,
+            rows_parsed=20,
+            rows_written=20,
+        )
+
+        with self.login(self.user):
+            response = self.get("school_menu:menu_import_status", menu_import.pk)
+
+        self.response_200(response)
+        content = response.content.decode()
+        assert "hx-get" not in content
+        assert "Righe salvate: 20" in content
+        assert response.headers["HX-Trigger"] == "menuModified"
+        assert [str(message) for message in get_messages(response.wsgi_request)] == [
+            "<strong>Menu</strong> salvato correttamente"
+        ]
+
+    def test_done_without_changes(self):
+        menu_import = MenuImport.objects.create(
+            school=self.school,
+            season=1,
+            status=MenuImport.Statuses.DONE,
+            rows_parsed=20,
+            message="Il menu è uguale a quello già salvato, nessuna modifica",
+        )
+
+        with self.login(self.user):
+            response = self.get("school_menu:menu_import_status", menu_import.pk)
+
+        self.response_200(response)
+        content = response.content.decode()
+        assert "Pasti modificati: 0" in content
+        assert "nessuna modifica" in content
+        assert "HX-Trigger" not in response.headers
+        assert not list(get_messages(response.wsgi_request))
+
+    def test_failed(self):
+        menu_import = MenuImport.objects.create(
+            school=self.school,
+            season=1,
+            status=MenuImport.Statuses.FAILED,
+            message="Formato non valido.",
+        )
+
+        with self.login(self.user):
+            response = self.get("school_menu:menu_import_status", menu_import.pk)
+
+        self.response_200(response)
+        assert "Formato non valido." in response.content.decode()
+        assert "HX-Trigger" not in response.headers
+
+    def test_stale_import_fails(self):
+        menu_import = MenuImport.objects.create(school=self.school, season=1)
+        MenuImport.objects.filter(pk=menu_import.pk).update(
+            updated_at=timezone.now() - timedelta(minutes=11)
+        )
+
+        with self.login(self.user):
+            response = self.get("school_menu:menu_import_status", menu_import.pk)
+
+        self.response_200(response)
+        assert "hx-get" not in response.content.decode()
+        menu_import.refresh_from_db()
+        assert menu_import.status == MenuImport.Statuses.FAILED
+
+    def test_other_user(self):
+        menu_import = MenuImport.objects.create(school=self.school, season=1)
+
+        with self.login(self.make_user("other")):
+            response = self.get("school_menu:menu_import_status", menu_import.pk)
+
+        self.response_404(response)
+
+
 class CreateWeeklyMenuView(TestCase):
     def test_get(self):
         user_factory = UserFactory  # noqa
@@ -395,6 +1010,14 @@ class SchoolSearchView(TestCase):
         self.response_200(response)
         assert "Test School" in response.content.decode()
 
+    def test_rate_limit(self):
+        with self.settings(RATE_LIMITS={"search_schools": (1, 60)}):
+            self.get("school_menu:search_schools", data={"q": "test"})
+            response = self.get("school_menu:search_schools", data={"q": "test"})
+
+        assert response.status_code == 429
+        assert "Retry-After" in response.headers
+
     def test_get_with_school_city(self):
         response = self.get("school_menu:search_schools", data={"q": "milano"})
 
@@ -406,6 +1029,30 @@ class SchoolSearchView(TestCase):
 
         self.response_200(response)
 
+    def test_results_are_capped(self):
+        SchoolFactory.create_batch(3, city="Milano")
+
+        with self.settings(SCHOOL_PAGE_SIZE=2):
+            response = self.get("school_menu:search_schools", data={"q": "milano"})
+            next_url = response.context["next_url"]
+            next_page = self.client.get(next_url)
+
+        assert len(response.context["schools"]) == 2
+        assert "Mostra altre scuole" in response.content.decode()
+        assert next_url.endswith("offset=2")
+        assert len(next_page.context["schools"]) == 2
+        assert "next_url" not in next_page.context
+        assert 'id="school-list"' not in next_page.content.decode()
+
+    def test_no_continuation_past_max_offset(self):
+        SchoolFactory.create_batch(3, city="Milano")
+
+        with self.settings(SCHOOL_PAGE_SIZE=2):
+            with patch("school_menu.views.MAX_SEARCH_OFFSET", 1):
+                response = self.get("school_menu:search_schools", data={"q": "milano"})
+
+        assert "next_url" not in response.context
+
     def test_with_no_school_matching_search(self):
         response = self.get(
             "school_menu:search_schools", data={"q": "kjsdkjhsdkjhkslk"}